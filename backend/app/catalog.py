@@ -0,0 +1,344 @@
+import bisect
+import gzip
+import hashlib
+import json
+import logging
+import re
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .config import DATA_API_FILTER_CACHE_SIZE
+from .restaurant_context import ContextSnapshot, RestaurantContext, restaurant_context
+from .text import words
+
+# Optional speed-ups: orjson for encoding, brotli for a smaller variant
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+logger = logging.getLogger(__name__)
+
+_PRICE = re.compile(r"\d+(?:\.\d+)?")
+
+# Sections of menu.json that hold dishes, in the order they are listed
+MENU_SECTIONS = ("signature_dishes", "recommended_dishes")
+
+# Payloads smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 256
+
+# Lowest similarity (0-1) for a dish to count as a name-search hit
+MIN_SEARCH_SCORE = 0.6
+
+
+def dumps(data) -> bytes:
+    """Compact UTF-8 JSON, through orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def slugify(text: str) -> str:
+    """ "Gluten-free" -> "gluten-free", "Vegetarian option available" -> "vegetarian-option-available"."""
+    return "-".join(words(text))
+
+
+def parse_price(price) -> Optional[float]:
+    """ "$12.99" -> 12.99; None if there is no number in it."""
+    if isinstance(price, (int, float)):
+        return float(price)
+    match = _PRICE.search(str(price or ""))
+    return float(match.group()) if match else None
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Damerau-Levenshtein distance (adjacent swaps count as one edit),
+    giving up with limit + 1 as soon as it must exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _max_edits(token: str) -> int:
+    # Short words tolerate fewer typos, or everything starts matching
+    if len(token) <= 3:
+        return 0
+    return 1 if len(token) <= 5 else 2
+
+
+class Payload:
+    """One JSON response body, serialized and compressed once."""
+
+    __slots__ = ("etag", "identity", "gzip", "br")
+
+    def __init__(self, data, etag: str):
+        self.etag = etag
+        self.identity = dumps(data)
+        self.gzip = None
+        self.br = None
+        if len(self.identity) >= MIN_COMPRESS_BYTES:
+            self.gzip = gzip.compress(self.identity, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.br = brotli.compress(self.identity)
+
+    def encode(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """The smallest variant the client accepts, and its Content-Encoding."""
+        accepted = {
+            part.split(";")[0].strip().lower()
+            for part in (accept_encoding or "").split(",")
+            if not part.strip().endswith(";q=0")
+        }
+        if self.br is not None and "br" in accepted:
+            return self.br, "br"
+        if self.gzip is not None and "gzip" in accepted:
+            return self.gzip, "gzip"
+        return self.identity, None
+
+
+class DataCatalog:
+    """
+    Serves the restaurant data (menu, hours, info) as ready-made JSON.
+
+    Every time RestaurantContext loads new data, the three documents are
+    serialized and compressed once, and the menu is indexed by category,
+    dietary tag, price and name tokens. Filtered menu responses are built
+    from those indexes and kept in a small LRU, so repeat queries are
+    served from bytes too. ETags combine the data version with the query,
+    so a client's cached copy is valid until the data changes; they are
+    weak because the same ETag covers every Content-Encoding.
+    """
+
+    def __init__(self, context: RestaurantContext, filter_cache_size: int):
+        self.context = context
+        self.filter_cache_size = filter_cache_size
+        self.version: Optional[str] = None
+        self._filtered: "OrderedDict[tuple, Payload]" = OrderedDict()
+        self.filter_hits = 0
+        self.filter_misses = 0
+        self._rebuild(context.snapshot)
+        context.add_reload_listener(self._rebuild)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def document(self, name: str) -> Payload:
+        """The pre-serialized "menu", "hours" or "info" document."""
+        self._ensure_current()
+        return self._documents[name]
+
+    def menu_etag(self, params: tuple) -> str:
+        """ETag for a filtered menu, known before doing any filtering."""
+        self._ensure_current()
+        digest = hashlib.sha1(repr(params).encode("utf-8")).hexdigest()[:12]
+        return f'W/"{self.version}-{digest}"'
+
+    def filtered_menu(self, category: Optional[str] = None, dietary: Optional[str] = None,
+                      min_price: Optional[float] = None, max_price: Optional[float] = None,
+                      query: Optional[str] = None) -> Payload:
+        """The menu narrowed by any combination of filters and a name search."""
+        params = self.menu_params(category, dietary, min_price, max_price, query)
+        etag = self.menu_etag(params)
+        key = (self.version,) + params
+        payload = self._filtered.get(key)
+        if payload is not None:
+            self.filter_hits += 1
+            self._filtered.move_to_end(key)
+            return payload
+
+        self.filter_misses += 1
+        items = self._select(*params)
+        payload = Payload({
+            "version": self.version,
+            "filters": {
+                "category": category, "dietary": dietary,
+                "min_price": min_price, "max_price": max_price, "q": query,
+            },
+            "count": len(items),
+            "items": items,
+        }, etag)
+        self._filtered[key] = payload
+        if len(self._filtered) > self.filter_cache_size:
+            self._filtered.popitem(last=False)
+        return payload
+
+    @staticmethod
+    def menu_params(category, dietary, min_price, max_price, query) -> tuple:
+        """Normalize filter arguments so equivalent queries share a cache entry."""
+        return (
+            category.strip().lower() if category else None,
+            slugify(dietary) if dietary else None,
+            min_price,
+            max_price,
+            " ".join(words(query)) if query else None,
+        )
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """(item index, score) for dishes whose names resemble `query`, best first."""
+        self._ensure_current()
+        terms = words(query)
+        if not terms:
+            return []
+        totals: Dict[int, float] = {}
+        for term in terms:
+            best: Dict[int, float] = {}
+            for token, similarity in self._similar_tokens(term):
+                for index in self._name_index[token]:
+                    if similarity > best.get(index, 0.0):
+                        best[index] = similarity
+            for index, similarity in best.items():
+                totals[index] = totals.get(index, 0.0) + similarity
+        scored = [(index, total / len(terms)) for index, total in totals.items()]
+        scored = [(index, score) for index, score in scored if score >= MIN_SEARCH_SCORE]
+        scored.sort(key=lambda hit: (-hit[1], hit[0]))
+        return scored
+
+    def name_tokens(self) -> FrozenSet[str]:
+        """Every word that appears in a dish name, lower-cased."""
+        self._ensure_current()
+        return self._name_tokens
+
+    def get_stats(self) -> dict:
+        self._ensure_current()
+        return {
+            "version": self.version,
+            "menu_items": len(self._items),
+            "bytes": {
+                name: {
+                    "identity": len(payload.identity),
+                    "gzip": len(payload.gzip) if payload.gzip else None,
+                    "br": len(payload.br) if payload.br else None,
+                }
+                for name, payload in self._documents.items()
+            },
+            "encoder": "orjson" if orjson is not None else "json",
+            "brotli": brotli is not None,
+            "filter_cache_entries": len(self._filtered),
+            "filter_cache_hits": self.filter_hits,
+            "filter_cache_misses": self.filter_misses,
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _select(self, category, dietary, min_price, max_price, query) -> List[dict]:
+        candidates: Optional[set] = None
+        if category is not None:
+            candidates = set(self._by_category.get(category, ()))
+        if dietary is not None:
+            tagged = self._by_dietary.get(dietary, set())
+            candidates = tagged if candidates is None else candidates & tagged
+        if min_price is not None or max_price is not None:
+            low = 0 if min_price is None else bisect.bisect_left(self._price_keys, min_price)
+            high = len(self._price_keys) if max_price is None else bisect.bisect_right(self._price_keys, max_price)
+            priced = {index for _, index in self._by_price[low:high]}
+            candidates = priced if candidates is None else candidates & priced
+
+        if query is not None:
+            hits = self.search(query)
+            if candidates is not None:
+                hits = [hit for hit in hits if hit[0] in candidates]
+            return [dict(self._items[index], score=round(score, 3)) for index, score in hits]
+
+        indexes = range(len(self._items)) if candidates is None else sorted(candidates)
+        return [self._items[index] for index in indexes]
+
+    def _similar_tokens(self, term: str) -> Iterable[Tuple[str, float]]:
+        """Name tokens close to `term`, with a 0-1 similarity."""
+        if term in self._name_index:
+            yield term, 1.0
+        limit = _max_edits(term)
+        for token in self._name_index:
+            if token == term:
+                continue
+            if len(term) >= 3 and token.startswith(term):
+                yield token, 0.9
+                continue
+            if limit:
+                distance = edit_distance(term, token, limit)
+                if distance <= limit:
+                    yield token, 1.0 - distance / (len(token) + 1)
+
+    def _ensure_current(self) -> None:
+        snapshot = self.context.snapshot
+        if snapshot.version != self.version:
+            self._rebuild(snapshot)
+
+    def _rebuild(self, snapshot: ContextSnapshot) -> None:
+        """Serialize the documents and index the menu for one data version."""
+        version = snapshot.version
+        items = []
+        for section in MENU_SECTIONS:
+            for dish in snapshot.menu_data.get(section, []):
+                item = dict(dish)
+                item["section"] = section
+                item["price_value"] = parse_price(dish.get("price"))
+                item["dietary_tags"] = [slugify(tag) for tag in dish.get("dietary_info", [])]
+                items.append(item)
+
+        by_category: Dict[str, List[int]] = {}
+        by_dietary: Dict[str, set] = {}
+        name_index: Dict[str, set] = {}
+        for index, item in enumerate(items):
+            category = str(item.get("category", "")).strip().lower()
+            if category:
+                by_category.setdefault(category, []).append(index)
+            for tag in item["dietary_tags"]:
+                by_dietary.setdefault(tag, set()).add(index)
+            for token in words(str(item.get("name", ""))):
+                name_index.setdefault(token, set()).add(index)
+        by_price = sorted(
+            (item["price_value"], index) for index, item in enumerate(items)
+            if item["price_value"] is not None
+        )
+
+        menu = {
+            "version": version,
+            "items": items,
+            "categories": sorted({item["category"] for item in items if item.get("category")}),
+            "dietary_tags": sorted(by_dietary),
+            "dietary_accommodations": snapshot.menu_data.get("dietary_accommodations", {}),
+        }
+        documents = {
+            "menu": Payload(menu, f'W/"{version}-menu"'),
+            "hours": Payload(dict(snapshot.hours_data, version=version), f'W/"{version}-hours"'),
+            "info": Payload(dict(snapshot.restaurant_info, version=version), f'W/"{version}-info"'),
+        }
+
+        # Swap everything in at once
+        self._items = items
+        self._by_category = by_category
+        self._by_dietary = by_dietary
+        self._by_price = by_price
+        self._price_keys = [price for price, _ in by_price]
+        self._name_index = name_index
+        self._name_tokens = frozenset(name_index)
+        self._documents = documents
+        self._filtered.clear()
+        self.version = version
+        logger.info("Data API documents built for version %s", version)
+
+
+# Global instance
+data_catalog = DataCatalog(restaurant_context, DATA_API_FILTER_CACHE_SIZE)
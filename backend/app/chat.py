@@ -1,18 +1,24 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, validator
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel
 from typing import Optional
-import re
+from datetime import datetime
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+from app.circuit_breaker import circuit_breaker
+from app.config import ADMIN_TOKEN
+from app.health_monitor import health_monitor
+from app.history_store import history_store
+from app.logging_config import sampled_body
+
 try:
     from app.gemini_client import gemini_client
+    from app.pipeline import chat_pipeline
 except ImportError as e:
-    logger.error(f"Failed to import gemini_client: {e}")
+    logger.error("Failed to import gemini_client: %s", e)
     gemini_client = None
+    chat_pipeline = None
 
 # Create a router for all chatbot endpoints
 router = APIRouter()
@@ -25,24 +31,6 @@ class ChatRequest(BaseModel):
     message: str
     user_id: Optional[str] = None
 
-    @validator('message')
-    def validate_message(cls, v):
-        if not v or not v.strip():
-            raise ValueError("Message cannot be empty.")
-        
-        # Clean extra whitespace
-        cleaned = re.sub(r'\s+', ' ', v.strip())
-        
-        if len(cleaned) > 1000:
-            raise ValueError("Message too long (max 1000 characters).")
-        
-        # Basic content moderation
-        prohibited_words = ['spam', 'hack', 'exploit']
-        if any(word in cleaned.lower() for word in prohibited_words):
-            raise ValueError("Message contains prohibited content.")
-        
-        return cleaned
-
 class ChatResponse(BaseModel):
     """Schema for AI response output."""
     response: str
@@ -75,27 +63,32 @@ async def chat_endpoint(request: ChatRequest):
                 }
             )
         
-        logger.info(f"Processing chat request: '{request.message[:50]}...' for user: {request.user_id}")
-        
-        # Generate AI response using the method from your gemini_client
-        ai_response = await gemini_client.generate_response_with_fallback(request.message)
+        logger.info(
+            "Processing chat request",
+            extra={"user_id": request.user_id, "body": sampled_body(request.message)},
+        )
         
-        # Ensure we have a response
-        if not ai_response or not ai_response.strip():
-            logger.warning("Empty response from AI service, using mock response")
-            ai_response = gemini_client.get_mock_response(request.message)
+        # Validation, caching, local answers and fallbacks all happen in the
+        # shared pipeline; a rejected message raises ValueError
+        turn = await chat_pipeline.run(request.message, request.user_id)
         
-        logger.info(f"Response generated successfully: '{ai_response[:100]}...'")
+        logger.info(
+            "Response generated",
+            extra={"response_chars": len(turn.reply), "source": turn.source, "stage_ms": turn.timings},
+        )
         
         return ChatResponse(
-            response=ai_response,
+            response=turn.reply,
             status="success",
             user_id=request.user_id
         )
         
+    except HTTPException:
+        raise
+        
     except ValueError as ve:
         # Expected validation error
-        logger.warning(f"Validation error: {str(ve)}")
+        logger.warning("Validation error: %s", ve)
         raise HTTPException(
             status_code=400,
             detail={"error": str(ve), "status": "error"}
@@ -103,7 +96,7 @@ async def chat_endpoint(request: ChatRequest):
         
     except Exception as e:
         # Log unexpected internal errors
-        logger.error(f"Unexpected error in /chat endpoint: {str(e)}", exc_info=True)
+        logger.error("Unexpected error in /chat endpoint: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail={
@@ -118,7 +111,8 @@ async def chat_endpoint(request: ChatRequest):
 @router.get("/health")
 async def health_check():
     """
-    Simple GET endpoint to check if chatbot and Gemini API are functional.
+    Report chatbot and Gemini API status from the background health monitor's
+    cached snapshot (no live API call per probe).
     """
     try:
         if gemini_client is None:
@@ -129,19 +123,19 @@ async def health_check():
                 "error": "Gemini client not available"
             }
         
-        # Use the get_api_status method from your gemini_client
-        api_status = gemini_client.get_api_status()
+        snapshot = health_monitor.snapshot()
         
         return {
-            "status": "healthy" if api_status["api_available"] else "unhealthy",
+            "status": "healthy" if snapshot["healthy"] else "degraded",
             "service": "CAFICAFE Chatbot API",
-            "gemini_api": api_status["status"],
-            "request_count": api_status["request_count"],
-            "details": api_status
+            "gemini_api": snapshot["gemini_api"],
+            "request_count": await gemini_client.request_count(),
+            "circuit_breaker": circuit_breaker.snapshot(),
+            "details": snapshot
         }
         
     except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
+        logger.error("Health check failed: %s", e)
         return {
             "status": "unhealthy",
             "service": "CAFICAFE Chatbot API",
@@ -150,19 +144,36 @@ async def health_check():
         }
 
 # =====================
-# 🔷 Chat History Endpoint (Optional)
+# 🔷 Chat History Endpoint
 # =====================
+def check_admin_token(token: Optional[str]) -> None:
+    """
+    Reject a request that does not carry the configured X-Admin-Token.
+    Without ADMIN_TOKEN set, admin endpoints are switched off.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
 @router.get("/chat/history/{user_id}")
-async def get_chat_history(user_id: str):
+async def get_chat_history(user_id: str, x_admin_token: Optional[str] = Header(None)):
     """
-    Get chat history for a specific user.
-    Note: This is a placeholder - implement based on your storage solution.
+    Get the recent conversation for a specific user, oldest turn first.
+    User ids are chosen by the client, so this needs the admin token.
     """
-    # TODO: Implement chat history retrieval
+    check_admin_token(x_admin_token)
+    turns = await history_store.get_turns(user_id)
     return {
         "user_id": user_id,
-        "history": [],
-        "message": "Chat history feature not implemented yet"
+        "history": [
+            {
+                "message": message,
+                "response": reply,
+                "timestamp": datetime.utcfromtimestamp(created_at).isoformat(),
+            }
+            for created_at, message, reply in turns
+        ],
     }
 
 # =====================
@@ -177,8 +188,8 @@ async def chatbot(prompt: str) -> str:
         raise RuntimeError("Gemini client not initialized")
     
     try:
-        response = await gemini_client.generate_response_with_fallback(prompt)
-        return response
+        turn = await chat_pipeline.run(prompt)
+        return turn.reply
     except Exception as e:
-        logger.error(f"Direct chatbot call failed: {str(e)}")
+        logger.error("Direct chatbot call failed: %s", e)
         return gemini_client.get_mock_response(prompt)
\ No newline at end of file
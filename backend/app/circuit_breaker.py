@@ -0,0 +1,142 @@
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, Optional
+
+from .config import (
+    CIRCUIT_DEFAULT_THRESHOLD,
+    CIRCUIT_FAILURE_THRESHOLDS,
+    CIRCUIT_HALF_OPEN_PROBES,
+    CIRCUIT_OPEN_SECONDS,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Tickets handed out by acquire()
+NORMAL = "normal"
+PROBE = "probe"
+
+
+def parse_thresholds(spec: str) -> Dict[str, int]:
+    """Parse "quota_exceeded:1,server_error:3" into a dict."""
+    thresholds = {}
+    for item in spec.split(","):
+        if ":" in item:
+            name, value = item.split(":", 1)
+            thresholds[name.strip()] = int(value)
+    return thresholds
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the Gemini backend is unhealthy.
+
+    The breaker opens when one error class fails `threshold` times in a row
+    (a single 429 is enough by default; 5xx and timeouts need a few). While
+    open, acquire() refuses every call so requests go straight to local
+    answers. After `open_seconds` it lets up to `half_open_probes` real
+    calls through: a success closes it, a failure reopens it for twice as
+    long (capped at eight times `open_seconds`).
+    """
+
+    def __init__(self, thresholds: Dict[str, int], default_threshold: int,
+                 open_seconds: float, half_open_probes: int):
+        self.thresholds = thresholds
+        self.default_threshold = max(1, default_threshold)
+        self.base_open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+
+        self.state = CLOSED
+        self.open_seconds = open_seconds
+        self.opened_at: Optional[float] = None
+        self.open_reason: Optional[str] = None
+        self._consecutive: Counter = Counter()
+        self._probes_in_flight = 0
+
+        self.transitions: deque = deque(maxlen=20)
+        self.rejected = 0
+        self.opens = 0
+
+    def acquire(self) -> Optional[str]:
+        """
+        Ask to make one call. Returns a ticket (NORMAL or PROBE) to pass back
+        to record_success/record_failure/release, or None if the call must not
+        be made.
+        """
+        if self.state == OPEN and time.time() >= self.opened_at + self.open_seconds:
+            self._transition(HALF_OPEN, "open period elapsed")
+
+        if self.state == CLOSED:
+            return NORMAL
+        if self.state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+            self._probes_in_flight += 1
+            return PROBE
+        self.rejected += 1
+        return None
+
+    def record_success(self, ticket: str) -> None:
+        self._consecutive.clear()
+        if ticket == PROBE:
+            self._probes_in_flight -= 1
+            if self.state == HALF_OPEN:
+                self.open_seconds = self.base_open_seconds
+                self._transition(CLOSED, "probe succeeded")
+
+    def record_failure(self, ticket: str, error_type: str) -> None:
+        if ticket == PROBE:
+            self._probes_in_flight -= 1
+            if self.state == HALF_OPEN:
+                self.open_seconds = min(self.open_seconds * 2, self.base_open_seconds * 8)
+                self._open(f"probe failed: {error_type}")
+            return
+
+        self._consecutive[error_type] += 1
+        threshold = self.thresholds.get(error_type, self.default_threshold)
+        if self.state == CLOSED and self._consecutive[error_type] >= threshold:
+            self._open(f"{self._consecutive[error_type]} consecutive {error_type}")
+
+    def release(self, ticket: str) -> None:
+        """Give a ticket back without making the call."""
+        if ticket == PROBE:
+            self._probes_in_flight -= 1
+
+    def _open(self, reason: str) -> None:
+        self.opened_at = time.time()
+        self.open_reason = reason
+        self.opens += 1
+        self._consecutive.clear()
+        self._transition(OPEN, reason)
+
+    def _transition(self, state: str, reason: str) -> None:
+        self.transitions.append({
+            "from": self.state,
+            "to": state,
+            "reason": reason,
+            "at": datetime.utcnow().isoformat(),
+        })
+        self.state = state
+
+    def snapshot(self) -> dict:
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = round(max(0.0, self.opened_at + self.open_seconds - time.time()), 1)
+        return {
+            "state": self.state,
+            "open_reason": self.open_reason if self.state != CLOSED else None,
+            "retry_in_seconds": retry_in,
+            "consecutive_failures": dict(self._consecutive),
+            "opens": self.opens,
+            "rejected_calls": self.rejected,
+            "recent_transitions": list(self.transitions),
+        }
+
+
+# Global instance
+circuit_breaker = CircuitBreaker(
+    thresholds=parse_thresholds(CIRCUIT_FAILURE_THRESHOLDS),
+    default_threshold=CIRCUIT_DEFAULT_THRESHOLD,
+    open_seconds=CIRCUIT_OPEN_SECONDS,
+    half_open_probes=CIRCUIT_HALF_OPEN_PROBES,
+)
@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one.
+
+    The first caller for a key starts `fn()` as its own task; everyone who
+    arrives while it is running awaits the same task and gets the same
+    result (or exception). The task is shielded, so a caller that goes away
+    does not cancel the work for the others.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+        else:
+            self.collapsed += 1
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._in_flight
+
+    async def wait(self, key: str) -> Any:
+        """Join the flight for `key`. Only valid while in_flight(key) is True."""
+        self.collapsed += 1
+        return await asyncio.shield(self._in_flight[key])
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    def get_stats(self) -> dict:
+        total = self.leaders + self.collapsed
+        return {
+            "in_flight": len(self._in_flight),
+            "model_calls": self.leaders,
+            "collapsed_calls": self.collapsed,
+            "collapse_ratio": round(self.collapsed / total, 4) if total else 0.0,
+        }
+
+
+# Global instance for Gemini generations
+single_flight = SingleFlight()
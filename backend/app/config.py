@@ -4,7 +4,168 @@ import os
 
 load_dotenv()  # Load environment variables from .env
 
+# Without a key the API still starts and answers from local data only
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY is missing in environment")
+# Maximum number of Gemini calls running at once; further requests wait in line
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+
+# Response cache: in-process LRU tier plus a SQLite file shared by all workers.
+# Set RESPONSE_CACHE_DB to an empty string to keep the cache in memory only.
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_DB = os.getenv(
+    "RESPONSE_CACHE_DB",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "responses.sqlite3"),
+)
+
+# SQLite file (WAL) holding state every uvicorn worker on the machine must
+# share: Gemini quota windows, rate-limit buckets and the 429 cool-down.
+# Set SHARED_STATE_DB to an empty string to keep that state per process.
+SHARED_STATE_DB = os.getenv(
+    "SHARED_STATE_DB",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "shared_state.sqlite3"),
+)
+
+# Background Gemini health probe. Failing probes back off exponentially up to
+# the max; a snapshot older than HEALTH_STALE_AFTER_SECONDS counts as unhealthy.
+HEALTH_PROBE_INTERVAL_SECONDS = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "60"))
+HEALTH_PROBE_MAX_BACKOFF_SECONDS = float(os.getenv("HEALTH_PROBE_MAX_BACKOFF_SECONDS", "600"))
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "10"))
+HEALTH_STALE_AFTER_SECONDS = float(
+    os.getenv("HEALTH_STALE_AFTER_SECONDS", str(3 * HEALTH_PROBE_INTERVAL_SECONDS))
+)
+
+# How often to check backend/data/*.json for changes (0 disables the watcher)
+CONTEXT_WATCH_INTERVAL_SECONDS = float(os.getenv("CONTEXT_WATCH_INTERVAL_SECONDS", "5"))
+
+# Shared secret for /admin and /chat/history (sent as X-Admin-Token); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Prompt assembly: "retrieval" sends only the context chunks relevant to the
+# question (top-k within a token budget); "full" sends the whole context
+PROMPT_CONTEXT_MODE = os.getenv("PROMPT_CONTEXT_MODE", "retrieval").lower()
+PROMPT_TOP_K = int(os.getenv("PROMPT_TOP_K", "8"))
+PROMPT_CONTEXT_TOKEN_BUDGET = int(os.getenv("PROMPT_CONTEXT_TOKEN_BUDGET", "400"))
+
+# Gemini quota admission control. Limits mirror the API's requests-per-minute
+# and requests-per-day quotas; we stop at HEADROOM of each. Per-user buckets
+# allow USER_RPM_LIMIT calls a minute with bursts of USER_BURST (0 disables).
+GEMINI_RPM_LIMIT = int(os.getenv("GEMINI_RPM_LIMIT", "15"))
+GEMINI_RPD_LIMIT = int(os.getenv("GEMINI_RPD_LIMIT", "1500"))
+GEMINI_QUOTA_HEADROOM = float(os.getenv("GEMINI_QUOTA_HEADROOM", "0.9"))
+GEMINI_QUOTA_COOLDOWN_SECONDS = float(os.getenv("GEMINI_QUOTA_COOLDOWN_SECONDS", "60"))
+USER_RPM_LIMIT = float(os.getenv("USER_RPM_LIMIT", "6"))
+USER_BURST = float(os.getenv("USER_BURST", "3"))
+
+# Per-call timeout for Gemini (for streams: the longest wait between chunks)
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "20"))
+
+# Model tiers, primary first. When a call to one tier runs past that tier's
+# HEDGE_PERCENTILE latency (HEDGE_DEFAULT_DELAY_SECONDS until enough calls
+# are seen, never under HEDGE_MIN_DELAY_SECONDS), the next tier is called
+# too and the first reply wins. Hedges are capped at HEDGE_BUDGET_RATIO of
+# primary calls and only use quota while HEDGE_QUOTA_RESERVE of the minute
+# and day limits is still free. A single model disables hedging.
+GEMINI_MODELS = os.getenv("GEMINI_MODELS", "models/gemini-1.5-flash-latest")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "3"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.5"))
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", "0.1"))
+HEDGE_QUOTA_RESERVE = float(os.getenv("HEDGE_QUOTA_RESERVE", "0.2"))
+
+# Circuit breaker: consecutive failures of one error class that open it,
+# seconds it stays open before a half-open probe, and probes allowed at once
+CIRCUIT_FAILURE_THRESHOLDS = os.getenv(
+    "CIRCUIT_FAILURE_THRESHOLDS",
+    "quota_exceeded:1,permission_denied:2,server_error:3,timeout:3",
+)
+CIRCUIT_DEFAULT_THRESHOLD = int(os.getenv("CIRCUIT_DEFAULT_THRESHOLD", "5"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
+
+# Conversation history: the last HISTORY_MAX_TURNS exchanges per user, with
+# idle sessions dropped after HISTORY_IDLE_SECONDS and the least recently
+# used evicted past HISTORY_MAX_SESSIONS or HISTORY_MAX_MEMORY_BYTES. Up to
+# HISTORY_TOKEN_BUDGET tokens of it go into each prompt (0 disables that).
+# Set HISTORY_DB to a file path to keep history across restarts.
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "10"))
+HISTORY_MAX_SESSIONS = int(os.getenv("HISTORY_MAX_SESSIONS", "5000"))
+HISTORY_MAX_MEMORY_BYTES = int(os.getenv("HISTORY_MAX_MEMORY_BYTES", str(16 * 1024 * 1024)))
+HISTORY_IDLE_SECONDS = float(os.getenv("HISTORY_IDLE_SECONDS", "1800"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "300"))
+HISTORY_DB = os.getenv("HISTORY_DB", "")
+HISTORY_RETENTION_SECONDS = float(os.getenv("HISTORY_RETENTION_SECONDS", str(7 * 86400)))
+
+# POST /chat/batch: most messages per request, and Gemini calls in flight
+# at once for one batch (on top of GEMINI_MAX_CONCURRENCY)
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "100"))
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "4"))
+
+# Logging: records go through a queue to a background writer thread.
+# LOG_FORMAT is "json" (one object per line) or "text". LOG_BODY_SAMPLE_RATE
+# is the share of requests whose message bodies are logged (0 logs none).
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_BODY_SAMPLE_RATE = float(os.getenv("LOG_BODY_SAMPLE_RATE", "0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Message moderation rules (blocked words, prefixes and max length), re-read
+# when the file changes; checked in the background every
+# MODERATION_RELOAD_SECONDS (0 disables the check)
+MODERATION_FILE = os.getenv(
+    "MODERATION_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "moderation.json"),
+)
+MODERATION_RELOAD_SECONDS = float(os.getenv("MODERATION_RELOAD_SECONDS", "5"))
+
+# Chat pipeline stages, in order. Any of validate, normalize, intent, cache,
+# paraphrase, model and postprocess can be dropped or moved; the first stage to produce
+# a reply skips the rest (postprocess always runs)
+CHAT_PIPELINE_STAGES = os.getenv(
+    "CHAT_PIPELINE_STAGES", "validate,normalize,intent,cache,paraphrase,model,postprocess"
+)
+
+# GET /menu, /hours and /info: Cache-Control max-age, and how many filtered
+# menu responses are kept ready-made
+DATA_API_MAX_AGE_SECONDS = int(os.getenv("DATA_API_MAX_AGE_SECONDS", "60"))
+DATA_API_FILTER_CACHE_SIZE = int(os.getenv("DATA_API_FILTER_CACHE_SIZE", "256"))
+
+# Time zone the opening hours in hours.json are in (IANA name); a
+# "timezone" key in hours.json takes precedence
+RESTAURANT_TIMEZONE = os.getenv("RESTAURANT_TIMEZONE", "UTC")
+
+# Token budgets per Gemini call. Prompts estimated above
+# PROMPT_MAX_INPUT_TOKENS are cut down (history first, then context);
+# replies stop at GEMINI_MAX_OUTPUT_TOKENS. 0 disables either limit.
+PROMPT_MAX_INPUT_TOKENS = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "1500"))
+GEMINI_MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "512"))
+
+# Token spend report: days of per-day totals kept, and an optional daily
+# token budget the forecast is checked against (0 for none)
+TOKEN_HISTORY_DAYS = int(os.getenv("TOKEN_HISTORY_DAYS", "14"))
+TOKEN_DAILY_BUDGET = int(os.getenv("TOKEN_DAILY_BUDGET", "0"))
+
+# Paraphrase lookup: model answers are reused for questions that say the
+# same thing in other words ("when r u open" / "opening hours?") when their
+# similarity is at least PARAPHRASE_THRESHOLD (0-1). At most
+# PARAPHRASE_MAX_ENTRIES questions are indexed (0 disables the lookup);
+# more PARAPHRASE_BANDS finds more candidates per lookup
+PARAPHRASE_THRESHOLD = float(os.getenv("PARAPHRASE_THRESHOLD", "0.55"))
+PARAPHRASE_MAX_ENTRIES = int(os.getenv("PARAPHRASE_MAX_ENTRIES", "2000"))
+PARAPHRASE_BANDS = int(os.getenv("PARAPHRASE_BANDS", "16"))
+
+# Queued chat (POST /chat/jobs): CHAT_JOB_WORKERS jobs run at once; at most
+# CHAT_JOB_MAX_PENDING wait, of which anonymous web traffic may fill
+# CHAT_JOB_WEB_MAX_SHARE, and one user at most CHAT_JOB_MAX_PER_USER (0 for
+# no limit). Results can be fetched for CHAT_JOB_RESULT_TTL_SECONDS.
+# CHAT_JOB_CLIENT_KEYS ("key:staff,key:kiosk") gives clients that send a
+# key as X-Client-Key a higher priority; GET waits at most
+# CHAT_JOB_MAX_WAIT_SECONDS for a result
+CHAT_JOB_WORKERS = int(os.getenv("CHAT_JOB_WORKERS", "4"))
+CHAT_JOB_MAX_PENDING = int(os.getenv("CHAT_JOB_MAX_PENDING", "200"))
+CHAT_JOB_WEB_MAX_SHARE = float(os.getenv("CHAT_JOB_WEB_MAX_SHARE", "0.75"))
+CHAT_JOB_MAX_PER_USER = int(os.getenv("CHAT_JOB_MAX_PER_USER", "3"))
+CHAT_JOB_RESULT_TTL_SECONDS = float(os.getenv("CHAT_JOB_RESULT_TTL_SECONDS", "600"))
+CHAT_JOB_CLIENT_KEYS = os.getenv("CHAT_JOB_CLIENT_KEYS", "")
+CHAT_JOB_MAX_WAIT_SECONDS = float(os.getenv("CHAT_JOB_MAX_WAIT_SECONDS", "25"))
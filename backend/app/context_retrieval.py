@@ -0,0 +1,214 @@
+import math
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .config import PROMPT_CONTEXT_MODE, PROMPT_CONTEXT_TOKEN_BUDGET, PROMPT_TOP_K
+from .restaurant_context import ContextSnapshot
+from .text import stem, words
+
+_STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "have", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or",
+    "our", "the", "to", "we", "what", "with", "you", "your",
+})
+
+# Extra search terms for each section, so "when do you open?" finds the
+# hours block even though it only contains day names and times.
+SECTION_ALIASES = {
+    "RESTAURANT INFORMATION": "about story restaurant concept",
+    "LOCATION & CONTACT": "where address location find directions contact reach",
+    "OPENING HOURS": "open opening hours close closing time schedule today when",
+    "SIGNATURE DISHES": "menu dish food eat signature recommend price cost",
+    "RECOMMENDED DISHES": "menu dish food eat recommend recommendation price cost",
+    "DIETARY ACCOMMODATIONS": "diet dietary allergy allergies restriction",
+    "BOOKING INFORMATION": "book booking reserve reservation table group",
+    "FEATURES": "features amenities service offer",
+}
+
+# Order sections appear in the assembled prompt (matches the full context)
+SECTION_ORDER = list(SECTION_ALIASES)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)."""
+    return max(1, (len(text) + 3) // 4)
+
+
+def _terms(text: str) -> List[str]:
+    terms = []
+    for token in words(text):
+        if token in _STOPWORDS:
+            continue
+        terms.append(stem(token))
+    return terms
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents."""
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_freqs: List[Counter] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[int]] = {}
+        for i, doc in enumerate(documents):
+            freqs = Counter(_terms(doc))
+            self.doc_freqs.append(freqs)
+            self.doc_lengths.append(sum(freqs.values()))
+            for term in freqs:
+                self.postings.setdefault(term, []).append(i)
+        n = len(documents)
+        self.avg_length = (sum(self.doc_lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """Return (document index, score) pairs with a positive score, best first."""
+        scores: Dict[int, float] = {}
+        for term in set(_terms(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i in self.postings[term]:
+                tf = self.doc_freqs[i][term]
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / self.avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class ContextRetriever:
+    """
+    Builds prompts from only the context chunks relevant to a question.
+
+    The BM25 index is built once per context version. Chunks are taken in
+    score order up to `top_k` and `token_budget`, then printed back under
+    their usual section headings. If nothing matches at all, the full
+    context is used so open questions still get every fact.
+    """
+
+    def __init__(self, mode: str, top_k: int, token_budget: int):
+        self.mode = mode
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self._version: Optional[str] = None
+        self._chunks: List[Tuple[str, str]] = []
+        self._index: Optional[BM25Index] = None
+
+        self.prompts = 0
+        self.full_fallbacks = 0
+        self.fitted = 0
+        self.context_tokens_sent = 0
+        self.context_tokens_full = 0
+
+    def build_context(self, snapshot: ContextSnapshot, query: str) -> str:
+        """The restaurant context to put in front of `query`."""
+        if self.mode != "retrieval":
+            return snapshot.full_context
+
+        self._ensure_index(snapshot)
+        self.prompts += 1
+        full_tokens = estimate_tokens(snapshot.full_context)
+        self.context_tokens_full += full_tokens
+
+        selected = self.select_chunks(query)
+        if not selected:
+            self.full_fallbacks += 1
+            self.context_tokens_sent += full_tokens
+            return snapshot.full_context
+
+        context = self._render(snapshot, selected)
+        self.context_tokens_sent += estimate_tokens(context)
+        return context
+
+    def fit_context(self, snapshot: ContextSnapshot, query: str, max_tokens: int) -> str:
+        """
+        A context of at most about `max_tokens`, for prompts over the input
+        budget: the preamble and instructions are always kept, then as many
+        chunks as fit, the most relevant to `query` first and the rest in
+        their usual order.
+        """
+        self._ensure_index(snapshot)
+        self.fitted += 1
+        ranked = [i for i, _score in self._index.search(query)]
+        seen = set(ranked)
+        ranked += [i for i in range(len(self._chunks)) if i not in seen]
+
+        context = self._render(snapshot, [])
+        budget = max_tokens - estimate_tokens(context)
+        # Section headings cost a little on top of the chunks: shrink and retry
+        for _ in range(3):
+            selected = []
+            used = 0
+            for i in ranked:
+                cost = estimate_tokens(self._chunks[i][1])
+                if used + cost <= budget:
+                    selected.append(i)
+                    used += cost
+            context = self._render(snapshot, selected)
+            excess = estimate_tokens(context) - max_tokens
+            if excess <= 0 or not selected:
+                break
+            budget -= excess
+        return context
+
+    def select_chunks(self, query: str) -> List[int]:
+        """Indexes of the top chunks for `query` that fit in the token budget."""
+        selected = []
+        used = 0
+        for i, _score in self._index.search(query):
+            if len(selected) >= self.top_k:
+                break
+            cost = estimate_tokens(self._chunks[i][1])
+            if used + cost > self.token_budget:
+                continue
+            selected.append(i)
+            used += cost
+        return selected
+
+    def get_stats(self) -> dict:
+        saved = self.context_tokens_full - self.context_tokens_sent
+        return {
+            "mode": self.mode,
+            "top_k": self.top_k,
+            "token_budget": self.token_budget,
+            "indexed_chunks": len(self._chunks),
+            "prompts": self.prompts,
+            "full_context_fallbacks": self.full_fallbacks,
+            "fitted_to_input_budget": self.fitted,
+            "estimated_context_tokens_sent": self.context_tokens_sent,
+            "estimated_context_tokens_saved": saved,
+        }
+
+    def _render(self, snapshot: ContextSnapshot, selected: List[int]) -> str:
+        """Print chunks back under their section headings, in context order."""
+        by_section: Dict[str, List[str]] = {}
+        for i in sorted(selected):
+            section, text = self._chunks[i]
+            by_section.setdefault(section, []).append(text)
+
+        parts = [snapshot.render_preamble()]
+        for section in SECTION_ORDER:
+            if section in by_section:
+                parts.append(f"{section}:\n" + "\n".join(by_section[section]))
+        parts.append(snapshot.render_instructions())
+        return "\n\n".join(parts) + "\n"
+
+    def _ensure_index(self, snapshot: ContextSnapshot) -> None:
+        if snapshot.version == self._version:
+            return
+        chunks = snapshot.get_context_chunks()
+        documents = [f"{SECTION_ALIASES.get(section, '')} {text}" for section, text in chunks]
+        self._index = BM25Index(documents)
+        self._chunks = chunks
+        self._version = snapshot.version
+
+
+# Global instance
+context_retriever = ContextRetriever(
+    mode=PROMPT_CONTEXT_MODE,
+    top_k=PROMPT_TOP_K,
+    token_budget=PROMPT_CONTEXT_TOKEN_BUDGET,
+)
@@ -1,70 +1,590 @@
 import os
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Optional
 from dotenv import load_dotenv
-import google.generativeai as genai
-from .restaurant_context import restaurant_context
-from datetime import datetime
+from .circuit_breaker import circuit_breaker
+from .coalescing import single_flight
+from .config import (
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_MAX_OUTPUT_TOKENS,
+    GEMINI_MODELS,
+    GEMINI_TIMEOUT_SECONDS,
+    HEDGE_BUDGET_RATIO,
+    HEDGE_DEFAULT_DELAY_SECONDS,
+    HEDGE_MIN_DELAY_SECONDS,
+    HEDGE_PERCENTILE,
+    HEDGE_QUOTA_RESERVE,
+    PROMPT_MAX_INPUT_TOKENS,
+)
+from .context_retrieval import context_retriever, estimate_tokens
+from .health_monitor import health_monitor
+from .hours_engine import hours_engine
+from .intent_engine import intent_engine
+from .metrics import (
+    gemini_errors_total,
+    gemini_tokens,
+    hedges_total,
+    model_latency,
+    prompt_tokens,
+    stage_timer,
+)
+from .model_tiers import HedgePolicy, ModelStats, parse_models
+from .paraphrase_index import paraphrase_index
+from .response_cache import response_cache
+from .restaurant_context import ContextSnapshot, restaurant_context
+from .token_accounting import token_ledger
+from .usage_tracker import usage_tracker
+import re
 import time
 import logging
 
 # Load environment variables from .env
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Splits rendered history into turns, each starting with "Customer: "
+_HISTORY_TURN = re.compile(r"\n(?=Customer: )")
+
 class GeminiClient:
     def __init__(self):
-        # Load API key
+        # Load API key. Without one the bot still answers from local data.
         self.api_key = os.getenv("GEMINI_API_KEY")
         if not self.api_key:
-            raise ValueError("❌ GEMINI_API_KEY environment variable is missing.")
-        print("✅ GEMINI_API_KEY Loaded:", bool(self.api_key))
-        
-        # Configure Gemini API with the key
-        genai.configure(api_key=self.api_key)
-        
-        # Choose the recommended latest model
-        self.model = genai.GenerativeModel(model_name="models/gemini-1.5-flash-latest")
-        
-        # Load predefined restaurant context
-        self.restaurant_context = restaurant_context.get_full_context()
-        
-        # Track API usage
-        self.request_count = 0
-        self.last_reset = datetime.now().date()
+            logger.warning("GEMINI_API_KEY is not set; answering from local data only")
+
+        # Model tiers, primary first. Importing the SDK and building a
+        # model is slow, so it waits for load_model() (run by warm_up() at
+        # startup, or by the first call that needs it).
+        self.model_names = parse_models(GEMINI_MODELS) or ["models/gemini-1.5-flash-latest"]
+        self.model_name = self.model_names[0]
+        self._models = {}
+        self._model_lock = threading.Lock()
+        self.model_stats = {name: ModelStats(name) for name in self.model_names}
+        self.hedge_policy = HedgePolicy(
+            percentile=HEDGE_PERCENTILE,
+            default_delay=HEDGE_DEFAULT_DELAY_SECONDS,
+            min_delay=HEDGE_MIN_DELAY_SECONDS,
+            budget_ratio=HEDGE_BUDGET_RATIO,
+        )
+        self.model_load_seconds = None
+        self._warm_up_task = None
+
+        # Token budgets: prompts are fitted to the input budget in
+        # _build_prompt, replies are capped by Gemini itself
+        self.max_input_tokens = PROMPT_MAX_INPUT_TOKENS
+        self.generation_config = (
+            {"max_output_tokens": GEMINI_MAX_OUTPUT_TOKENS} if GEMINI_MAX_OUTPUT_TOKENS > 0 else None
+        )
+
+        # The SDK call is blocking, so it runs on a dedicated thread pool.
+        # The semaphore bounds concurrent calls; everyone else waits in line.
+        self.max_concurrency = max(1, GEMINI_MAX_CONCURRENCY)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="gemini",
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._waiting = 0
+        self._in_flight = 0
+        self._peak_waiting = 0
+        self._completed_calls = 0
+
+    @property
+    def model(self):
+        """
+        The primary Gemini GenerativeModel, loaded on first use. This can
+        block for a second or more, so only touch it from a worker thread.
+        """
+        return self.get_model(self.model_name)
+
+    @model.setter
+    def model(self, model):
+        self._models[self.model_name] = model
+
+    @property
+    def model_loaded(self) -> bool:
+        return self.model_name in self._models
+
+    def get_model(self, name: str):
+        """The GenerativeModel for one tier, loaded on first use (blocking)."""
+        model = self._models.get(name)
+        return model if model is not None else self.load_model(name)
+
+    def set_model(self, name: str, model) -> None:
+        """Use a ready-made model object for a tier (benchmarks and tests)."""
+        self._models[name] = model
+
+    def load_model(self, name: str = None):
+        """
+        Import and configure the SDK and build a tier's model (the primary
+        by default). Blocking and thread-safe; raises ValueError when
+        GEMINI_API_KEY is missing.
+        """
+        name = name or self.model_name
+        with self._model_lock:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+            if not self.api_key:
+                raise ValueError("❌ GEMINI_API_KEY environment variable is missing.")
+            started = time.perf_counter()
+            import google.generativeai as genai
+
+            genai.configure(api_key=self.api_key)
+            model = genai.GenerativeModel(model_name=name)
+            self._models[name] = model
+            elapsed = time.perf_counter() - started
+            if name == self.model_name:
+                self.model_load_seconds = elapsed
+            logger.info("✅ Gemini model client %s ready in %.0f ms", name, elapsed * 1000)
+            return model
+
+    def start_warm_up(self) -> None:
+        """
+        Load the model client in the background. Local answers, the cache
+        and health checks are served while it loads.
+        """
+        if self.api_key and self._warm_up_task is None:
+            self._warm_up_task = asyncio.create_task(self._warm_up())
+
+    async def _warm_up(self) -> None:
+        try:
+            for name in self.model_names:
+                await asyncio.to_thread(self.load_model, name)
+        except Exception as e:
+            logger.error("❌ Gemini warm-up failed: %s", e)
+
+    def _generate_content(self, prompt: str, model_name: str = None, **kwargs):
+        # Runs on the executor, so a first-use model load happens off the loop
+        if self.generation_config:
+            kwargs.setdefault("generation_config", self.generation_config)
+        return self.get_model(model_name or self.model_name).generate_content(prompt, **kwargs)
+
+    async def _acquire_slot(self) -> None:
+        """
+        Wait for one of the max_concurrency slots on the Gemini call path.
+        The slot is given back by _run_in_slot once the SDK call's thread
+        is done.
+        """
+        self._waiting += 1
+        self._peak_waiting = max(self._peak_waiting, self._waiting)
+        try:
+            with stage_timer("model_queue"):
+                await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._in_flight += 1
+
+    def _release_slot(self) -> None:
+        self._in_flight -= 1
+        self._completed_calls += 1
+        self._semaphore.release()
+
+    def _run_in_slot(self, fn) -> Future:
+        """
+        Start `fn` on the Gemini executor in a slot already acquired. The
+        slot is released when the thread finishes, not when the caller
+        stops waiting: a timed-out, cancelled or abandoned await cannot
+        stop the SDK call, which keeps counting against max_concurrency.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(fn)
+        except BaseException:
+            self._release_slot()
+            raise
+        future.add_done_callback(lambda _: _call_soon(loop, self._release_slot))
+        return future
+
+    async def _call_model(self, prompt: str, model_name: str = None, **kwargs):
+        """
+        Run generate_content on the Gemini executor without blocking the event loop.
+        Raises asyncio.TimeoutError after GEMINI_TIMEOUT_SECONDS; the SDK call
+        itself cannot be interrupted and holds its slot until it returns.
+        """
+        await self._acquire_slot()
+        future = self._run_in_slot(partial(self._generate_content, prompt, model_name, **kwargs))
+        with stage_timer("model_call"):
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=GEMINI_TIMEOUT_SECONDS)
+
+    async def _call_tier(self, name: str, prompt: str):
+        """
+        One model call, recorded in that tier's stats.
+        """
+        stats = self.model_stats[name]
+        stats.calls += 1
+        started = time.perf_counter()
+        try:
+            response = await self._call_model(prompt, name)
+        except asyncio.CancelledError:
+            stats.cancelled += 1
+            raise
+        except Exception:
+            stats.errors += 1
+            raise
+        elapsed = time.perf_counter() - started
+        stats.record_latency(elapsed)
+        model_latency.observe(elapsed, model=name)
+        await self._record_tokens(prompt, response)
+        return response
+
+    async def _record_tokens(self, prompt: str, response=None, reply: str = None) -> None:
+        """
+        Count a finished call's tokens, as reported by Gemini or estimated.
+        """
+        try:
+            usage = await token_ledger.record(prompt, response, reply)
+        except Exception as e:
+            # Accounting must never cost the customer their reply
+            logger.warning("Token accounting failed: %s", e)
+            return
+        gemini_tokens.inc(usage["input"], direction="input")
+        gemini_tokens.inc(usage["output"], direction="output")
+
+    async def _call_tiers(self, prompt: str) -> tuple:
+        """
+        Call the primary model, hedging to the next tier when a call runs
+        past that tier's usual latency and failing over when it errors.
+        Returns (response, model name) for the first reply; calls still
+        running are cancelled. Raises the first error if every call fails.
+        """
+        names = self.model_names
+        if len(names) == 1:
+            return await self._call_tier(names[0], prompt), names[0]
+
+        self.hedge_policy.credit()
+        running = {}
+        errors = []
+        hedging = True
+        launched_at = 0.0
+
+        def launch():
+            nonlocal launched_at
+            name = names[len(running) + len(errors)]
+            running[asyncio.ensure_future(self._call_tier(name, prompt))] = name
+            launched_at = time.perf_counter()
+
+        launch()
+        try:
+            while running:
+                next_tier = len(running) + len(errors)
+                timeout = None
+                if hedging and next_tier < len(names):
+                    newest = names[next_tier - 1]
+                    elapsed = time.perf_counter() - launched_at
+                    timeout = max(0.0, self.hedge_policy.delay(self.model_stats[newest]) - elapsed)
+
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than usual: race the next tier
+                    if await self._admit_hedge():
+                        launch()
+                    else:
+                        hedging = False
+                    continue
+
+                for task in done:
+                    name = running.pop(task)
+                    if task.exception() is None:
+                        self.model_stats[name].wins += 1
+                        if name != names[0]:
+                            hedges_total.inc(outcome="won")
+                        return task.result(), name
+                    errors.append(task.exception())
+
+                # Everything sent so far failed: try the next tier now,
+                # unless the error says no model will do better
+                next_tier = len(running) + len(errors)
+                if (not running and hedging and next_tier < len(names)
+                        and self._classify_error(errors[-1]) not in ("quota_exceeded", "permission_denied")
+                        and await self._admit_hedge()):
+                    logger.warning("%s failed; trying %s", names[next_tier - 1], names[next_tier])
+                    launch()
+            raise errors[0]
+        finally:
+            for task in running:
+                if task.done() and not task.cancelled():
+                    task.exception()
+                task.cancel()
+
+    async def _admit_hedge(self) -> bool:
+        """
+        Whether an extra call to the next tier may go out: it needs hedge
+        budget, quota headroom, and free slots on the call path.
+        """
+        policy = self.hedge_policy
+        if self._waiting or not policy.try_spend():
+            refused = True
+        elif await usage_tracker.admit(None, reserve=HEDGE_QUOTA_RESERVE):
+            policy.refund()
+            refused = True
+        else:
+            refused = False
+        if refused:
+            policy.skipped += 1
+            hedges_total.inc(outcome="skipped")
+            return False
+        policy.launched += 1
+        hedges_total.inc(outcome="launched")
+        return True
+
+    async def _stream_model(self, prompt: str, **kwargs):
+        """
+        Relay chunks of a streaming generate_content call as they arrive.
+        The blocking iteration runs on the Gemini executor and hands each
+        chunk back to the event loop through a queue. Raises
+        asyncio.TimeoutError if no chunk arrives within GEMINI_TIMEOUT_SECONDS.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        finished = object()
+        if self.generation_config:
+            kwargs.setdefault("generation_config", self.generation_config)
+        # The last chunk carries the usage metadata for the whole stream
+        last_chunk = [None]
+        parts = []
+
+        def produce():
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True, **kwargs):
+                    if stop.is_set():
+                        break
+                    last_chunk[0] = chunk
+                    text = chunk.text
+                    if text:
+                        loop.call_soon_threadsafe(queue.put_nowait, text)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, finished)
+
+        await self._acquire_slot()
+        self._run_in_slot(produce)
+        try:
+            with stage_timer("model_call"):
+                while True:
+                    item = await asyncio.wait_for(queue.get(), timeout=GEMINI_TIMEOUT_SECONDS)
+                    if item is finished:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    parts.append(item)
+                    yield item
+        finally:
+            # Stop the producer early if the client went away; its slot
+            # is freed once the thread notices
+            stop.set()
+        await self._record_tokens(prompt, last_chunk[0], "".join(parts))
+
+    def get_model_stats(self) -> dict:
+        """
+        Per-tier latency and win rate, and the hedging budget.
+        """
+        return {
+            "tiers": self.model_names,
+            "models": {name: stats.snapshot() for name, stats in self.model_stats.items()},
+            "hedging": self.hedge_policy.snapshot() if len(self.model_names) > 1 else None,
+        }
+
+    def get_concurrency_stats(self) -> dict:
+        """
+        Report the current load on the Gemini call path.
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "queue_depth": self._waiting,
+            "peak_queue_depth": self._peak_waiting,
+            "completed_calls": self._completed_calls,
+            "model_loaded": self.model_loaded,
+            "model_load_ms": round(self.model_load_seconds * 1000, 1) if self.model_load_seconds else None,
+        }
 
     async def generate_response(self, user_message: str) -> str:
         """
         Generate AI-powered response using Gemini model,
         integrating restaurant-specific context with user input.
         """
+        reply, _ = await self._generate(user_message)
+        return reply
+
+    @property
+    def restaurant_context(self) -> str:
+        """
+        The current rendered restaurant context (follows hot reloads).
+        """
+        return restaurant_context.get_full_context()
+
+    def _build_prompt(self, user_message: str, snapshot: ContextSnapshot = None,
+                      history: str = "") -> str:
+        """
+        Combine the restaurant context, whether we're open right now, any
+        recent conversation and the customer's question.
+        """
+        with stage_timer("prompt_build"):
+            snapshot = snapshot or restaurant_context.snapshot
+            context = context_retriever.build_context(snapshot, user_message)
+            prompt = self._assemble_prompt(context, user_message, history)
+            if self.max_input_tokens > 0 and estimate_tokens(prompt) > self.max_input_tokens:
+                prompt = self._fit_prompt(snapshot, context, user_message, history)
+        prompt_tokens.observe(estimate_tokens(prompt))
+        return prompt
+
+    def _try_build_prompt(self, user_message: str, snapshot: ContextSnapshot,
+                          history: str) -> Optional[str]:
+        """
+        The prompt, or None if building it failed. That is a local bug or
+        bad data, not a Gemini failure, so it is logged here and never
+        reaches the circuit breaker or the Gemini error counters.
+        """
         try:
-            # Increment request counter
-            self.request_count += 1
-            
-            full_prompt = f"""{self.restaurant_context}
+            return self._build_prompt(user_message, snapshot, history)
+        except Exception:
+            logger.exception("Could not build the prompt; answering locally")
+            return None
+
+    @staticmethod
+    def _assemble_prompt(context: str, user_message: str, history: str = "") -> str:
+        # The status line is worked out here so the model never does time arithmetic
+        context += f"\n{hours_engine.status_line()}\n"
+        if history:
+            context += f"\nRecent conversation with this customer:\n{history}\n"
+        return f"""{context}
 
 Customer Question: {user_message}
 
 Please provide a helpful, friendly response as a restaurant staff member. Keep it concise and informative.
 
 Response:"""
-            
+
+    def _fit_prompt(self, snapshot: ContextSnapshot, context: str, user_message: str,
+                    history: str) -> str:
+        """
+        Cut a prompt down to max_input_tokens: drop the oldest history
+        turns first, then the least relevant context chunks.
+        """
+        token_ledger.record_truncation()
+        turns = _HISTORY_TURN.split(history) if history else []
+        while turns:
+            turns.pop(0)
+            history = "\n".join(turns)
+            prompt = self._assemble_prompt(context, user_message, history)
+            if estimate_tokens(prompt) <= self.max_input_tokens:
+                return prompt
+
+        overhead = estimate_tokens(self._assemble_prompt("", user_message))
+        context = context_retriever.fit_context(snapshot, user_message, self.max_input_tokens - overhead)
+        prompt = self._assemble_prompt(context, user_message)
+        if estimate_tokens(prompt) > self.max_input_tokens:
+            logger.warning("Prompt still over the input budget after trimming (%d tokens)", estimate_tokens(prompt))
+        return prompt
+
+    @staticmethod
+    def _classify_error(error: Exception) -> str:
+        """
+        Map a Gemini exception onto a coarse error type.
+        """
+        if isinstance(error, asyncio.TimeoutError):
+            return "timeout"
+        error_str = str(error)
+        if "429" in error_str or "quota" in error_str.lower():
+            return "quota_exceeded"
+        elif "403" in error_str:
+            return "permission_denied"
+        elif "500" in error_str or "503" in error_str:
+            return "server_error"
+        else:
+            return "unknown"
+
+    def _get_error_response(self, error_type: str) -> str:
+        """
+        Canned customer-facing reply for an error type.
+        """
+        if error_type == "quota_exceeded":
+            return self._get_quota_exceeded_response()
+        elif error_type == "permission_denied":
+            return self._get_permission_error_response()
+        elif error_type in ("server_error", "timeout"):
+            return self._get_server_error_response()
+        else:
+            return self._get_fallback_response()
+
+    async def request_count(self) -> int:
+        """
+        Gemini calls made in the last 24 hours.
+        """
+        return await usage_tracker.requests_last_day()
+
+    async def _record_failure(self, error: Exception) -> str:
+        """
+        Classify a Gemini error and report it to health and quota tracking.
+        """
+        error_type = self._classify_error(error)
+        gemini_errors_total.inc(error_type=error_type)
+        health_monitor.record_failure(error_type, str(error))
+        if error_type == "quota_exceeded":
+            await usage_tracker.record_quota_error()
+        return error_type
+
+    async def _generate(self, user_message: str, snapshot: ContextSnapshot = None,
+                        user_id: str = None, history: str = "") -> tuple:
+        """
+        Call Gemini and return (reply, from_model).
+        from_model is False when the reply is one of the canned error responses
+        or a local fallback, so callers know not to cache it.
+        """
+        # No API key configured: local data is all we have
+        if not self.api_key:
+            return self.get_mock_response(user_message), False
+
+        # Gemini is failing: don't wait on a call that will most likely fail too
+        ticket = circuit_breaker.acquire()
+        if ticket is None:
+            logger.warning("Circuit breaker open; answering locally")
+            return self.get_mock_response(user_message), False
+
+        prompt = self._try_build_prompt(user_message, snapshot, history)
+        if prompt is None:
+            circuit_breaker.release(ticket)
+            return self.get_mock_response(user_message), False
+
+        # Over quota: answer locally instead of making a call that would fail
+        rejected = await usage_tracker.admit(user_id)
+        if rejected:
+            circuit_breaker.release(ticket)
+            logger.warning("Gemini call refused (%s); answering locally", rejected)
+            return self.get_mock_response(user_message), False
+
+        try:
             # Use Gemini to generate a reply
-            response = self.model.generate_content(full_prompt)
+            response, model_name = await self._call_tiers(prompt)
+            if model_name != self.model_name:
+                logger.info("Answered by %s", model_name)
+        except asyncio.CancelledError:
+            circuit_breaker.release(ticket)
+            raise
+        except Exception as e:
+            logger.error("❌ Gemini Error in generate_response: %s", e)
+            error_type = await self._record_failure(e)
+            circuit_breaker.record_failure(ticket, error_type)
+            return self._get_error_response(error_type), False
+
+        circuit_breaker.record_success(ticket)
+        health_monitor.record_success()
+        try:
             if response and response.text:
-                return response.text.strip()
+                return response.text.strip(), True
             else:
-                return self._get_empty_response()
-                
+                return self._get_empty_response(), False
         except Exception as e:
-            logging.error(f"❌ Gemini Error in generate_response: {e}")
-            error_str = str(e)
-            if "429" in error_str or "quota" in error_str.lower():
-                return self._get_quota_exceeded_response()
-            elif "403" in error_str:
-                return self._get_permission_error_response()
-            elif "500" in error_str or "503" in error_str:
-                return self._get_server_error_response()
-            else:
-                return self._get_fallback_response()
+            # Blocked or malformed candidates: the backend itself answered fine
+            logger.error("❌ Gemini returned no usable text: %s", e)
+            return self._get_fallback_response(), False
 
     def _get_quota_exceeded_response(self) -> str:
         """
@@ -117,111 +637,144 @@ Response:"""
 
     def get_mock_response(self, user_message: str) -> str:
         """
-        Temporary mock responses for testing when API is down.
-        Remove this method when API is working properly.
-        """
-        message_lower = user_message.lower()
-        
-        if any(word in message_lower for word in ["vegan", "plant-based", "vegetarian"]):
-            return (
-                "Yes, we do! We offer vegan options for most dishes upon request. "
-                "To ensure we can accommodate your preferences perfectly, please speak "
-                "directly with one of our staff members when you place your order. "
-                "They can help you choose the best vegan options available."
-            )
-        elif any(word in message_lower for word in ["menu", "food", "dishes"]):
-            return (
-                "We have a diverse menu featuring local and international cuisine! "
-                "Our specialties include fresh seafood, grilled meats, pasta dishes, "
-                "and healthy salad options. Would you like to know about any specific "
-                "category or dietary requirements?"
-            )
-        elif any(word in message_lower for word in ["hours", "open", "time"]):
-            return (
-                "We're open Monday through Sunday! Our hours are 11:00 AM to 10:00 PM "
-                "Monday-Thursday, and 11:00 AM to 11:00 PM Friday-Sunday. "
-                "We'd love to see you soon!"
-            )
-        elif any(word in message_lower for word in ["reservation", "booking", "table"]):
-            return (
-                "We'd be happy to help you make a reservation! You can call us at "
-                "+1 (555) 123-CAFE or email hello@caficafe.com. We recommend booking "
-                "in advance, especially for weekend dining."
-            )
-        elif any(word in message_lower for word in ["location", "address", "where"]):
-            return (
-                "We're conveniently located in the heart of the city! "
-                "Please contact us at +1 (555) 123-CAFE or hello@caficafe.com "
-                "for our exact address and directions."
-            )
-        else:
-            return (
-                "Thank you for your question! For the most accurate and detailed information, "
-                "please contact us at +1 (555) 123-CAFE or hello@caficafe.com. "
-                "Our friendly staff will be happy to assist you!"
-            )
+        Local answer built from the restaurant data, used when the API is down.
+        """
+        with stage_timer("fallback"):
+            return intent_engine.fallback_answer(user_message)
 
-    async def generate_response_with_fallback(self, user_message: str) -> str:
+    async def generate_response_with_fallback(self, user_message: str, user_id: str = None) -> str:
         """
-        Generate response with mock fallback for testing or API failures.
+        Answer through the shared chat pipeline (app/pipeline.py), falling
+        back to local answers when Gemini is unavailable. Raises ValueError
+        if the message fails validation.
         """
-        print(f"DEBUG: Generating response for: {user_message}")  # Debug print
-        logging.info(f"Generating response for: {user_message}")
-        try:
-            return await self.generate_response(user_message)
-        except Exception as e:
-            logging.error(f"❌ Falling back due to: {e}")
-            print(f"DEBUG: Falling back with mock response for: {user_message}")  # Debug print
-            return self.get_mock_response(user_message)
+        # Imported here: the pipeline module builds on this one
+        from .pipeline import chat_pipeline
 
-    def validate_api_key(self) -> bool:
+        turn = await chat_pipeline.run(user_message, user_id)
+        return turn.reply
+
+    async def _generate_shared(self, user_message: str, snapshot: ContextSnapshot,
+                               cache_key: str, user_id: str = None) -> tuple:
         """
-        Test if the API key and model are working correctly.
+        Generate through single flight and cache the reply if it came from
+        the model. Returns (reply, from_model).
         """
+        async def generate():
+            reply, from_model = await self._generate(user_message, snapshot, user_id)
+            if from_model:
+                await response_cache.set(cache_key, reply)
+                paraphrase_index.add(user_message, reply, hours_engine.context_key(snapshot))
+            return reply, from_model
+
+        # Identical questions arriving together share one Gemini call
         try:
-            self.model.generate_content("Test prompt")
-            return True
+            return await single_flight.do(cache_key, generate)
         except Exception as e:
-            logging.error(f"❌ API validation failed: {e}")
-            return False
+            logger.error("❌ Falling back due to: %s", e)
+            return self.get_mock_response(user_message), False
+
+    async def generate_response_stream(self, user_message: str, user_id: str = None):
+        """
+        Stream a reply through the shared chat pipeline as a sequence of
+        events (see ChatPipeline.stream). Raises ValueError if the message
+        fails validation.
+        """
+        from .pipeline import chat_pipeline
+
+        async for event in chat_pipeline.stream(user_message, user_id):
+            yield event
 
-    def get_api_status(self) -> dict:
+    async def _stream_reply(self, user_message: str, snapshot: ContextSnapshot,
+                            cache_key: str = None, user_id: str = None, history: str = ""):
         """
-        Check the current status of the Gemini API.
+        The model stage of a streamed reply: yields "chunk" events as Gemini
+        sends them (source model, coalesced, or fallback when over quota or
+        the circuit breaker is open) and an "error" event if the call fails.
+        With a `cache_key` the reply is shared: it joins an identical
+        question already in flight and is cached once complete.
         """
+        # Someone is already generating this exact answer; wait for theirs
+        if cache_key is not None and single_flight.in_flight(cache_key):
+            reply, from_model = await single_flight.wait(cache_key)
+            if from_model:
+                yield {"event": "chunk", "text": reply, "source": "coalesced"}
+            else:
+                yield {"event": "error", "error_type": "upstream", "text": reply, "partial": False}
+            return
+
+        ticket = circuit_breaker.acquire() if self.api_key else None
+        if ticket is None:
+            if self.api_key:
+                logger.warning("Circuit breaker open; answering locally")
+            yield {"event": "chunk", "text": self.get_mock_response(user_message), "source": "fallback"}
+            return
+
+        prompt = self._try_build_prompt(user_message, snapshot, history)
+        if prompt is None:
+            circuit_breaker.release(ticket)
+            yield {"event": "chunk", "text": self.get_mock_response(user_message), "source": "fallback"}
+            return
+
+        rejected = await usage_tracker.admit(user_id)
+        if rejected:
+            circuit_breaker.release(ticket)
+            logger.warning("Gemini call refused (%s); answering locally", rejected)
+            yield {"event": "chunk", "text": self.get_mock_response(user_message), "source": "fallback"}
+            return
+
+        parts = []
         try:
-            test_response = self.model.generate_content("Hello")
-            return {
-                "status": "working",
-                "api_available": True,
-                "test_response": test_response.text[:50] + "..." if test_response.text else "Empty",
-                "request_count": self.request_count
-            }
+            async for text in self._stream_model(prompt):
+                parts.append(text)
+                yield {"event": "chunk", "text": text, "source": "model"}
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away mid-stream: no verdict on Gemini's health
+            circuit_breaker.release(ticket)
+            raise
         except Exception as e:
-            error_str = str(e)
-            status = {
-                "status": "error",
-                "api_available": False,
-                "error": error_str,
-                "request_count": self.request_count
+            logger.error("❌ Gemini Error in generate_response_stream: %s", e)
+            error_type = await self._record_failure(e)
+            circuit_breaker.record_failure(ticket, error_type)
+            yield {
+                "event": "error",
+                "error_type": error_type,
+                "text": self._get_error_response(error_type),
+                "partial": bool(parts),
             }
-            if "429" in error_str or "quota" in error_str.lower():
-                status["error_type"] = "quota_exceeded"
-            elif "403" in error_str:
-                status["error_type"] = "permission_denied"
-            else:
-                status["error_type"] = "unknown"
-            return status
+            return
+
+        circuit_breaker.record_success(ticket)
+        health_monitor.record_success()
+        reply = "".join(parts).strip()
+        if reply:
+            if cache_key is not None:
+                await response_cache.set(cache_key, reply)
+                paraphrase_index.add(user_message, reply, hours_engine.context_key(snapshot))
+        else:
+            yield {"event": "error", "error_type": "empty", "text": self._get_empty_response(), "partial": False}
 
-    def reset_daily_counter(self):
+    async def probe(self) -> None:
         """
-        Reset the daily request counter (call this daily or when quota resets).
+        Cheap liveness probe for the background health monitor.
+        Fetches the model's metadata, which checks the key and connectivity
+        without spending generation quota. Raises on failure.
         """
-        current_date = datetime.now().date()
-        if current_date > self.last_reset:
-            self.request_count = 0
-            self.last_reset = current_date
-            print("✅ Daily request counter reset")
+        await asyncio.to_thread(self._probe_sync)
+
+    def _probe_sync(self) -> None:
+        self.load_model()
+        import google.generativeai as genai
+
+        genai.get_model(self.model_name)
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback) -> None:
+    """Run `callback` on `loop` from an executor thread."""
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        # The loop has closed (shutdown) while the call was still running
+        pass
 
 # Single instance for FastAPI
 gemini_client = GeminiClient()
\ No newline at end of file
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from .config import (
+    HEALTH_PROBE_INTERVAL_SECONDS,
+    HEALTH_PROBE_MAX_BACKOFF_SECONDS,
+    HEALTH_PROBE_TIMEOUT_SECONDS,
+    HEALTH_STALE_AFTER_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.utcfromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+class HealthMonitor:
+    """
+    Keeps a cached snapshot of Gemini's health.
+
+    A background task runs the probe every `interval` seconds, backing off
+    exponentially (up to `max_backoff`) while it keeps failing. Real chat
+    calls also report their outcome, so a quota error from traffic shows up
+    without waiting for the next probe. Health endpoints read the snapshot
+    and never call the API themselves.
+    """
+
+    def __init__(self, interval: float, max_backoff: float, timeout: float, stale_after: float):
+        self.interval = interval
+        self.max_backoff = max(max_backoff, interval)
+        self.timeout = timeout
+        self.stale_after = stale_after
+
+        self.api_available: Optional[bool] = None
+        self.last_checked: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_error_type: Optional[str] = None
+        self.last_source: Optional[str] = None
+        self.consecutive_failures = 0
+        self.probes = 0
+        self.next_probe_at: Optional[float] = None
+
+        self.started_at = time.time()
+        self._probe: Optional[Callable[[], Awaitable[None]]] = None
+        self._classify: Callable[[Exception], str] = lambda e: "unknown"
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(
+        self,
+        probe: Callable[[], Awaitable[None]],
+        classify_error: Callable[[Exception], str],
+    ) -> None:
+        """Start probing in the background."""
+        self._probe = probe
+        self._classify = classify_error
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the background probe task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def probe_once(self) -> bool:
+        """Run the probe now and update the snapshot."""
+        self.probes += 1
+        try:
+            await asyncio.wait_for(self._probe(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.record_failure("timeout", f"Probe timed out after {self.timeout}s", source="probe")
+            return False
+        except Exception as e:
+            self.record_failure(self._classify(e), str(e), source="probe")
+            return False
+        self.record_success(source="probe")
+        return True
+
+    def record_success(self, source: str = "traffic") -> None:
+        now = time.time()
+        self.api_available = True
+        self.last_checked = now
+        self.last_success = now
+        self.last_source = source
+        self.consecutive_failures = 0
+
+    def record_failure(self, error_type: str, error: str, source: str = "traffic") -> None:
+        self.api_available = False
+        self.last_checked = time.time()
+        self.last_error = error
+        self.last_error_type = error_type
+        self.last_source = source
+        self.consecutive_failures += 1
+
+    def age_seconds(self) -> Optional[float]:
+        if self.last_checked is None:
+            return None
+        return time.time() - self.last_checked
+
+    def is_stale(self) -> bool:
+        age = self.age_seconds()
+        return age is None or age > self.stale_after
+
+    def is_healthy(self) -> bool:
+        """Healthy when the latest known status is good and not stale."""
+        return bool(self.api_available) and not self.is_stale()
+
+    @property
+    def running(self) -> bool:
+        """Whether the background probe task is alive."""
+        return self._task is not None and not self._task.done()
+
+    def gemini_api_status(self) -> str:
+        if self.api_available is None:
+            return "unknown"
+        return "connected" if self.api_available else "disconnected"
+
+    def snapshot(self) -> dict:
+        """The cached status, with how old it is."""
+        age = self.age_seconds()
+        next_probe_in = None
+        if self.next_probe_at is not None:
+            next_probe_in = round(max(0.0, self.next_probe_at - time.time()), 1)
+        return {
+            "gemini_api": self.gemini_api_status(),
+            "api_available": self.api_available,
+            "healthy": self.is_healthy(),
+            "last_checked": _iso(self.last_checked),
+            "age_seconds": round(age, 1) if age is not None else None,
+            "stale": self.is_stale(),
+            "last_success": _iso(self.last_success),
+            "last_error": self.last_error,
+            "last_error_type": self.last_error_type,
+            "last_source": self.last_source,
+            "consecutive_failures": self.consecutive_failures,
+            "probes": self.probes,
+            "next_probe_in_seconds": next_probe_in,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+        }
+
+    def _next_delay(self) -> float:
+        if self.consecutive_failures == 0:
+            return self.interval
+        return min(self.interval * (2 ** self.consecutive_failures), self.max_backoff)
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe_once()
+            delay = self._next_delay()
+            self.next_probe_at = time.time() + delay
+            if self.consecutive_failures:
+                logger.warning(
+                    "Gemini health probe failing (%s); next probe in %.0fs", self.last_error_type, delay
+                )
+            await asyncio.sleep(delay)
+
+
+# Global instance
+health_monitor = HealthMonitor(
+    interval=HEALTH_PROBE_INTERVAL_SECONDS,
+    max_backoff=HEALTH_PROBE_MAX_BACKOFF_SECONDS,
+    timeout=HEALTH_PROBE_TIMEOUT_SECONDS,
+    stale_after=HEALTH_STALE_AFTER_SECONDS,
+)
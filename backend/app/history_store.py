@@ -0,0 +1,358 @@
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional, Tuple
+
+from .config import (
+    HISTORY_DB,
+    HISTORY_IDLE_SECONDS,
+    HISTORY_MAX_MEMORY_BYTES,
+    HISTORY_MAX_SESSIONS,
+    HISTORY_MAX_TURNS,
+    HISTORY_RETENTION_SECONDS,
+    HISTORY_TOKEN_BUDGET,
+)
+from .context_retrieval import estimate_tokens
+from .text import words
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Pronouns that point back at an earlier turn when they lead a question:
+# "is it vegan?", "how much are they?"
+_REFERENCES = frozenset({
+    "it", "its", "that", "this", "these", "those", "they", "them", "their",
+})
+
+# How many opening words a pronoun may follow and still lead the question
+_LEADING_WORDS = 4
+
+# Phrases that point back wherever they appear: "is the other one spicy?"
+_REFERENCE_PHRASES = (
+    "that one", "this one", "those ones", "the other", "the same", "another one",
+    "which one", "instead", "about it", "about that", "about those", "about them",
+)
+
+# "this weekend" or "that evening" refer to a time, not to an earlier turn
+_TIME_WORDS = frozenset({
+    "morning", "afternoon", "evening", "night", "weekend", "week", "month",
+    "year", "time", "day", "saturday", "sunday", "friday",
+})
+
+# Openings that continue the previous question: "and the price?"
+_CONTINUATIONS = ("and", "but", "also", "what about", "how about")
+
+# Longest question/answer quoted back into a prompt
+MAX_PROMPT_CHARS = 240
+
+# Rough per-turn overhead (tuple, floats, string headers) for the memory cap
+_TURN_OVERHEAD_BYTES = 200
+
+# Old rows are purged from disk once every this many writes
+_PURGE_EVERY = 200
+
+# One exchange: (timestamp, customer message, reply)
+Turn = Tuple[float, str, str]
+
+
+def _clip(text: str, limit: int) -> str:
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def is_follow_up(message: str) -> bool:
+    """
+    Whether a message only makes sense next to the conversation before it:
+    it opens with a pronoun ("is it vegan?"), names an earlier answer
+    ("how much is that one?") or carries on from the last question ("and
+    the price?"). Short questions like "opening hours" stand alone.
+    Self-contained questions are answered without the history, so they
+    can be shared through the cache and coalescing.
+    """
+    tokens = words(message)
+    if not tokens:
+        return False
+    opening = " ".join(tokens[:2])
+    if any(opening == phrase or tokens[0] == phrase for phrase in _CONTINUATIONS):
+        return True
+    text = f" {' '.join(tokens)} "
+    if any(f" {phrase} " in text for phrase in _REFERENCE_PHRASES):
+        return True
+    for i, word in enumerate(tokens[:_LEADING_WORDS]):
+        if word in _REFERENCES:
+            following = tokens[i + 1] if i + 1 < len(tokens) else ""
+            if word in ("this", "that") and following in _TIME_WORDS:
+                continue
+            return True
+    return False
+
+
+class Session:
+    """The last `max_turns` exchanges for one user, in a ring buffer."""
+
+    __slots__ = ("turns", "size", "last_seen")
+
+    def __init__(self, max_turns: int):
+        self.turns: deque = deque(maxlen=max_turns)
+        self.size = 0
+        self.last_seen = time.time()
+
+    def append(self, turn: Turn) -> int:
+        """Add a turn and return the change in estimated bytes."""
+        before = self.size
+        if len(self.turns) == self.turns.maxlen:
+            self.size -= _turn_size(self.turns[0])
+        self.turns.append(turn)
+        self.size += _turn_size(turn)
+        self.last_seen = turn[0]
+        return self.size - before
+
+
+def _turn_size(turn: Turn) -> int:
+    return len(turn[1]) + len(turn[2]) + _TURN_OVERHEAD_BYTES
+
+
+class HistoryStore:
+    """
+    Recent conversation turns per user.
+
+    Sessions live in an OrderedDict kept in last-used order, so lookup,
+    append and eviction are all O(1). Sessions idle for `idle_seconds` are
+    dropped, and the least recently used go first whenever the store grows
+    past `max_sessions` or `max_memory_bytes`. With a database path set,
+    turns are also written to SQLite so a session evicted from memory (or
+    lost to a restart) is reloaded on its next message.
+    """
+
+    def __init__(self, max_turns: int, max_sessions: int, max_memory_bytes: int,
+                 idle_seconds: float, token_budget: int, db_path: Optional[str],
+                 retention_seconds: float):
+        self.max_turns = max(1, max_turns)
+        self.max_sessions = max(1, max_sessions)
+        self.max_memory_bytes = max_memory_bytes
+        self.idle_seconds = idle_seconds
+        self.token_budget = token_budget
+        self.db_path = db_path or None
+        self.retention_seconds = retention_seconds
+
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._memory_bytes = 0
+        self._local = threading.local()
+        self._writes = 0
+
+        self.appends = 0
+        self.disk_loads = 0
+        self.idle_evictions = 0
+        self.pressure_evictions = 0
+        self.disk_errors = 0
+
+        if self.db_path:
+            try:
+                self._init_db()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Disabling chat history persistence (%s): %s", self.db_path, e)
+                self.db_path = None
+
+    async def get_turns(self, user_id: str) -> List[Turn]:
+        """Every stored turn for a user, oldest first, as it was recorded."""
+        session = await self._session(user_id)
+        return list(session.turns) if session is not None else []
+
+    async def append(self, user_id: str, message: str, reply: str) -> None:
+        """Record one exchange for a user."""
+        turn = (time.time(), message, reply)
+        session = await self._session(user_id, create=True)
+        self._memory_bytes += session.append(turn)
+        self.appends += 1
+        self._enforce_limits()
+        if self.db_path:
+            await asyncio.to_thread(self._disk_append, user_id, turn)
+
+    async def clear(self, user_id: str) -> None:
+        """Forget a user's conversation."""
+        session = self._sessions.pop(user_id, None)
+        if session is not None:
+            self._memory_bytes -= session.size
+        if self.db_path:
+            await asyncio.to_thread(self._disk_clear, user_id)
+
+    async def render_for_prompt(self, user_id: Optional[str]) -> str:
+        """
+        The most recent turns that fit in the token budget, oldest first,
+        with long messages shortened. Empty when there is no history.
+        """
+        if not user_id or self.token_budget <= 0:
+            return ""
+        session = await self._session(user_id)
+        if session is None:
+            return ""
+        lines = []
+        used = 0
+        for _, message, reply in reversed(session.turns):
+            line = (
+                f"Customer: {_clip(message, MAX_PROMPT_CHARS)}\n"
+                f"Staff: {_clip(reply, MAX_PROMPT_CHARS)}"
+            )
+            cost = estimate_tokens(line)
+            if used + cost > self.token_budget:
+                break
+            lines.append(line)
+            used += cost
+        return "\n".join(reversed(lines))
+
+    def get_stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "memory_bytes": self._memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "max_turns": self.max_turns,
+            "token_budget": self.token_budget,
+            "disk_enabled": self.db_path is not None,
+            "appends": self.appends,
+            "disk_loads": self.disk_loads,
+            "idle_evictions": self.idle_evictions,
+            "pressure_evictions": self.pressure_evictions,
+            "disk_errors": self.disk_errors,
+        }
+
+    # ------------------------------------------------------------------
+    # Memory tier
+    # ------------------------------------------------------------------
+    async def _session(self, user_id: str, create: bool = False) -> Optional[Session]:
+        """
+        A user's session, loaded from disk if need be. Without `create`,
+        a user with no turns gets None and nothing is stored for them.
+        """
+        self._evict_idle()
+        session = self._sessions.get(user_id)
+        if session is not None:
+            session.last_seen = time.time()
+            self._sessions.move_to_end(user_id)
+            return session
+
+        session = Session(self.max_turns)
+        if self.db_path:
+            turns = await asyncio.to_thread(self._disk_load, user_id)
+            # Another request may have created it while we were on disk
+            existing = self._sessions.get(user_id)
+            if existing is not None:
+                self._sessions.move_to_end(user_id)
+                return existing
+            if turns:
+                self.disk_loads += 1
+                for turn in turns:
+                    session.append(turn)
+                session.last_seen = time.time()
+        if not create and not session.turns:
+            return None
+        self._sessions[user_id] = session
+        self._memory_bytes += session.size
+        self._enforce_limits()
+        return session
+
+    def _evict_idle(self) -> None:
+        cutoff = time.time() - self.idle_seconds
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_seen > cutoff:
+                break
+            self._drop_oldest()
+            self.idle_evictions += 1
+
+    def _enforce_limits(self) -> None:
+        # Never evict the session just used (it is last in the order)
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions
+            or self._memory_bytes > self.max_memory_bytes
+        ):
+            self._drop_oldest()
+            self.pressure_evictions += 1
+
+    def _drop_oldest(self) -> None:
+        _, session = self._sessions.popitem(last=False)
+        self._memory_bytes -= session.size
+
+    # ------------------------------------------------------------------
+    # Disk tier
+    # ------------------------------------------------------------------
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_history ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, "
+            "created_at REAL NOT NULL, message TEXT NOT NULL, reply TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS chat_history_user ON chat_history (user_id, id)"
+        )
+        conn.commit()
+
+    def _disk_load(self, user_id: str) -> List[Turn]:
+        try:
+            rows = self._connection().execute(
+                "SELECT created_at, message, reply FROM chat_history "
+                "WHERE user_id = ? AND created_at > ? ORDER BY id DESC LIMIT ?",
+                (user_id, time.time() - self.retention_seconds, self.max_turns),
+            ).fetchall()
+            return [tuple(row) for row in reversed(rows)]
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning("Chat history read failed: %s", e)
+            return []
+
+    def _disk_append(self, user_id: str, turn: Turn) -> None:
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO chat_history (user_id, created_at, message, reply) VALUES (?, ?, ?, ?)",
+                (user_id, *turn),
+            )
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                conn.execute(
+                    "DELETE FROM chat_history WHERE created_at <= ?",
+                    (time.time() - self.retention_seconds,),
+                )
+            conn.commit()
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning("Chat history write failed: %s", e)
+
+    def _disk_clear(self, user_id: str) -> None:
+        try:
+            conn = self._connection()
+            conn.execute("DELETE FROM chat_history WHERE user_id = ?", (user_id,))
+            conn.commit()
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning("Chat history delete failed: %s", e)
+
+
+# Global instance
+history_store = HistoryStore(
+    max_turns=HISTORY_MAX_TURNS,
+    max_sessions=HISTORY_MAX_SESSIONS,
+    max_memory_bytes=HISTORY_MAX_MEMORY_BYTES,
+    idle_seconds=HISTORY_IDLE_SECONDS,
+    token_budget=HISTORY_TOKEN_BUDGET,
+    db_path=HISTORY_DB,
+    retention_seconds=HISTORY_RETENTION_SECONDS,
+)
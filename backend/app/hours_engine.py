@@ -0,0 +1,368 @@
+import logging
+import re
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from .config import RESTAURANT_TIMEZONE
+from .restaurant_context import ContextSnapshot, RestaurantContext, restaurant_context
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = Exception
+
+logger = logging.getLogger(__name__)
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+_DAY_LOOKUP = {day: i for i, day in enumerate(DAYS)}
+_DAY_LOOKUP.update({day[:3]: i for i, day in enumerate(DAYS)})
+
+MINUTES_PER_DAY = 1440
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Bits of the per-minute flags; special windows (happy hour...) use the rest
+OPEN = 1
+KITCHEN = 2
+MAX_WINDOWS = 6
+
+_TIME = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*([ap])\.?\s*m\.?", re.IGNORECASE)
+_KITCHEN_NOTE = re.compile(r"kitchen closes (\d+) minutes? before", re.IGNORECASE)
+# "Happy hour: Monday-Friday 3:00 PM - 6:00 PM"
+_WINDOW_NOTE = re.compile(
+    r"^\s*(?P<label>[a-z][a-z ]*?)\s*:\s*(?P<days>[a-z]+(?:\s*-\s*[a-z]+)?)\s+(?P<times>.+)$",
+    re.IGNORECASE,
+)
+
+
+def parse_time(text: str) -> Optional[int]:
+    """ "8:00 AM" -> 480 (minutes after midnight); None if it is not a time."""
+    match = _TIME.search(text)
+    if not match:
+        return None
+    hour, minute = int(match.group(1)) % 12, int(match.group(2) or 0)
+    if match.group(3).lower() == "p":
+        hour += 12
+    return hour * 60 + minute
+
+
+def parse_range(text: str) -> Optional[Tuple[int, int]]:
+    """
+    "8:00 AM - 10:00 PM" -> (480, 1320). A closing time at or before the
+    opening time runs past midnight. None for "Closed" or anything unparsable.
+    """
+    text = (text or "").strip().lower()
+    if not text or "closed" in text:
+        return None
+    if "24 hours" in text or "24h" in text:
+        return 0, MINUTES_PER_DAY
+    times = [parse_time(part) for part in re.split(r"\s*(?:-|–|to)\s*", text)]
+    times = [time for time in times if time is not None]
+    if len(times) != 2:
+        return None
+    start, end = times
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+def parse_days(text: str) -> List[int]:
+    """ "Monday-Friday" -> [0, 1, 2, 3, 4]; "Sat" -> [5]; [] if unknown."""
+    text = text.strip().lower()
+    if text in ("daily", "everyday"):
+        return list(range(7))
+    if text == "weekends":
+        return [5, 6]
+    if text == "weekdays":
+        return [0, 1, 2, 3, 4]
+    parts = [part.strip() for part in text.split("-")]
+    if not all(part in _DAY_LOOKUP for part in parts):
+        return []
+    first, last = _DAY_LOOKUP[parts[0]], _DAY_LOOKUP[parts[-1]]
+    return [(first + i) % 7 for i in range((last - first) % 7 + 1)]
+
+
+def format_clock(minute: int) -> str:
+    """Minute of the day -> "3:00 PM"."""
+    hour, minute = divmod(minute % MINUTES_PER_DAY, 60)
+    return f"{hour % 12 or 12}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def _load_timezone(name: str):
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    logger.warning("Unknown time zone %r; using UTC for opening hours", name)
+    return timezone.utc
+
+
+class _Segment:
+    """A run of minutes in the week where nothing about the status changes."""
+
+    __slots__ = ("start", "end", "flags", "changes", "line")
+
+    def __init__(self, start: int, end: int, flags: int):
+        self.start = start
+        self.end = end
+        self.flags = flags
+        # Minute of the week when each flag next flips, keyed by flag bit
+        self.changes: Dict[int, int] = {}
+        self.line = ""
+
+
+class HoursEngine:
+    """
+    Opening hours as a precomputed weekly timetable.
+
+    hours.json is parsed once per data version into per-minute flags (open,
+    kitchen open, and windows such as happy hour from the special notes),
+    which are grouped into segments where nothing changes. Each segment
+    knows when every flag next flips and carries a ready-made status line,
+    and a minute-of-week array maps any time straight to its segment, so
+    "are you open now?", "when do you open next?" and "is the kitchen
+    open?" are a table lookup. Segments also break at midnight so the
+    status line can name the day.
+
+    Times are wall-clock in the restaurant's time zone: hours.json's
+    "timezone" key, else RESTAURANT_TIMEZONE.
+    """
+
+    def __init__(self, context: RestaurantContext, default_timezone: str):
+        self.context = context
+        self.default_timezone = default_timezone
+        self.version: Optional[str] = None
+        self._rebuild(context.snapshot)
+        context.add_reload_listener(self._rebuild)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def now(self) -> datetime:
+        return datetime.now(self.tz)
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        return bool(self._segment(now).flags & OPEN)
+
+    def kitchen_open(self, now: Optional[datetime] = None) -> bool:
+        return bool(self._segment(now).flags & KITCHEN)
+
+    def active_windows(self, now: Optional[datetime] = None) -> List[str]:
+        flags = self._segment(now).flags
+        return [name for name, bit in self._window_bits.items() if flags & bit]
+
+    def next_opening(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """When the restaurant next opens (now, if it is open); None if never."""
+        now = now or self.now()
+        segment = self._segment(now)
+        if segment.flags & OPEN:
+            return now
+        return self._at(now, segment.changes.get(OPEN))
+
+    def next_closing(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """When the restaurant next closes (now, if it is closed)."""
+        now = now or self.now()
+        segment = self._segment(now)
+        if not segment.flags & OPEN:
+            return now
+        return self._at(now, segment.changes.get(OPEN))
+
+    def status_line(self, now: Optional[datetime] = None) -> str:
+        """One precomputed sentence on whether we're open, for prompts and answers."""
+        return self._segment(now).line
+
+    def context_key(self, snapshot: ContextSnapshot, now: Optional[datetime] = None) -> str:
+        """
+        Data version plus the current status segment: changes exactly when
+        the data or status_line() does, so cached replies outlive neither.
+        """
+        return f"{snapshot.version}:{self._segment(now).start}"
+
+    def status(self, now: Optional[datetime] = None) -> dict:
+        now = (now or self.now()).astimezone(self.tz)
+        segment = self._segment(now)
+        opens = None if segment.flags & OPEN else self._at(now, segment.changes.get(OPEN))
+        closes = self._at(now, segment.changes.get(OPEN)) if segment.flags & OPEN else None
+        kitchen_closes = self._at(now, segment.changes.get(KITCHEN)) if segment.flags & KITCHEN else None
+        return {
+            "timezone": str(self.tz),
+            "local_time": now.isoformat(timespec="minutes"),
+            "open": bool(segment.flags & OPEN),
+            "kitchen_open": bool(segment.flags & KITCHEN),
+            "active_windows": [name for name, bit in self._window_bits.items() if segment.flags & bit],
+            "closes_at": closes.isoformat(timespec="minutes") if closes else None,
+            "kitchen_closes_at": kitchen_closes.isoformat(timespec="minutes") if kitchen_closes else None,
+            "opens_at": opens.isoformat(timespec="minutes") if opens else None,
+            "status": segment.line,
+        }
+
+    def get_stats(self) -> dict:
+        return {
+            "version": self.version,
+            "timezone": str(self.tz),
+            "segments": len(self._segments),
+            "kitchen_close_offset_minutes": self.kitchen_offset,
+            "windows": list(self._window_bits),
+            "unparsed_days": self.unparsed_days,
+        }
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def _segment(self, now: Optional[datetime]) -> _Segment:
+        if self.context.snapshot.version != self.version:
+            self._rebuild(self.context.snapshot)
+        now = (now or self.now()).astimezone(self.tz)
+        minute = now.weekday() * MINUTES_PER_DAY + now.hour * 60 + now.minute
+        return self._segments[self._minute_index[minute]]
+
+    def _at(self, now: datetime, minute_of_week: Optional[int]) -> Optional[datetime]:
+        if minute_of_week is None:
+            return None
+        now = now.astimezone(self.tz)
+        current = now.weekday() * MINUTES_PER_DAY + now.hour * 60 + now.minute
+        delta = (minute_of_week - current) % MINUTES_PER_WEEK
+        return now.replace(second=0, microsecond=0) + timedelta(minutes=delta)
+
+    # ------------------------------------------------------------------
+    # Building the timetable
+    # ------------------------------------------------------------------
+    def _rebuild(self, snapshot: ContextSnapshot) -> None:
+        hours = snapshot.hours_data
+        tz = _load_timezone(hours.get("timezone") or self.default_timezone)
+        notes = hours.get("special_notes", [])
+        flags = bytearray(MINUTES_PER_WEEK)
+
+        kitchen_offset = 0
+        for note in notes:
+            match = _KITCHEN_NOTE.search(note)
+            if match:
+                kitchen_offset = int(match.group(1))
+
+        unparsed = []
+        regular = {day.lower(): text for day, text in hours.get("regular_hours", {}).items()}
+        for day_index, day in enumerate(DAYS):
+            interval = parse_range(regular.get(day, ""))
+            if interval is None:
+                if regular.get(day) and "closed" not in regular[day].lower():
+                    unparsed.append(day)
+                continue
+            start = day_index * MINUTES_PER_DAY + interval[0]
+            end = day_index * MINUTES_PER_DAY + interval[1]
+            _mark(flags, start, end, OPEN)
+            _mark(flags, start, max(start, end - kitchen_offset), KITCHEN)
+
+        window_bits: Dict[str, int] = {}
+        window_labels: Dict[int, str] = {}
+        for note in notes:
+            match = _WINDOW_NOTE.match(note)
+            if not match or len(window_bits) >= MAX_WINDOWS:
+                continue
+            days = parse_days(match.group("days"))
+            interval = parse_range(match.group("times"))
+            if not days or interval is None:
+                continue
+            label = match.group("label").strip().lower()
+            name = label.replace(" ", "_")
+            bit = window_bits.setdefault(name, 1 << (2 + len(window_bits)))
+            window_labels[bit] = label
+            for day_index in days:
+                base = day_index * MINUTES_PER_DAY
+                _mark(flags, base + interval[0], base + interval[1], bit)
+
+        segments = _segments(flags)
+        minute_index = array("H", bytes(2 * MINUTES_PER_WEEK))
+        for i, segment in enumerate(segments):
+            for minute in range(segment.start, segment.end):
+                minute_index[minute] = i
+
+        bits = [OPEN, KITCHEN] + list(window_bits.values())
+        for i, segment in enumerate(segments):
+            for bit in bits:
+                segment.changes[bit] = _next_change(segments, i, bit)
+            segment.line = _render_line(segment, window_labels, tz)
+
+        # Swap everything in at once
+        self.tz = tz
+        self.kitchen_offset = kitchen_offset
+        self.unparsed_days = unparsed
+        self._window_bits = window_bits
+        self._segments = segments
+        self._minute_index = minute_index
+        self.version = snapshot.version
+        if unparsed:
+            logger.warning("Could not parse opening hours for: %s", ", ".join(unparsed))
+
+
+def _mark(flags: bytearray, start: int, end: int, bit: int) -> None:
+    """Set `bit` for minutes [start, end) of the week, wrapping past Sunday."""
+    for minute in range(start, end):
+        flags[minute % MINUTES_PER_WEEK] |= bit
+
+
+def _segments(flags: bytearray) -> List[_Segment]:
+    """Split the week wherever the flags change, and at every midnight."""
+    segments = []
+    start = 0
+    for minute in range(1, MINUTES_PER_WEEK + 1):
+        if (minute == MINUTES_PER_WEEK or minute % MINUTES_PER_DAY == 0
+                or flags[minute] != flags[start]):
+            segments.append(_Segment(start, minute, flags[start]))
+            start = minute
+    return segments
+
+
+def _next_change(segments: List[_Segment], index: int, bit: int) -> Optional[int]:
+    """Minute of the week when `bit` next flips after segment `index`, or None."""
+    current = segments[index].flags & bit
+    count = len(segments)
+    for step in range(1, count + 1):
+        segment = segments[(index + step) % count]
+        if (segment.flags & bit) != current:
+            return segment.start
+    return None
+
+
+def _render_line(segment: _Segment, window_labels: Dict[int, str], tz) -> str:
+    day = DAYS[segment.start // MINUTES_PER_DAY].capitalize()
+
+    def when(minute: int) -> str:
+        change_day = minute // MINUTES_PER_DAY
+        if change_day == segment.start // MINUTES_PER_DAY:
+            return format_clock(minute)
+        return f"{DAYS[change_day].capitalize()} {format_clock(minute)}"
+
+    opens_or_closes = segment.changes.get(OPEN)
+    if segment.flags & OPEN:
+        parts = [f"we are open until {when(opens_or_closes)}" if opens_or_closes is not None else "we are open"]
+        kitchen_change = segment.changes.get(KITCHEN)
+        if segment.flags & KITCHEN:
+            if kitchen_change is not None and kitchen_change != opens_or_closes:
+                parts.append(f"the kitchen takes orders until {when(kitchen_change)}")
+        else:
+            parts.append("the kitchen has closed for the day")
+        for bit, label in window_labels.items():
+            if segment.flags & bit:
+                parts.append(f"{label} runs until {when(segment.changes[bit])}")
+        status = "; ".join(parts)
+    elif opens_or_closes is not None:
+        status = f"we are closed and open again {_day_phrase(segment, opens_or_closes)} at {format_clock(opens_or_closes)}"
+    else:
+        status = "we are closed"
+    return f"Current status (it is {day} in the {tz} time zone): {status}."
+
+
+def _day_phrase(segment: _Segment, minute: int) -> str:
+    today = segment.start // MINUTES_PER_DAY
+    day = minute // MINUTES_PER_DAY
+    if day == today:
+        return "today"
+    if day == (today + 1) % 7:
+        return "tomorrow"
+    return f"on {DAYS[day].capitalize()}"
+
+
+# Global instance
+hours_engine = HoursEngine(restaurant_context, RESTAURANT_TIMEZONE)
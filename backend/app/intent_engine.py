@@ -0,0 +1,401 @@
+from collections import Counter
+from typing import Dict, Optional
+
+from .hours_engine import hours_engine
+from .restaurant_context import RestaurantContext, restaurant_context
+from .text import words
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Keywords that identify each intent. Matching is on whole tokens, so
+# "hackathon" never looks like "hack" and "closet" never looks like "close".
+INTENT_KEYWORDS: Dict[str, frozenset] = {
+    "hours": frozenset({
+        "hours", "hour", "open", "opens", "opening", "close", "closes",
+        "closing", "closed", "schedule", "kitchen",
+    }),
+    "location": frozenset({
+        "address", "location", "located", "where", "directions", "situated",
+        "map",
+    }),
+    "contact": frozenset({
+        "phone", "call", "number", "email", "contact", "reach", "telephone",
+    }),
+    "booking": frozenset({
+        "reservation", "reservations", "reserve", "book", "booking",
+        "bookings", "table",
+    }),
+    "dishes": frozenset({
+        "menu", "dishes", "dish", "signature", "recommend", "recommended",
+        "recommendation", "recommendations", "specialty", "specialties",
+        "popular",
+    }),
+    "price": frozenset({
+        "price", "prices", "cost", "costs", "much", "expensive", "cheap",
+        "priced", "pricing",
+    }),
+    "dietary": frozenset({
+        "vegan", "vegetarian", "veggie", "gluten", "celiac", "halal",
+        "kosher", "allergy", "allergies", "allergic", "allergen", "allergens",
+        "dairy", "lactose",
+    }),
+    "discounts": frozenset({
+        "discount", "discounts", "deal", "deals", "offers", "promotion",
+        "promotions", "happy",
+    }),
+}
+
+# Keywords too ambiguous to decide an intent on their own: "are you close
+# to the university?" is not about closing time, and "how many hours does
+# the pork take?" is not about opening hours. They only count next to a
+# second signal: another keyword, a supporting word or a phrase of the
+# same intent.
+WEAK_KEYWORDS: Dict[str, frozenset] = {
+    "hours": frozenset({
+        "hours", "hour", "open", "opens", "opening", "close", "closes",
+        "closing", "closed", "kitchen",
+    }),
+    "location": frozenset({"where", "map"}),
+    "contact": frozenset({"call", "number", "reach"}),
+    "booking": frozenset({"book", "table"}),
+    "price": frozenset({"much"}),
+    "discounts": frozenset({"happy"}),
+}
+
+# Words that back up a weak keyword: "when do you close?"
+SUPPORT_WORDS: Dict[str, frozenset] = {
+    "hours": frozenset(DAYS) | frozenset(day + "s" for day in DAYS) | frozenset({
+        "when", "time", "times", "today", "tonight", "tomorrow", "now",
+        "late", "early", "until", "till", "weekend", "weekends", "daily",
+    }),
+    "booking": frozenset({"party", "group", "people", "seats", "tonight", "tomorrow"}),
+}
+
+# Phrases that back up a weak keyword, matched on whole consecutive words
+INTENT_PHRASES: Dict[str, tuple] = {
+    "hours": (
+        "are you open", "you open", "u open", "do you close", "you closed",
+        "open on", "open at", "close at", "close on", "closed on",
+    ),
+    "location": ("where are you", "where r u", "where is caficafe", "where is the restaurant"),
+    "contact": ("call you", "reach you", "your number", "phone number", "contact number"),
+    "booking": ("a table", "book a", "can i book"),
+    "price": ("how much",),
+    "discounts": ("happy hour",),
+}
+
+# Words that ask about the present moment ("are you open now?"); those
+# get the live status rather than the weekly timetable
+LIVE_WORDS = frozenset({"now", "currently", "right", "still", "today", "tonight", "kitchen"})
+
+# Words that mark a question as open-ended; those always go to the model
+OPEN_ENDED = frozenset({"why", "explain", "compare", "difference", "versus", "vs", "history", "story"})
+
+# Questions longer than this are treated as conversational and go to the model
+MAX_LOCAL_TOKENS = 16
+
+# Maps dietary keywords onto keys of menu.json's dietary_accommodations
+DIETARY_KEYS = {
+    "vegan": "vegan",
+    "vegetarian": "vegetarian",
+    "veggie": "vegetarian",
+    "gluten": "gluten_free",
+    "celiac": "gluten_free",
+    "halal": "halal",
+    "kosher": "kosher",
+    "allergy": "allergies",
+    "allergies": "allergies",
+    "allergic": "allergies",
+    "allergen": "allergies",
+    "allergens": "allergies",
+    "dairy": "vegan",
+    "lactose": "vegan",
+}
+
+# Tokens that appear in dish names but say nothing about which dish is meant
+_DISH_STOPWORDS = frozenset({"caficafe", "the", "our", "and", "of", "a"})
+
+
+class IntentEngine:
+    """
+    Answers structured questions straight from the restaurant data.
+
+    Answers are rendered once from RestaurantContext and re-rendered whenever
+    the context version changes, so a lookup is a word split plus a few set
+    intersections. answer() returns None for anything it is not confident
+    about, leaving open-ended questions to Gemini.
+    """
+
+    def __init__(self, context: RestaurantContext):
+        self.context = context
+        self.version: Optional[str] = None
+        self.local_answers: Counter = Counter()
+        self.passthrough = 0
+        self._rebuild()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def classify(self, message: str) -> Optional[str]:
+        """Return the single intent a message asks about, or None."""
+        self._ensure_current()
+        tokens = words(message)
+        if not tokens or len(tokens) > MAX_LOCAL_TOKENS:
+            return None
+        token_set = set(tokens)
+        if token_set & OPEN_ENDED:
+            return None
+
+        matched = self._intents(tokens, token_set)
+        if matched and matched <= {"dishes", "price", "dietary"} and self._match_dish(token_set):
+            # "How much is the burger?" and "Is the rice bowl vegan?" are
+            # questions about that dish, not about the whole menu.
+            return "dish"
+        if matched == {"dishes", "price"}:
+            return "price"
+        if matched == {"location", "contact"}:
+            return "location"
+        if matched == {"hours", "discounts"}:
+            # "When is happy hour?"
+            return "discounts"
+        if len(matched) != 1:
+            return None
+        return matched.pop()
+
+    def answer(self, message: str) -> Optional[str]:
+        """Answer a message locally, or return None if it needs the model."""
+        intent = self.classify(message)
+        if intent is None:
+            self.passthrough += 1
+            return None
+        self.local_answers[intent] += 1
+        return self._render(intent, set(words(message)))
+
+    def fallback_answer(self, message: str) -> str:
+        """Best local answer for a message, used when the model is unavailable."""
+        self._ensure_current()
+        token_set = set(words(message))
+        intent = self.classify(message)
+        if intent is None:
+            # Be lenient here: any specific keyword beats the generic reply
+            for name, keywords in INTENT_KEYWORDS.items():
+                if token_set & (keywords - WEAK_KEYWORDS.get(name, frozenset())):
+                    intent = name
+                    break
+        if intent is None:
+            return self._answers["generic"]
+        return self._render(intent, token_set)
+
+    def get_stats(self) -> dict:
+        """Report how many questions were answered locally, by intent."""
+        return {
+            "context_version": self.version,
+            "local_answers": dict(self.local_answers),
+            "local_total": sum(self.local_answers.values()),
+            "passed_to_model": self.passthrough,
+        }
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+    def _render(self, intent: str, token_set: set) -> str:
+        if intent in ("hours", "discounts") and token_set & LIVE_WORDS:
+            live = hours_engine.status_line()
+            if intent == "discounts":
+                return f"{live}\n\n{self._answers['discounts']}"
+            return live
+        if intent == "hours":
+            days = [day for day in DAYS if day in token_set]
+            if len(days) == 1 and days[0] in self._day_answers:
+                return self._day_answers[days[0]]
+        elif intent == "dietary":
+            keys = []
+            for token in token_set:
+                key = DIETARY_KEYS.get(token)
+                if key and key not in keys and key in self._dietary_answers:
+                    keys.append(key)
+            if keys:
+                lines = [self._dietary_answers[key] for key in sorted(keys)]
+                return " ".join(lines) + " " + self._answers["dietary_footer"]
+        elif intent == "dish":
+            dish = self._match_dish(token_set)
+            if dish is not None:
+                return self._dish_answers[dish]
+        return self._answers.get(intent, self._answers["generic"])
+
+    @staticmethod
+    def _intents(tokens: list, token_set: set) -> set:
+        """Intents with a keyword that is specific or backed by a second signal."""
+        text = f" {' '.join(tokens)} "
+        matched = set()
+        for name, keywords in INTENT_KEYWORDS.items():
+            hits = token_set & keywords
+            if not hits:
+                continue
+            if (
+                hits - WEAK_KEYWORDS.get(name, frozenset())
+                or len(hits) > 1
+                or token_set & SUPPORT_WORDS.get(name, frozenset())
+                or any(f" {phrase} " in text for phrase in INTENT_PHRASES.get(name, ()))
+            ):
+                matched.add(name)
+        return matched
+
+    def _match_dish(self, token_set: set) -> Optional[str]:
+        """Find the dish a message names, weighting rare name tokens higher."""
+        scores: Counter = Counter()
+        for token in token_set:
+            dishes = self._dish_index.get(token)
+            if dishes:
+                for name in dishes:
+                    scores[name] += 1.0 / len(dishes)
+        if not scores:
+            return None
+        (best, score), *rest = scores.most_common(2)
+        if score < 1.0 or (rest and rest[0][1] == score):
+            return None
+        return best
+
+    def _ensure_current(self) -> None:
+        if self.context.version != self.version:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        """Render every templated answer from the current restaurant data."""
+        ctx = self.context.snapshot
+        info = ctx.restaurant_info
+        basic = info.get("basic_info", {})
+        location = info.get("location", {})
+        contact = info.get("contact", {})
+        booking = info.get("booking", {})
+        name = basic.get("name", "CAFICAFE")
+        phone = location.get("phone") or contact.get("phone", "")
+        email = location.get("email") or contact.get("email", "")
+        reach_us = f"call us at {phone} or email {email}" if email else f"call us at {phone}"
+
+        # Hours
+        regular = ctx.hours_data.get("regular_hours", {})
+        notes = ctx.hours_data.get("special_notes", [])
+        hours_lines = [f"- {day.capitalize()}: {time}" for day, time in regular.items()]
+        hours_answer = f"Here are {name}'s opening hours:\n" + "\n".join(hours_lines)
+        if notes:
+            hours_answer += "\n\n" + "\n".join(f"- {note}" for note in notes)
+        holiday = ctx.hours_data.get("holiday_hours", {}).get("note")
+        if holiday:
+            hours_answer += f"\n\n{holiday}"
+        kitchen = next((note for note in notes if "kitchen" in note.lower()), None)
+        day_answers = {}
+        for day, time in regular.items():
+            text = f"On {day.capitalize()} we're open {time}."
+            if kitchen:
+                text += f" {kitchen}."
+            day_answers[day.lower()] = text
+
+        # Discounts and happy hour
+        deal_words = ("discount", "happy hour", "deal", "offer")
+        deals = [note for note in notes if any(word in note.lower() for word in deal_words)]
+        deals += [
+            feature for feature in info.get("features", [])
+            if any(word in feature.lower() for word in deal_words)
+            and not any(feature.lower() in deal.lower() for deal in deals)
+        ]
+        if deals:
+            discounts_answer = "Here's how to save at " + name + ":\n" + "\n".join(f"- {deal}" for deal in deals)
+        else:
+            discounts_answer = f"For current offers, please {reach_us}."
+
+        # Location and contact
+        location_answer = f"You'll find us at {location.get('address', '')}"
+        if location.get("city"):
+            location_answer += f", {location['city']}"
+        location_answer += "."
+        if location.get("directions"):
+            location_answer += f" {location['directions']}"
+        if phone:
+            location_answer += f" Need help finding us? Call {phone}."
+        contact_answer = f"You can reach {name} by phone at {phone}"
+        if email:
+            contact_answer += f" or by email at {email}"
+        contact_answer += "."
+        if contact.get("website"):
+            contact_answer += f" Our website is {contact['website']}."
+
+        # Booking
+        methods = booking.get("methods", [])
+        policies = booking.get("policies", [])
+        booking_answer = "You can book a table in any of these ways:\n"
+        booking_answer += "\n".join(f"- {method}" for method in methods)
+        if policies:
+            booking_answer += "\n\nGood to know:\n" + "\n".join(f"- {policy}" for policy in policies)
+
+        # Dishes and prices
+        signature = ctx.menu_data.get("signature_dishes", [])
+        recommended = ctx.menu_data.get("recommended_dishes", [])
+        dishes_answer = f"Our signature dishes are:\n{self._dish_lines(signature)}"
+        if recommended:
+            dishes_answer += f"\n\nWe also recommend:\n{self._dish_lines(recommended)}"
+        price_answer = "Here are our prices:\n" + self._dish_lines(signature + recommended, describe=False)
+
+        dish_answers = {}
+        dish_index: Dict[str, set] = {}
+        for dish in signature + recommended:
+            dish_name = dish.get("name", "")
+            if not dish_name:
+                continue
+            text = f"The {dish_name} is {dish.get('price', '')}. {dish.get('description', '')}".strip()
+            if not text.endswith("."):
+                text += "."
+            dietary = dish.get("dietary_info", [])
+            if dietary:
+                text += f" Dietary info: {'; '.join(dietary)}."
+            dish_answers[dish_name] = text
+            for token in words(dish_name):
+                if token not in _DISH_STOPWORDS:
+                    dish_index.setdefault(token, set()).add(dish_name)
+
+        # Dietary
+        accommodations = ctx.menu_data.get("dietary_accommodations", {})
+        dietary_answers = {
+            key: f"{key.replace('_', ' ').title()}: {text}." for key, text in accommodations.items()
+        }
+        dietary_answer = "We cater for most diets:\n" + "\n".join(
+            f"- {key.replace('_', ' ').title()}: {text}" for key, text in accommodations.items()
+        )
+        dietary_footer = "For allergies or strict dietary needs, please speak with our staff when you order."
+
+        generic = (
+            "Thank you for your question! For the most accurate and detailed information, "
+            f"please {reach_us}. Our friendly staff will be happy to assist you!"
+        )
+
+        self._answers = {
+            "hours": hours_answer,
+            "location": location_answer,
+            "contact": contact_answer,
+            "booking": booking_answer,
+            "dishes": dishes_answer,
+            "price": price_answer,
+            "discounts": discounts_answer,
+            "dietary": dietary_answer + "\n\n" + dietary_footer,
+            "dietary_footer": dietary_footer,
+            "generic": generic,
+        }
+        self._day_answers = day_answers
+        self._dish_answers = dish_answers
+        self._dish_index = dish_index
+        self._dietary_answers = dietary_answers
+        self.version = ctx.version
+
+    @staticmethod
+    def _dish_lines(dishes: list, describe: bool = True) -> str:
+        lines = []
+        for dish in dishes:
+            line = f"- {dish.get('name', '')} ({dish.get('price', '')})"
+            if describe and dish.get("description"):
+                line += f": {dish['description']}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+# Global instance
+intent_engine = IntentEngine(restaurant_context)
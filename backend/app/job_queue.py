@@ -0,0 +1,305 @@
+import asyncio
+import itertools
+import logging
+import secrets
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from .config import (
+    CHAT_JOB_CLIENT_KEYS,
+    CHAT_JOB_MAX_PENDING,
+    CHAT_JOB_MAX_PER_USER,
+    CHAT_JOB_RESULT_TTL_SECONDS,
+    CHAT_JOB_WEB_MAX_SHARE,
+    CHAT_JOB_WORKERS,
+)
+from .metrics import job_wait, jobs_total
+from .pipeline import ChatPipeline, chat_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most urgent first. Anonymous traffic is "web".
+PRIORITIES = ("staff", "kiosk", "web")
+
+# Finished jobs kept for polling, on top of the pending ones
+MAX_FINISHED_JOBS = 10000
+
+# Service time assumed for Retry-After before any job has finished
+DEFAULT_SERVICE_SECONDS = 2.0
+
+
+class QueueFull(Exception):
+    """The job was refused; `retry_after` is a hint in seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_client_keys(spec: str) -> Dict[str, str]:
+    """Parse "key1:staff,key2:kiosk" into {key: priority class}."""
+    keys = {}
+    for part in spec.split(","):
+        key, _, priority = part.strip().rpartition(":")
+        if key and priority in PRIORITIES:
+            keys[key] = priority
+        elif part.strip():
+            logger.warning("Ignoring chat job client key entry %r", part.strip())
+    return keys
+
+
+class ChatJob:
+    """One queued chat request and, once a worker has run it, its reply."""
+
+    __slots__ = ("id", "message", "user_id", "priority", "status", "reply", "source",
+                 "error_message", "created_at", "started_at", "finished_at", "done")
+
+    def __init__(self, message: str, user_id: Optional[str], priority: str):
+        self.id = secrets.token_urlsafe(12)
+        self.message = message
+        self.user_id = user_id
+        self.priority = priority
+        self.status = "queued"
+        self.reply: Optional[str] = None
+        self.source: Optional[str] = None
+        self.error_message: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def snapshot(self) -> dict:
+        waited = (self.started_at or time.time()) - self.created_at
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "message": self.reply,
+            "source": self.source,
+            "error_message": self.error_message,
+            "queue_wait_ms": round(waited * 1000, 1),
+            "run_ms": round((self.finished_at - self.started_at) * 1000, 1) if self.finished_at else None,
+        }
+
+
+class JobQueue:
+    """
+    Queued mode for /chat: answers are produced by a pool of background
+    workers and collected later, so a slow or throttled Gemini never
+    holds an HTTP connection open.
+
+    Jobs wait in one priority queue: staff before kiosk before web, and
+    first come first served within a class. Backpressure is applied when
+    a job is submitted, never by blocking: the queue holds at most
+    `max_pending` jobs, web jobs may fill only `web_max_share` of it (so
+    there is always room for the kiosk and staff), and one user may have
+    at most `max_per_user` jobs waiting. A refused job gets a Retry-After
+    estimate from the queue length and recent run times.
+
+    Finished jobs can be polled for `result_ttl` seconds.
+    """
+
+    def __init__(self, pipeline: ChatPipeline, workers: int, max_pending: int,
+                 web_max_share: float, max_per_user: int, result_ttl: float,
+                 client_keys: Dict[str, str]):
+        self.pipeline = pipeline
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.web_max_pending = max(1, int(self.max_pending * web_max_share))
+        self.max_per_user = max_per_user
+        self.result_ttl = result_ttl
+        self.client_keys = client_keys
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, ChatJob] = {}
+        # Queued job ids per class, oldest first; finished ids by finish time
+        self._queued: Dict[str, "OrderedDict[str, None]"] = {name: OrderedDict() for name in PRIORITIES}
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        self._pending_by_user: Counter = Counter()
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+        # Moving average of how long a job takes to run
+        self._service_seconds = DEFAULT_SERVICE_SECONDS
+
+        self.submitted = 0
+        self.completed: Counter = Counter()
+        self.rejected: Counter = Counter()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def priority_for(self, client_key: Optional[str]) -> str:
+        """The priority class a client key grants; "web" without a known key."""
+        return self.client_keys.get(client_key or "", "web")
+
+    async def submit(self, message: str, user_id: Optional[str], priority: str = "web") -> ChatJob:
+        """
+        Queue a message that already passed chat_pipeline.validate(). Raises
+        QueueFull when backpressure refuses it.
+        """
+        self.start()
+        self._purge()
+        pending = self._pending_total()
+        if pending >= self.max_pending:
+            self._refuse("queue_full", priority)
+        if priority == "web" and pending >= self.web_max_pending:
+            self._refuse("web_share_full", priority)
+        if user_id and self.max_per_user > 0 and self._pending_by_user[user_id] >= self.max_per_user:
+            self._refuse("user_limit", priority)
+
+        job = ChatJob(message, user_id, priority)
+        self._jobs[job.id] = job
+        self._queued[priority][job.id] = None
+        if user_id:
+            self._pending_by_user[user_id] += 1
+        self.submitted += 1
+        self._queue.put_nowait((PRIORITIES.index(priority), next(self._sequence), job.id))
+        return job
+
+    def get(self, job_id: str) -> Optional[ChatJob]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job: ChatJob, timeout: float) -> None:
+        """Wait up to `timeout` seconds for a job to finish."""
+        if job.finished or timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def position(self, job: ChatJob) -> Optional[int]:
+        """Jobs ahead of this one, counting every more urgent class."""
+        if job.status != "queued":
+            return None
+        rank = PRIORITIES.index(job.priority)
+        ahead = sum(len(self._queued[name]) for name in PRIORITIES[:rank])
+        for job_id in self._queued[job.priority]:
+            if job_id == job.id:
+                break
+            ahead += 1
+        return ahead
+
+    def start(self) -> None:
+        """Start the workers (idempotent; must run on the event loop)."""
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    @property
+    def started(self) -> bool:
+        """Whether any worker is running."""
+        return any(not task.done() for task in self._tasks)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def queue_depth(self) -> Dict[str, int]:
+        return {name: len(self._queued[name]) for name in PRIORITIES}
+
+    def get_stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self.queue_depth(),
+            "max_pending": self.max_pending,
+            "web_max_pending": self.web_max_pending,
+            "max_per_user": self.max_per_user,
+            "submitted": self.submitted,
+            "completed": dict(self.completed),
+            "rejected": dict(self.rejected),
+            "retained_jobs": len(self._jobs),
+            "avg_run_ms": round(self._service_seconds * 1000, 1),
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    async def _worker(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            self._queued[job.priority].pop(job.id, None)
+            if job.user_id:
+                self._pending_by_user[job.user_id] -= 1
+                if self._pending_by_user[job.user_id] <= 0:
+                    del self._pending_by_user[job.user_id]
+            job.status = "running"
+            job.started_at = time.time()
+            job_wait.observe(job.started_at - job.created_at, priority=job.priority)
+            self._running += 1
+            try:
+                turn = await self.pipeline.run(job.message, job.user_id, validated=True)
+                job.reply, job.source = turn.reply, turn.source
+                job.status = "done"
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error_message = "Server shutting down"
+                raise
+            except ValueError as e:
+                job.status = "failed"
+                job.error_message = str(e)
+            except Exception as e:
+                logger.exception("Chat job failed: %s", e)
+                job.status = "failed"
+                job.error_message = "Internal server error"
+            finally:
+                self._running -= 1
+                job.finished_at = time.time()
+                self._service_seconds += 0.1 * ((job.finished_at - job.started_at) - self._service_seconds)
+                self._finished[job.id] = job.finished_at
+                self.completed[job.status] += 1
+                jobs_total.inc(priority=job.priority, outcome=job.status)
+                job.done.set()
+
+    def _refuse(self, reason: str, priority: str) -> None:
+        self.rejected[reason] += 1
+        jobs_total.inc(priority=priority, outcome="rejected")
+        ahead = self._pending_total()
+        retry_after = max(1, round(ahead * self._service_seconds / self.workers))
+        raise QueueFull(reason, retry_after)
+
+    def _pending_total(self) -> int:
+        return sum(len(queued) for queued in self._queued.values())
+
+    def _purge(self) -> None:
+        """Forget finished jobs past their TTL, and the oldest past the cap."""
+        cutoff = time.time() - self.result_ttl
+        finished = self._finished
+        while finished:
+            job_id, finished_at = next(iter(finished.items()))
+            if finished_at > cutoff and len(finished) <= MAX_FINISHED_JOBS:
+                break
+            del finished[job_id]
+            self._jobs.pop(job_id, None)
+
+
+# Global instance
+chat_jobs = JobQueue(
+    chat_pipeline,
+    workers=CHAT_JOB_WORKERS,
+    max_pending=CHAT_JOB_MAX_PENDING,
+    web_max_share=CHAT_JOB_WEB_MAX_SHARE,
+    max_per_user=CHAT_JOB_MAX_PER_USER,
+    result_ttl=CHAT_JOB_RESULT_TTL_SECONDS,
+    client_keys=parse_client_keys(CHAT_JOB_CLIENT_KEYS),
+)
@@ -0,0 +1,151 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from .config import LOG_BODY_SAMPLE_RATE, LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE
+
+# Correlation id of the request being handled, and whether its message
+# bodies were picked for logging
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+_sample_bodies_var: ContextVar[bool] = ContextVar("sample_bodies", default=False)
+
+# Longest message body written to a log line
+MAX_BODY_CHARS = 200
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """
+    Start a request: adopt the caller's id (e.g. X-Request-ID) or make one,
+    and decide whether this request's message bodies are logged.
+    """
+    request_id = (incoming or "").strip()[:64] or uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    _sample_bodies_var.set(LOG_BODY_SAMPLE_RATE > 0 and random.random() < LOG_BODY_SAMPLE_RATE)
+    return request_id
+
+
+def sampled_body(text: str) -> Optional[str]:
+    """The text to log for a message body, or None if this request is not sampled."""
+    if not _sample_bodies_var.get():
+        return None
+    return text if len(text) <= MAX_BODY_CHARS else text[:MAX_BODY_CHARS] + "…"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra=` fields included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key != "request_id" and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread without formatting them.
+
+    The stock QueueHandler renders the message on the calling thread;
+    here only the correlation id is captured (context variables do not
+    cross threads) and the listener does the rest. A full queue drops
+    the record instead of blocking the event loop.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _add_request_id(record: logging.LogRecord) -> bool:
+    # Records that skipped the queue (after shutdown) still need an id
+    if not hasattr(record, "request_id"):
+        record.request_id = request_id_var.get()
+    return True
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[_QueueHandler] = None
+
+
+def configure_logging() -> None:
+    """
+    Route all logging through a queue to a background writer thread.
+    Safe to call more than once.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+        ))
+    output.addFilter(_add_request_id)
+
+    _queue_handler = _QueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, output, respect_handler_level=False)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    Flush queued records and stop the writer thread. Anything logged
+    afterwards is written directly by the same output handler instead of
+    being queued with no one left to write it.
+    """
+    global _listener
+    if _listener is not None:
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            root.addHandler(handler)
+        _listener = None
+
+
+def get_stats() -> dict:
+    return {
+        "level": logging.getLevelName(logging.getLogger().level),
+        "format": LOG_FORMAT,
+        "body_sample_rate": LOG_BODY_SAMPLE_RATE,
+        "queued": _queue_handler.queue.qsize() if _queue_handler else 0,
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+    }
@@ -1,22 +1,58 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+# Set up logging before the other app modules start logging at import time
+from app.logging_config import configure_logging, new_request_id, shutdown_logging
+from app import logging_config
+configure_logging()
+
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from typing import List, Optional
+import json
 import logging
 import os
+import time
 
 # Import your modules
-from app.chat import chatbot, gemini_client
+from app.catalog import data_catalog
+from app.chat import check_admin_token, gemini_client, router as chat_router
+from app.circuit_breaker import circuit_breaker
+from app.coalescing import single_flight
+from app.config import (
+    CHAT_BATCH_CONCURRENCY,
+    CHAT_BATCH_MAX_ITEMS,
+    CHAT_JOB_MAX_WAIT_SECONDS,
+    CONTEXT_WATCH_INTERVAL_SECONDS,
+    DATA_API_MAX_AGE_SECONDS,
+)
+from app.context_retrieval import context_retriever
+from app.health_monitor import health_monitor
+from app.history_store import history_store
+from app.hours_engine import hours_engine
+from app.intent_engine import intent_engine
+from app.job_queue import QueueFull, chat_jobs
+from app.metrics import registry as metrics_registry, requests_total, track_request
+from app.moderation import moderation_engine
+from app.paraphrase_index import paraphrase_index
+from app.pipeline import chat_pipeline
+from app.response_cache import normalize_message, response_cache
+from app.restaurant_context import restaurant_context
+from app.token_accounting import token_ledger
+from app.usage_tracker import usage_tracker
 
 # -------------------------------------------------------------------
 # Logging
 # -------------------------------------------------------------------
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+async def _bind_request_id(response: Response, x_request_id: str = Header(None)):
+    # Every log line for this request carries the same correlation id
+    response.headers["X-Request-ID"] = new_request_id(x_request_id)
+
 # -------------------------------------------------------------------
 # FastAPI instance
 # -------------------------------------------------------------------
@@ -24,6 +60,7 @@ app = FastAPI(
     title="Restaurant Chatbot API",
     description="AI‑powered chatbot for restaurant customer service",
     version="1.0.0",
+    dependencies=[Depends(_bind_request_id)],
 )
 
 # -------------------------------------------------------------------
@@ -44,6 +81,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# -------------------------------------------------------------------
+# Versioned API (app/chat.py), served by the same chat pipeline
+# -------------------------------------------------------------------
+app.include_router(chat_router, prefix="/api/v1")
+
 # -------------------------------------------------------------------
 # Pydantic models
 # -------------------------------------------------------------------
@@ -59,19 +101,50 @@ class ChatResponse(BaseModel):
     success: bool = True
     error_message: str = None
 
+class BatchChatRequest(BaseModel):
+    messages: List[str]
+
+class BatchChatItem(BaseModel):
+    index: int
+    message: str
+    response: str = None
+    source: str = None
+    status: str
+    deduplicated: bool = False
+    error_message: str = None
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchChatItem]
+    unique_messages: int
+    elapsed_ms: float
+    timestamp: str
+
+class ChatJobResponse(BaseModel):
+    job_id: str
+    status: str
+    priority: str
+    position: Optional[int] = None
+    message: Optional[str] = None
+    source: Optional[str] = None
+    error_message: Optional[str] = None
+    queue_wait_ms: Optional[float] = None
+    run_ms: Optional[float] = None
+    timestamp: str
+
 class HealthResponse(BaseModel):
     status: str
     service: str
     gemini_api: str = None
     timestamp: str
     error: str = None
+    details: dict = None
 
 # -------------------------------------------------------------------
 # Root endpoint
 # -------------------------------------------------------------------
 @app.get("/")
 async def root():
-    logger.info("Root endpoint accessed")
+    logger.debug("Root endpoint accessed")
     return {
         "message": "Restaurant Chatbot API is running!",
         "version": "1.0.0",
@@ -79,36 +152,37 @@ async def root():
         "cors_origins": ["*"],
         "endpoints": {
             "chat": "/chat (POST)",
+            "chat_stream": "/chat/stream (POST, text/event-stream)",
+            "chat_batch": "/chat/batch (POST)",
+            "chat_history": "/chat/history/{user_id} (GET, DELETE; X-Admin-Token)",
             "health": "/health (GET)",
+            "liveness": "/health/live (GET)",
+            "readiness": "/health/ready (GET)",
+            "stats": "/stats (GET)",
+            "metrics": "/metrics (GET, Prometheus text format)",
+            "reload_context": "/admin/reload-context (POST; X-Admin-Token)",
         },
     }
 
 # -------------------------------------------------------------------
-# Health endpoint
+# Health endpoints
 # -------------------------------------------------------------------
+# These serve the snapshot kept by the background health monitor and never
+# call Gemini themselves, so probes are instant and cost no quota.
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     try:
-        logger.info("Health check requested")
-        api_valid = True
-        try:
-            if hasattr(gemini_client, "validate_api_key"):
-                api_valid = gemini_client.validate_api_key()
-            elif hasattr(gemini_client, "api_key"):
-                api_valid = bool(gemini_client.api_key)
-        except Exception as api_error:
-            logger.warning(f"API validation error: {api_error}")
-            api_valid = False
-
+        snapshot = health_monitor.snapshot()
         return HealthResponse(
             status="healthy",
             service="restaurant-chatbot",
-            gemini_api="connected" if api_valid else "disconnected",
+            gemini_api=snapshot["gemini_api"],
             timestamp=datetime.utcnow().isoformat(),
+            details={**snapshot, "circuit_breaker": circuit_breaker.snapshot()},
         )
 
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         return HealthResponse(
             status="unhealthy",
             service="restaurant-chatbot",
@@ -116,6 +190,211 @@ async def health_check():
             timestamp=datetime.utcnow().isoformat(),
         )
 
+@app.get("/health/live")
+async def liveness():
+    return {
+        "status": "alive",
+        "service": "restaurant-chatbot",
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+# Readiness is about this instance only. Without Gemini it still answers
+# from local data, the cache and fallbacks, so a Gemini outage is reported
+# as "degraded" with a 200 and never takes every instance out of rotation.
+def _readiness_checks() -> dict:
+    return {
+        "context_loaded": restaurant_context.loaded,
+        "health_monitor_running": health_monitor.running,
+        "chat_workers_running": chat_jobs.started,
+    }
+
+@app.get("/health/ready")
+async def readiness():
+    checks = _readiness_checks()
+    ready = all(checks.values())
+    snapshot = health_monitor.snapshot()
+    if not ready:
+        status = "not_ready"
+    elif not snapshot["healthy"]:
+        status = "degraded"
+    else:
+        status = "ready"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": status,
+            "service": "restaurant-chatbot",
+            "gemini_api": snapshot["gemini_api"],
+            "checks": checks,
+            "timestamp": datetime.utcnow().isoformat(),
+            "details": snapshot,
+        },
+    )
+
+# -------------------------------------------------------------------
+# Stats endpoint
+# -------------------------------------------------------------------
+def _token_stats() -> dict:
+    stats = token_ledger.get_stats()
+    stats["max_input_tokens"] = gemini_client.max_input_tokens or None
+    config = gemini_client.generation_config or {}
+    stats["max_output_tokens"] = config.get("max_output_tokens")
+    return stats
+
+@app.get("/stats")
+async def stats():
+    return {
+        "gemini": gemini_client.get_concurrency_stats(),
+        "models": gemini_client.get_model_stats(),
+        "cache": response_cache.get_stats(),
+        "paraphrase": paraphrase_index.get_stats(),
+        "coalescing": single_flight.get_stats(),
+        "usage": dict(await usage_tracker.get_stats(), tokens=_token_stats()),
+        "circuit_breaker": circuit_breaker.snapshot(),
+        "intents": intent_engine.get_stats(),
+        "streaming": _stream_stats.summary(),
+        "context": restaurant_context.get_status(),
+        "prompt": context_retriever.get_stats(),
+        "history": history_store.get_stats(),
+        "logging": logging_config.get_stats(),
+        "moderation": moderation_engine.get_stats(),
+        "pipeline": chat_pipeline.get_stats(),
+        "chat_jobs": chat_jobs.get_stats(),
+        "data_api": data_catalog.get_stats(),
+        "hours": hours_engine.get_stats(),
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+# -------------------------------------------------------------------
+# Metrics endpoint (Prometheus text format)
+# -------------------------------------------------------------------
+_gemini_in_flight = metrics_registry.gauge(
+    "caficafe_gemini_calls_in_flight", "Gemini calls currently running."
+)
+_gemini_queue_depth = metrics_registry.gauge(
+    "caficafe_gemini_queue_depth", "Requests waiting for a Gemini slot."
+)
+_coalesced_in_flight = metrics_registry.gauge(
+    "caficafe_coalesced_flights_in_flight", "Distinct questions currently being generated."
+)
+_job_queue_depth = metrics_registry.gauge(
+    "caficafe_chat_job_queue_depth", "Queued chat jobs waiting for a worker.", labelnames=("priority",)
+)
+_circuit_state = metrics_registry.gauge(
+    "caficafe_circuit_breaker_state", "1 for the circuit breaker's current state.", labelnames=("state",)
+)
+
+def _collect_gauges():
+    gemini = gemini_client.get_concurrency_stats()
+    _gemini_in_flight.set(gemini["in_flight"])
+    _gemini_queue_depth.set(gemini["queue_depth"])
+    _coalesced_in_flight.set(single_flight.get_stats()["in_flight"])
+    for priority, depth in chat_jobs.queue_depth().items():
+        _job_queue_depth.set(depth, priority=priority)
+    for state in ("closed", "open", "half_open"):
+        _circuit_state.set(1 if circuit_breaker.state == state else 0, state=state)
+
+metrics_registry.add_collector(_collect_gauges)
+
+@app.get("/metrics")
+async def metrics():
+    return Response(
+        content=metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+# -------------------------------------------------------------------
+# Restaurant data endpoints
+# -------------------------------------------------------------------
+# Bodies are serialized and compressed when the data loads (app/catalog.py);
+# these handlers only pick a variant or answer 304.
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" are the same validator
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip()) == wanted
+        for tag in if_none_match.split(",")
+    )
+
+def _cache_headers(etag: str) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={DATA_API_MAX_AGE_SECONDS}",
+        "Vary": "Accept-Encoding",
+    }
+
+def _data_response(payload, accept_encoding: Optional[str]) -> Response:
+    headers = _cache_headers(payload.etag)
+    body, encoding = payload.encode(accept_encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _document_response(name: str, if_none_match: Optional[str], accept_encoding: Optional[str]) -> Response:
+    payload = data_catalog.document(name)
+    if _etag_matches(if_none_match, payload.etag):
+        return Response(status_code=304, headers=_cache_headers(payload.etag))
+    return _data_response(payload, accept_encoding)
+
+@app.get("/menu")
+async def menu(
+    category: Optional[str] = Query(None, max_length=100),
+    dietary: Optional[str] = Query(None, max_length=100, description="Dietary tag, e.g. vegan or gluten-free"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    q: Optional[str] = Query(None, max_length=100, description="Dish name search; tolerates typos"),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
+    if category is None and dietary is None and min_price is None and max_price is None and not q:
+        return _document_response("menu", if_none_match, accept_encoding)
+
+    # The ETag depends only on the data version and the query, so a
+    # revalidation is answered before any filtering happens
+    params = data_catalog.menu_params(category, dietary, min_price, max_price, q)
+    etag = data_catalog.menu_etag(params)
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=_cache_headers(etag))
+    payload = data_catalog.filtered_menu(category, dietary, min_price, max_price, q)
+    return _data_response(payload, accept_encoding)
+
+@app.get("/hours")
+async def hours(if_none_match: Optional[str] = Header(None), accept_encoding: Optional[str] = Header(None)):
+    return _document_response("hours", if_none_match, accept_encoding)
+
+@app.get("/hours/status")
+async def hours_status():
+    # Changes by the minute, so never cached
+    return JSONResponse(hours_engine.status(), headers={"Cache-Control": "no-cache"})
+
+@app.get("/info")
+async def info(if_none_match: Optional[str] = Header(None), accept_encoding: Optional[str] = Header(None)):
+    return _document_response("info", if_none_match, accept_encoding)
+
+# -------------------------------------------------------------------
+# Admin endpoints
+# -------------------------------------------------------------------
+@app.post("/admin/reload-context")
+async def reload_context(x_admin_token: str = Header(None)):
+    check_admin_token(x_admin_token)
+    previous_version = restaurant_context.version
+    try:
+        changed = await restaurant_context.reload_async()
+    except (OSError, ValueError) as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Reload failed, still serving version {previous_version}: {e}",
+        )
+    return {
+        "changed": changed,
+        "previous_version": previous_version,
+        **restaurant_context.get_status(),
+    }
+
 # -------------------------------------------------------------------
 # OPTIONS preflight catch-all
 # -------------------------------------------------------------------
@@ -130,26 +409,28 @@ async def preflight_handler(path: str):
 # -------------------------------------------------------------------
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
+    with track_request("chat"):
+        response = await _chat(request)
+    requests_total.inc(endpoint="chat", status=response.status)
+    return response
+
+async def _chat(request: ChatRequest):
     try:
         logger.info("Chat request received")
 
-        if not request.message or not request.message.strip():
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
-
         try:
-            if hasattr(gemini_client, 'generate_response_with_fallback'):
-                reply_text = await gemini_client.generate_response_with_fallback(request.message)
-            else:
-                reply_text = await chatbot(request.message, gemini_client)
+            turn = await chat_pipeline.run(request.message, request.userId)
+        except ValueError as e:
+            requests_total.inc(endpoint="chat", status="invalid")
+            raise HTTPException(status_code=400, detail=str(e))
 
-        except Exception as chat_error:
-            logger.error(f"Chat generation error: {chat_error}")
-            reply_text = "I'm sorry, I'm having trouble processing your request right now. Please try again later."
-
-        logger.info(f"Chat response generated: {len(reply_text)} characters")
+        logger.info(
+            "Chat response generated",
+            extra={"response_chars": len(turn.reply), "source": turn.source, "stage_ms": turn.timings},
+        )
 
         return ChatResponse(
-            message=reply_text,
+            message=turn.reply,
             timestamp=datetime.utcnow().isoformat(),
             status="success",
             success=True,
@@ -158,7 +439,7 @@ async def chat_endpoint(request: ChatRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.exception(f"Chat endpoint error: {e}")
+        logger.exception("Chat endpoint error: %s", e)
         return ChatResponse(
             message="Service temporarily unavailable. Please try again.",
             timestamp=datetime.utcnow().isoformat(),
@@ -167,22 +448,258 @@ async def chat_endpoint(request: ChatRequest):
             error_message="Internal server error",
         )
 
+# -------------------------------------------------------------------
+# Batch chat endpoint
+# -------------------------------------------------------------------
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch_endpoint(request: BatchChatRequest):
+    with track_request("batch"):
+        response = await _chat_batch(request)
+    requests_total.inc(endpoint="batch", status="success")
+    return response
+
+async def _chat_batch(request: BatchChatRequest):
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="messages cannot be empty")
+    if len(request.messages) > CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many messages (max {CHAT_BATCH_MAX_ITEMS} per batch)",
+        )
+
+    started = time.perf_counter()
+    results = [None] * len(request.messages)
+    valid, cleaned = [], []
+    for i, message in enumerate(request.messages):
+        try:
+            cleaned.append(chat_pipeline.validate(message))
+        except ValueError as e:
+            results[i] = BatchChatItem(
+                index=i, message=message, status="error", error_message=str(e)
+            )
+        else:
+            valid.append(i)
+
+    turns = await chat_pipeline.run_batch(cleaned, CHAT_BATCH_CONCURRENCY, validated=True)
+    seen = set()
+    for i, message, turn in zip(valid, cleaned, turns):
+        key = normalize_message(message)
+        results[i] = BatchChatItem(
+            index=i,
+            message=request.messages[i],
+            response=turn.reply,
+            source=turn.source,
+            status="success" if turn.source != "fallback" else "fallback",
+            deduplicated=key in seen,
+        )
+        seen.add(key)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(
+        "Chat batch finished",
+        extra={"messages": len(request.messages), "unique": len(seen), "elapsed_ms": round(elapsed_ms, 1)},
+    )
+    return BatchChatResponse(
+        results=results,
+        unique_messages=len(seen),
+        elapsed_ms=round(elapsed_ms, 2),
+        timestamp=datetime.utcnow().isoformat(),
+    )
+
+# -------------------------------------------------------------------
+# Streaming chat endpoint (Server-Sent Events)
+# -------------------------------------------------------------------
+class StreamStats:
+    """Running totals for streamed replies."""
+
+    def __init__(self):
+        self.streams = 0
+        self.errors = 0
+        self.first_chunk_ms_total = 0.0
+        self.total_ms_total = 0.0
+
+    def record(self, first_chunk_ms, total_ms, ok):
+        self.streams += 1
+        if not ok:
+            self.errors += 1
+        if first_chunk_ms is not None:
+            self.first_chunk_ms_total += first_chunk_ms
+        self.total_ms_total += total_ms
+
+    def summary(self):
+        n = self.streams
+        return {
+            "streams": n,
+            "errors": self.errors,
+            "avg_time_to_first_chunk_ms": round(self.first_chunk_ms_total / n, 2) if n else None,
+            "avg_total_ms": round(self.total_ms_total / n, 2) if n else None,
+        }
+
+_stream_stats = StreamStats()
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _chat_event_stream(message: str, user_id: str = None):
+    with track_request("stream"):
+        async for event in _timed_event_stream(message, user_id):
+            yield event
+
+async def _timed_event_stream(message: str, user_id: str = None):
+    started = time.perf_counter()
+    first_chunk_ms = None
+    ok = True
+    try:
+        async for event in chat_pipeline.stream(message, user_id, validated=True):
+            if first_chunk_ms is None:
+                first_chunk_ms = (time.perf_counter() - started) * 1000
+            kind = event.pop("event")
+            if kind == "error":
+                ok = False
+            yield _sse(kind, event)
+    except Exception as e:
+        logger.exception("Chat stream error: %s", e)
+        ok = False
+        yield _sse("error", {
+            "error_type": "internal",
+            "text": "I'm sorry, I'm having trouble processing your request right now. Please try again later.",
+            "partial": first_chunk_ms is not None,
+        })
+
+    total_ms = (time.perf_counter() - started) * 1000
+    _stream_stats.record(first_chunk_ms, total_ms, ok)
+    requests_total.inc(endpoint="stream", status="success" if ok else "error")
+    logger.info(
+        "Chat stream finished",
+        extra={
+            "first_chunk_ms": round(first_chunk_ms, 1) if first_chunk_ms is not None else None,
+            "total_ms": round(total_ms, 1),
+        },
+    )
+    yield _sse("done", {
+        "status": "success" if ok else "error",
+        "time_to_first_chunk_ms": round(first_chunk_ms, 2) if first_chunk_ms is not None else None,
+        "total_ms": round(total_ms, 2),
+        "timestamp": datetime.utcnow().isoformat(),
+    })
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    try:
+        message = chat_pipeline.validate(request.message)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info("Chat stream request received")
+    return StreamingResponse(
+        _chat_event_stream(message, request.userId),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# -------------------------------------------------------------------
+# Queued chat endpoints
+# -------------------------------------------------------------------
+# POST returns a job id straight away and a worker pool answers in the
+# background (app/job_queue.py); clients poll GET, or pass ?wait=N to be
+# answered as soon as the job finishes.
+def _job_response(job) -> ChatJobResponse:
+    return ChatJobResponse(
+        **job.snapshot(),
+        position=chat_jobs.position(job),
+        timestamp=datetime.utcnow().isoformat(),
+    )
+
+@app.post("/chat/jobs", response_model=ChatJobResponse, status_code=202)
+async def submit_chat_job(request: ChatRequest, response: Response, x_client_key: Optional[str] = Header(None)):
+    try:
+        message = chat_pipeline.validate(request.message)
+    except ValueError as e:
+        requests_total.inc(endpoint="chat_jobs", status="invalid")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    priority = chat_jobs.priority_for(x_client_key)
+    try:
+        job = await chat_jobs.submit(message, request.userId, priority)
+    except QueueFull as e:
+        requests_total.inc(endpoint="chat_jobs", status="rejected")
+        raise HTTPException(
+            status_code=429 if e.reason == "user_limit" else 503,
+            detail=f"Chat queue is busy ({e.reason}); please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    requests_total.inc(endpoint="chat_jobs", status="accepted")
+    response.headers["Location"] = f"/chat/jobs/{job.id}"
+    return _job_response(job)
+
+@app.get("/chat/jobs/{job_id}", response_model=ChatJobResponse)
+async def get_chat_job(job_id: str, wait: float = Query(0, ge=0, description="Seconds to wait for the result")):
+    job = chat_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    await chat_jobs.wait(job, min(wait, CHAT_JOB_MAX_WAIT_SECONDS))
+    return _job_response(job)
+
+# -------------------------------------------------------------------
+# Chat history endpoints
+# -------------------------------------------------------------------
+# User ids are picked by the client and sent in the clear, so reading or
+# wiping someone's conversation is an admin operation.
+@app.get("/chat/history/{user_id}")
+async def chat_history(user_id: str, x_admin_token: str = Header(None)):
+    check_admin_token(x_admin_token)
+    turns = await history_store.get_turns(user_id)
+    return {
+        "user_id": user_id,
+        "history": [
+            {
+                "message": message,
+                "response": reply,
+                "timestamp": datetime.utcfromtimestamp(created_at).isoformat(),
+            }
+            for created_at, message, reply in turns
+        ],
+    }
+
+@app.delete("/chat/history/{user_id}")
+async def clear_chat_history(user_id: str, x_admin_token: str = Header(None)):
+    check_admin_token(x_admin_token)
+    await history_store.clear(user_id)
+    return {"user_id": user_id, "cleared": True}
+
 # -------------------------------------------------------------------
 # Startup event
 # -------------------------------------------------------------------
 @app.on_event("startup")
 async def startup_event():
     logger.info("🚀 Restaurant Chatbot API starting up...")
-    logger.info(f"Allowed CORS origins: ["*"]")
+    logger.info('Allowed CORS origins: ["*"]')
+    # Load the Gemini SDK in the background; local answers work meanwhile
+    gemini_client.start_warm_up()
+    await health_monitor.start(gemini_client.probe, gemini_client._classify_error)
+    await restaurant_context.start_watching(CONTEXT_WATCH_INTERVAL_SECONDS)
+    await moderation_engine.start_watching()
+    chat_jobs.start()
     logger.info("✅ API is ready to receive requests")
 
+# -------------------------------------------------------------------
+# Shutdown event
+# -------------------------------------------------------------------
+@app.on_event("shutdown")
+async def shutdown_event():
+    await health_monitor.stop()
+    await restaurant_context.stop_watching()
+    await moderation_engine.stop_watching()
+    await chat_jobs.stop()
+    shutdown_logging()
+
 # -------------------------------------------------------------------
 # Main entry point (if local run)
 # -------------------------------------------------------------------
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8001))
-    logger.info(f"Starting server on port {port}")
+    logger.info("Starting server on port %s", port)
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
@@ -0,0 +1,271 @@
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond local answers to slow
+# Gemini calls
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# Size buckets for prompts (estimated tokens) and replies (characters)
+PROMPT_TOKEN_BUCKETS = (50, 100, 200, 400, 800, 1600, 3200, 6400)
+RESPONSE_CHAR_BUCKETS = (50, 100, 200, 400, 800, 1600, 3200)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A value that only goes up."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Counts observations into cumulative buckets, Prometheus style."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets: Sequence[float], labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * len(self.buckets)
+            self._sums[key] = 0.0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self._sums[key] += value
+
+    def _samples(self):
+        lines = []
+        for key in sorted(self._counts):
+            cumulative = 0
+            for bound, count in zip(self.buckets, self._counts[key]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds every metric and renders them in the Prometheus text format.
+
+    Collectors are callbacks run just before rendering; they copy numbers
+    the app already tracks (queue depth, breaker state, cache size) into
+    gauges so those are never counted twice.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], None]] = []
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, buckets, labelnames=()) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets, labelnames))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+# Global registry and the chat path's metrics
+registry = MetricsRegistry()
+
+stage_latency = registry.histogram(
+    "caficafe_chat_stage_seconds",
+    "Time spent in each chat pipeline stage, and in the steps timed inside them.",
+    LATENCY_BUCKETS,
+    labelnames=("stage",),
+)
+request_latency = registry.histogram(
+    "caficafe_chat_request_seconds",
+    "End-to-end time to answer a chat request.",
+    LATENCY_BUCKETS,
+    labelnames=("endpoint",),
+)
+requests_total = registry.counter(
+    "caficafe_chat_requests_total",
+    "Chat requests by endpoint and outcome.",
+    labelnames=("endpoint", "status"),
+)
+requests_in_flight = registry.gauge(
+    "caficafe_chat_requests_in_flight",
+    "Chat requests currently being answered.",
+    labelnames=("endpoint",),
+)
+answers_total = registry.counter(
+    "caficafe_chat_answers_total",
+    "Replies by where they came from (local, cache, paraphrase, coalesced, model, fallback, error).",
+    labelnames=("source",),
+)
+gemini_errors_total = registry.counter(
+    "caficafe_gemini_errors_total",
+    "Failed Gemini calls by error class.",
+    labelnames=("error_type",),
+)
+model_latency = registry.histogram(
+    "caficafe_gemini_model_seconds",
+    "Latency of successful Gemini calls by model tier, including the wait for a slot.",
+    LATENCY_BUCKETS,
+    labelnames=("model",),
+)
+hedges_total = registry.counter(
+    "caficafe_gemini_hedges_total",
+    "Extra calls to the next model tier: launched, skipped (budget, quota or load) and won.",
+    labelnames=("outcome",),
+)
+job_wait = registry.histogram(
+    "caficafe_chat_job_wait_seconds",
+    "Time queued chat jobs wait for a worker, by priority class.",
+    LATENCY_BUCKETS,
+    labelnames=("priority",),
+)
+jobs_total = registry.counter(
+    "caficafe_chat_jobs_total",
+    "Queued chat jobs by priority class and outcome (done, failed, rejected).",
+    labelnames=("priority", "outcome"),
+)
+prompt_tokens = registry.histogram(
+    "caficafe_prompt_tokens",
+    "Estimated size of prompts sent to Gemini, in tokens.",
+    PROMPT_TOKEN_BUCKETS,
+)
+gemini_tokens = registry.counter(
+    "caficafe_gemini_tokens_total",
+    "Tokens spent on Gemini calls (input, output), as reported by Gemini or estimated.",
+    labelnames=("direction",),
+)
+response_chars = registry.histogram(
+    "caficafe_response_chars",
+    "Size of replies sent to customers, in characters.",
+    RESPONSE_CHAR_BUCKETS,
+)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Time the enclosed block as one stage of the chat path."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_latency.observe(time.perf_counter() - started, stage=stage)
+
+
+@contextmanager
+def track_request(endpoint: str):
+    """Count a chat request as in flight and record its total latency."""
+    requests_in_flight.inc(endpoint=endpoint)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        requests_in_flight.dec(endpoint=endpoint)
+        request_latency.observe(time.perf_counter() - started, endpoint=endpoint)
@@ -0,0 +1,111 @@
+from collections import deque
+from typing import List, Optional
+
+# Successful call latencies kept per model for the hedge threshold
+LATENCY_WINDOW = 256
+
+# Below this many samples the configured default delay is used
+MIN_SAMPLES = 20
+
+
+def parse_models(spec: str) -> List[str]:
+    """Parse "models/a,models/b" into a tier list, primary first."""
+    names = []
+    for name in spec.split(","):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+class ModelStats:
+    """Call outcomes and recent latencies for one model tier."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.wins = 0
+        self.errors = 0
+        self.cancelled = 0
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._sorted: Optional[List[float]] = None
+
+    def record_latency(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+        self._sorted = None
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Nearest-rank percentile of recent successful calls, in seconds."""
+        if len(self._latencies) < MIN_SAMPLES:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._latencies)
+        index = min(len(self._sorted) - 1, max(0, int(round(p / 100 * len(self._sorted))) - 1))
+        return self._sorted[index]
+
+    def snapshot(self) -> dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "calls": self.calls,
+            "wins": self.wins,
+            "win_rate": round(self.wins / self.calls, 3) if self.calls else None,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class HedgePolicy:
+    """
+    Decides when to send a hedged call to the next model tier, and caps
+    how many go out.
+
+    A tier is hedged once its call has run longer than its observed
+    `percentile` latency (or `default_delay` until enough calls have been
+    seen), never sooner than `min_delay`. Every primary call earns
+    `budget_ratio` of a hedge and each hedge spends one, so hedges stay
+    at most that share of traffic; `burst` bounds the savings.
+    """
+
+    def __init__(self, percentile: float, default_delay: float, min_delay: float,
+                 budget_ratio: float, burst: float = 10.0):
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.budget_ratio = budget_ratio
+        self.burst = max(1.0, burst)
+        self._tokens = 0.0
+
+        self.launched = 0
+        self.skipped = 0
+
+    def delay(self, stats: ModelStats) -> float:
+        observed = stats.percentile(self.percentile)
+        if observed is None:
+            return max(self.min_delay, self.default_delay)
+        return max(self.min_delay, observed)
+
+    def credit(self) -> None:
+        """A primary call went out: earn a fraction of a hedge."""
+        self._tokens = min(self.burst, self._tokens + self.budget_ratio)
+
+    def try_spend(self) -> bool:
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def refund(self) -> None:
+        self._tokens = min(self.burst, self._tokens + 1.0)
+
+    def snapshot(self) -> dict:
+        return {
+            "percentile": self.percentile,
+            "default_delay_ms": round(self.default_delay * 1000),
+            "min_delay_ms": round(self.min_delay * 1000),
+            "budget_ratio": self.budget_ratio,
+            "budget_available": round(self._tokens, 2),
+            "launched": self.launched,
+            "skipped": self.skipped,
+        }
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import MODERATION_FILE, MODERATION_RELOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Used when the moderation file is missing or unreadable at startup
+DEFAULT_RULES = {
+    "max_length": 1000,
+    "blocked_terms": ["spam", "hack", "exploit"],
+    "blocked_prefixes": [],
+}
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _word_list(rules: dict, field: str) -> List[str]:
+    """A list-of-strings rule field, lower-cased; raises ValueError otherwise."""
+    values = rules.get(field, [])
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise ValueError(f"'{field}' must be a list of strings")
+    return [word for word in (value.lower().strip() for value in values) if word]
+
+
+def parse_rules(rules) -> Tuple[List[str], List[str], int]:
+    """
+    Check a moderation rules object and return (terms, prefixes,
+    max_length). Raises ValueError if it has the wrong shape.
+    """
+    if not isinstance(rules, dict):
+        raise ValueError(f"moderation rules must be an object, got {type(rules).__name__}")
+    max_length = rules.get("max_length", DEFAULT_RULES["max_length"])
+    if isinstance(max_length, bool) or not isinstance(max_length, int) or max_length < 1:
+        raise ValueError("'max_length' must be a positive integer")
+    return _word_list(rules, "blocked_terms"), _word_list(rules, "blocked_prefixes"), max_length
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: one pass over the text finds every occurrence of
+    every pattern, so the cost depends on the text length and the number of
+    matches, not on how many patterns there are.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        for index, pattern in enumerate(patterns):
+            self._insert(pattern, index)
+        self._link()
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield (end position, pattern index) for every match in `text`."""
+        delta, out = self._delta, self._out
+        state = 0
+        for position, ch in enumerate(text):
+            # One dict lookup per character; characters no pattern uses
+            # are missing from every row and send the scan back to the root
+            state = delta[state].get(ch, 0)
+            if out[state]:
+                for index in out[state]:
+                    yield position, index
+
+    def _insert(self, pattern: str, index: int) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append(index)
+
+    def _link(self) -> None:
+        # Breadth-first, so every state's failure target is built before it
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._delta = self._build_delta()
+
+    def _build_delta(self) -> List[Dict[str, int]]:
+        # Fold the failure links into a full transition table (a DFA), so
+        # the scan never walks back through them at match time
+        delta: List[Dict[str, int]] = [dict(self._goto[0])]
+        order = deque(self._goto[0].values())
+        rows = {0: delta[0]}
+        while order:
+            state = order.popleft()
+            row = dict(rows[self._fail[state]])
+            row.update(self._goto[state])
+            rows[state] = row
+            order.extend(self._goto[state].values())
+        return [rows[state] for state in range(len(self._goto))]
+
+
+class ModerationEngine:
+    """
+    Validates and screens incoming chat messages for every /chat endpoint.
+
+    Rules come from data/moderation.json: `blocked_terms` must match whole
+    words ("hack" blocks "hack" but not "hackathon"), `blocked_prefixes`
+    match any word that starts with them, and `max_length` caps the
+    cleaned message. Once start_watching() runs, a background task checks
+    the file every MODERATION_RELOAD_SECONDS in a worker thread and
+    re-reads it when its modification time changes; a broken file keeps
+    the previous rules. Validation itself never touches the disk.
+    """
+
+    def __init__(self, path: str, reload_seconds: float):
+        self.path = path
+        self.reload_seconds = reload_seconds
+        self._mtime: Optional[float] = None
+        # Modification time of a file that failed to load; not retried until it changes
+        self._failed_mtime: Optional[float] = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+        self.checked = 0
+        self.rejected = 0
+        self.reloads = 0
+        self.reload_errors = 0
+
+        self._install(DEFAULT_RULES)
+        self.reload()
+
+    def validate(self, message: str) -> str:
+        """
+        Return the message with whitespace collapsed, or raise ValueError
+        if it is empty, too long or contains blocked content.
+        """
+        self.checked += 1
+        if not message or not message.strip():
+            self.rejected += 1
+            raise ValueError("Message cannot be empty.")
+
+        cleaned = _WHITESPACE.sub(" ", message.strip())
+        if len(cleaned) > self.max_length:
+            self.rejected += 1
+            raise ValueError(f"Message too long (max {self.max_length} characters).")
+
+        if self.find_blocked(cleaned):
+            self.rejected += 1
+            raise ValueError("Message contains prohibited content.")
+        return cleaned
+
+    def find_blocked(self, text: str) -> List[str]:
+        """Every blocked term or prefix found in `text`, respecting word boundaries."""
+        matcher, is_prefix, _ = self._rules
+        lowered = text.lower()
+        found = []
+        for end, index in matcher.iter_matches(lowered):
+            pattern = matcher.patterns[index]
+            start = end - len(pattern) + 1
+            if start > 0 and _is_word_char(lowered[start - 1]):
+                continue
+            if not is_prefix[index] and end + 1 < len(lowered) and _is_word_char(lowered[end + 1]):
+                continue
+            found.append(pattern)
+        return found
+
+    def reload(self) -> bool:
+        """Re-read the rules file. Returns True if new rules were installed."""
+        mtime = None
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if mtime == self._mtime or mtime == self._failed_mtime:
+                return False
+            with open(self.path, "r", encoding="utf-8") as file:
+                rules = json.load(file)
+            self._install(rules)
+        except FileNotFoundError:
+            if self._mtime is None:
+                logger.warning("%s not found; using the default moderation rules", self.path)
+                self._mtime = 0.0
+            return False
+        except (OSError, ValueError) as e:
+            self.reload_errors += 1
+            self._failed_mtime = mtime
+            logger.error("Moderation rules reload failed, keeping the current rules: %s", e)
+            return False
+        self._mtime = mtime
+        self.reloads += 1
+        logger.info("Moderation rules loaded: %d patterns", len(self._rules[0].patterns))
+        return True
+
+    async def start_watching(self) -> None:
+        """Check the rules file for changes in the background."""
+        if self.reload_seconds <= 0:
+            return
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop_watching(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    @property
+    def max_length(self) -> int:
+        return self._rules[2]
+
+    def get_stats(self) -> dict:
+        return {
+            "patterns": len(self._rules[0].patterns),
+            "max_length": self.max_length,
+            "checked": self.checked,
+            "rejected": self.rejected,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
+
+    def _install(self, rules: dict) -> None:
+        terms, prefixes, max_length = parse_rules(rules)
+        # Build everything first, then swap, so a bad file changes nothing
+        matcher = AhoCorasick(terms + prefixes)
+        is_prefix = [False] * len(terms) + [True] * len(prefixes)
+        # Swapped in one assignment: reloads run in a worker thread, and a
+        # check running alongside sees either the old rules or the new
+        self._rules = (matcher, is_prefix, max_length)
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception:
+                # Never let one bad reload end hot reloading for good
+                logger.exception("Moderation rules reload failed")
+
+
+# Global instance shared by every chat endpoint
+moderation_engine = ModerationEngine(MODERATION_FILE, MODERATION_RELOAD_SECONDS)
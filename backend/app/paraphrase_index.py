@@ -0,0 +1,338 @@
+import logging
+import time
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from itertools import chain
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from .catalog import DataCatalog, data_catalog, edit_distance
+from .config import (
+    PARAPHRASE_BANDS,
+    PARAPHRASE_MAX_ENTRIES,
+    PARAPHRASE_THRESHOLD,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+from .restaurant_context import ContextSnapshot, RestaurantContext, restaurant_context
+from .text import stem, words
+
+logger = logging.getLogger(__name__)
+
+# Chat shorthand spelled out, so "when r u open" reads like "when are you open".
+# Bare numbers are left alone: "table for 2" and "table for 4" differ.
+SHORTHAND = {
+    "r": "are", "u": "you", "ur": "your", "y": "why", "b4": "before",
+    "pls": "please", "plz": "please", "thx": "thanks", "wat": "what",
+    "wen": "when", "tmrw": "tomorrow", "2day": "today", "2nite": "tonight",
+}
+
+# Words that carry no meaning in a customer question
+_FILLER = frozenset({
+    "a", "an", "and", "are", "at", "be", "can", "could", "do", "does", "for",
+    "hi", "hello", "hey", "how", "i", "if", "is", "it", "me", "my", "of", "on",
+    "or", "please", "tell", "thanks", "the", "there", "to", "we", "what",
+    "would", "you", "your", "caficafe",
+    # What is left of contractions once the apostrophe splits them: "what's"
+    "s", "t", "d", "ll", "m", "re", "ve",
+})
+
+# Different words for the same thing; all map onto the first form
+SYNONYMS = {
+    "when": "time", "hours": "time", "hour": "time", "schedule": "time",
+    "times": "time", "shut": "close", "cost": "price", "costs": "price",
+    "much": "price", "food": "menu", "dishes": "menu", "eat": "menu",
+}
+
+# Shorter terms must match exactly: one typo turns "pork" into "port" and
+# "beer" into "beef"
+MIN_FUZZY_LENGTH = 6
+
+# Fewer terms than this is too little to tell questions apart: "how do I
+# get there?" and "what do I get?" both come down to ("get",)
+MIN_TERMS = 2
+
+# Hash functions per signature; split into PARAPHRASE_BANDS bands
+NUM_HASHES = 48
+
+# Most recent questions kept per band bucket, so a lookup touches at most
+# bands x MAX_BUCKET_SIZE entries however big the index gets
+MAX_BUCKET_SIZE = 32
+
+# Most indexed questions compared exactly per lookup, most colliding first
+MAX_CANDIDATES = 16
+
+# 3-grams whose hash values are kept ready (about 200 bytes each)
+MAX_CACHED_GRAMS = 20000
+
+# Largest prime below 2**32, so hash values fit an unsigned int array
+_PRIME = 4294967291
+
+
+def question_terms(message: str) -> Tuple[str, ...]:
+    """
+    The meaningful words of a question, spelled out, lightly stemmed and
+    mapped onto common synonyms: "When r u opening?" -> ("open", "time").
+    """
+    terms = set()
+    for token in words(message):
+        token = SHORTHAND.get(token, token)
+        if token in _FILLER:
+            continue
+        terms.add(stem(SYNONYMS.get(token, token)))
+    return tuple(sorted(terms))
+
+
+def shingles(terms: Tuple[str, ...]) -> Set[str]:
+    """Character 3-grams of each term, so a typo changes only a few of them."""
+    grams = set()
+    for term in terms:
+        padded = f"#{term}#"
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class _Entry:
+    __slots__ = ("question", "terms", "grams", "bands", "answer", "context_key", "expires_at", "hits")
+
+    def __init__(self, question, terms, grams, bands, answer, context_key, expires_at):
+        self.question = question
+        self.terms = terms
+        self.grams = grams
+        self.bands = bands
+        self.answer = answer
+        self.context_key = context_key
+        self.expires_at = expires_at
+        self.hits = 0
+
+
+class ParaphraseIndex:
+    """
+    Finds an earlier question that asks the same thing in other words.
+
+    Questions are reduced to their meaningful terms (chat shorthand spelled
+    out, filler dropped, synonyms merged) and then to character 3-grams of
+    those terms. A MinHash signature of the 3-grams, cut into bands, is an
+    LSH index: questions that share any band are candidates, and only the
+    candidates are compared exactly. A match needs a 3-gram Jaccard of at
+    least `threshold`, and every term on either side needs a counterpart
+    on the other, so "vegan burger" never answers "vegan pizza". Only
+    words of MIN_FUZZY_LENGTH letters or more that are not part of a dish
+    name (see `catalog`) may differ by one typo, and questions with fewer
+    than MIN_TERMS terms are neither indexed nor looked up. Lookups cost
+    the same however many questions are indexed.
+
+    Answers were built from one context (data version and opening-hours
+    status, see hours_engine.context_key) and only match lookups made in
+    that context. A data reload empties the index; past `max_entries` the
+    least recently used question is dropped, and entries expire after
+    `ttl_seconds`, like the response cache.
+    """
+
+    def __init__(self, context: RestaurantContext, catalog: DataCatalog, threshold: float,
+                 max_entries: int, bands: int, ttl_seconds: float):
+        self.context = context
+        self.catalog = catalog
+        self.threshold = threshold
+        self.max_entries = max(0, max_entries)
+        self.bands = max(1, min(bands, NUM_HASHES))
+        self.rows = NUM_HASHES // self.bands
+        self.ttl_seconds = ttl_seconds
+        # Fixed seeds, so signatures mean the same thing in every worker
+        self._coefficients = [
+            (zlib.crc32(f"a{i}".encode()) | 1, zlib.crc32(f"b{i}".encode())) for i in range(NUM_HASHES)
+        ]
+        self._gram_hashes: Dict[str, array] = {}
+        self._name_tokens: Optional[FrozenSet[str]] = None
+        self._dish_terms: FrozenSet[str] = frozenset()
+
+        self._entries: "OrderedDict[Tuple[str, ...], _Entry]" = OrderedDict()
+        # Per band: band key -> questions in it (a dict, oldest first)
+        self._buckets: List[Dict[tuple, Dict[Tuple[str, ...], None]]] = [{} for _ in range(self.bands)]
+        self.version: Optional[str] = context.version
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.evictions = 0
+        context.add_reload_listener(self._on_reload)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def lookup(self, message: str, context_key: str) -> Optional[str]:
+        """The stored answer to a paraphrase of `message`, or None."""
+        if not self.enabled:
+            return None
+        self._ensure_current()
+        terms = question_terms(message)
+        if len(terms) < MIN_TERMS:
+            self.misses += 1
+            return None
+
+        entry = self._entries.get(terms)
+        if entry is None:
+            entry = self._best_candidate(terms)
+        if entry is None or entry.context_key != context_key or entry.expires_at <= time.time():
+            self.misses += 1
+            return None
+        entry.hits += 1
+        self.hits += 1
+        self._entries.move_to_end(entry.terms)
+        return entry.answer
+
+    def add(self, message: str, answer: str, context_key: str) -> None:
+        """Remember the model's answer to a question."""
+        if not self.enabled:
+            return
+        self._ensure_current()
+        terms = question_terms(message)
+        if len(terms) < MIN_TERMS:
+            return
+        old = self._entries.get(terms)
+        if old is not None:
+            self._remove(terms)
+        grams = shingles(terms)
+        bands = self._bands(grams)
+        self._entries[terms] = _Entry(
+            message, terms, grams, bands, answer, context_key, time.time() + self.ttl_seconds
+        )
+        for band, key in enumerate(bands):
+            bucket = self._buckets[band].setdefault(key, {})
+            bucket[terms] = None
+            if len(bucket) > MAX_BUCKET_SIZE:
+                del bucket[next(iter(bucket))]
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        for buckets in self._buckets:
+            buckets.clear()
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows_per_band": self.rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "rejected_near_misses": self.rejected,
+            "evictions": self.evictions,
+        }
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _best_candidate(self, terms: Tuple[str, ...]) -> Optional[_Entry]:
+        grams = shingles(terms)
+        collisions = Counter(chain.from_iterable(
+            buckets.get(key, ()) for buckets, key in zip(self._buckets, self._bands(grams))
+        ))
+
+        best, best_score = None, 0.0
+        for candidate, _ in collisions.most_common(MAX_CANDIDATES):
+            entry = self._entries[candidate]
+            score = jaccard(grams, entry.grams)
+            if score > best_score:
+                best, best_score = entry, score
+        if best is None or best_score < self.threshold:
+            return None
+        dishes = self._dishes()
+        if not (_covered(terms, best.terms, dishes) and _covered(best.terms, terms, dishes)):
+            # Close on the surface, but one side asks about something the other doesn't
+            self.rejected += 1
+            return None
+        return best
+
+    def _dishes(self) -> FrozenSet[str]:
+        """Dish-name words, reduced the same way as question terms."""
+        tokens = self.catalog.name_tokens()
+        if tokens is not self._name_tokens:
+            self._name_tokens = tokens
+            self._dish_terms = frozenset(stem(SYNONYMS.get(token, token)) for token in tokens)
+        return self._dish_terms
+
+    def _bands(self, grams: Set[str]) -> List[tuple]:
+        """The MinHash signature of `grams`, cut into band keys."""
+        # Element-wise minimum over the grams' hash vectors, done in C
+        signature = list(map(min, zip(*(self._hashes(gram) for gram in grams))))
+        rows = self.rows
+        return [tuple(signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def _hashes(self, gram: str) -> array:
+        """All NUM_HASHES hash values of one 3-gram."""
+        values = self._gram_hashes.get(gram)
+        if values is None:
+            if len(self._gram_hashes) >= MAX_CACHED_GRAMS:
+                self._gram_hashes.clear()
+            h = zlib.crc32(gram.encode("utf-8"))
+            values = array("I", [(a * h + b) % _PRIME for a, b in self._coefficients])
+            self._gram_hashes[gram] = values
+        return values
+
+    def _remove(self, terms: Tuple[str, ...]) -> None:
+        entry = self._entries.pop(terms)
+        for band, key in enumerate(entry.bands):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.pop(terms, None)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def _ensure_current(self) -> None:
+        if self.context.version != self.version:
+            self._on_reload(self.context.snapshot)
+
+    def _on_reload(self, snapshot: ContextSnapshot) -> None:
+        # Every stored answer was built from the old data
+        if snapshot.version != self.version:
+            if self._entries:
+                logger.info("Restaurant data changed; dropping %d indexed questions", len(self._entries))
+            self.clear()
+            self.version = snapshot.version
+
+
+def _covered(terms: Tuple[str, ...], others: Tuple[str, ...], dishes: FrozenSet[str]) -> bool:
+    """
+    Every term has a counterpart in `others`. Only long words that are not
+    dish names on either side may differ by one typo.
+    """
+    for term in terms:
+        if term in others:
+            continue
+        if len(term) < MIN_FUZZY_LENGTH or term in dishes:
+            return False
+        if not any(
+            len(other) >= MIN_FUZZY_LENGTH and other not in dishes and edit_distance(term, other, 1) <= 1
+            for other in others
+        ):
+            return False
+    return True
+
+
+# Global instance
+paraphrase_index = ParaphraseIndex(
+    restaurant_context,
+    data_catalog,
+    threshold=PARAPHRASE_THRESHOLD,
+    max_entries=PARAPHRASE_MAX_ENTRIES,
+    bands=PARAPHRASE_BANDS,
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from .config import CHAT_PIPELINE_STAGES
+from .gemini_client import gemini_client
+from .history_store import history_store, is_follow_up
+from .hours_engine import hours_engine
+from .intent_engine import intent_engine
+from .logging_config import sampled_body
+from .metrics import answers_total, response_chars, stage_latency, stage_timer
+from .moderation import moderation_engine
+from .paraphrase_index import paraphrase_index
+from .response_cache import normalize_message, response_cache
+from .restaurant_context import restaurant_context
+
+logger = logging.getLogger(__name__)
+
+# Stages that run even after an earlier stage has produced the reply
+_ALWAYS_RUN = frozenset({"postprocess"})
+
+
+class ChatTurn:
+    """
+    One chat request as it moves through the pipeline.
+
+    Stages read and fill in these fields; the first stage to set `reply`
+    and `source` (local, cache, paraphrase, coalesced, model, fallback, or
+    error for a stream that failed) short-circuits the rest, except
+    post-processing. `timings` holds milliseconds per stage.
+
+    A streaming turn (`stream`) has its model reply sent chunk by chunk;
+    `streamed` is set once the first chunk has gone out, after which the
+    reply can no longer be replaced.
+    """
+
+    __slots__ = ("message", "user_id", "snapshot", "history", "context_key",
+                 "cache_key", "reply", "source", "timings", "stream", "streamed")
+
+    def __init__(self, message: str, user_id: Optional[str] = None, stream: bool = False):
+        self.message = message
+        self.user_id = user_id
+        self.snapshot = None
+        self.history = ""
+        self.context_key = None
+        self.cache_key = None
+        self.reply: Optional[str] = None
+        self.source: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.stream = stream
+        self.streamed = False
+
+    def answer(self, reply: str, source: str) -> None:
+        self.reply = reply
+        self.source = source
+
+
+class ChatPipeline:
+    """
+    The request path shared by every /chat endpoint:
+
+        validate → normalize → intent → cache → paraphrase → model → postprocess
+
+    CHAT_PIPELINE_STAGES picks which stages run and in what order, so a
+    stage can be turned off (e.g. no cache) or moved without touching the
+    endpoints. Each stage is timed into caficafe_chat_stage_seconds (under
+    its own name) and into the turn's own `timings`.
+
+    run() answers one message, run_batch() many, and stream() yields the
+    answer as events; all three go through the same stages. When
+    streaming, the model stage relays Gemini's reply as it arrives.
+    """
+
+    def __init__(self, client, stage_names: List[str]):
+        self.client = client
+        available = {
+            "validate": self._validate,
+            "normalize": self._normalize,
+            "intent": self._intent,
+            "cache": self._cache,
+            "paraphrase": self._paraphrase,
+            "model": self._model,
+            "postprocess": self._postprocess,
+        }
+        unknown = [name for name in stage_names if name not in available]
+        if unknown:
+            raise ValueError(f"Unknown chat pipeline stages: {', '.join(unknown)}")
+        self.stage_names = list(stage_names)
+        self._stages = [(name, available[name]) for name in stage_names]
+        # Streaming variants: async generators yielding stream events
+        self._streaming = {"model": self._model_stream}
+
+    def validate(self, message: str) -> str:
+        """
+        Run only the validate stage, for endpoints that must reject a
+        message before they start answering (streams, jobs, batches).
+        Pass the result to run() with validated=True so the message is not
+        checked twice. Raises ValueError if it is rejected.
+        """
+        if "validate" not in self.stage_names:
+            return message
+        turn = ChatTurn(message)
+        started = time.perf_counter()
+        try:
+            self._check(turn)
+        finally:
+            stage_latency.observe(time.perf_counter() - started, stage="validate")
+        return turn.message
+
+    async def run(self, message: str, user_id: Optional[str] = None,
+                  validated: bool = False) -> ChatTurn:
+        """
+        Answer one message. Raises ValueError if validation rejects it;
+        any other stage failure falls back to a local answer. `validated`
+        skips the validate stage for a message that went through validate().
+        """
+        turn = ChatTurn(message, user_id)
+        async for _ in self._run(turn, validated):
+            pass
+        return turn
+
+    async def run_batch(self, messages: List[str], concurrency: int,
+                        validated: bool = False) -> List[ChatTurn]:
+        """
+        Answer many messages, e.g. to pre-generate kiosk or FAQ content,
+        at most `concurrency` at a time. Returns one turn per message, in
+        order; messages that normalize to the same text share one turn.
+        Batches carry no user id, so no history.
+        """
+        unique: Dict[str, str] = {}
+        for message in messages:
+            unique.setdefault(normalize_message(message), message)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def answer(message: str) -> ChatTurn:
+            async with semaphore:
+                return await self.run(message, validated=validated)
+
+        turns = await asyncio.gather(*(answer(message) for message in unique.values()))
+        by_key = dict(zip(unique, turns))
+        return [by_key[normalize_message(message)] for message in messages]
+
+    async def stream(self, message: str, user_id: Optional[str] = None,
+                     validated: bool = False) -> AsyncIterator[dict]:
+        """
+        Answer one message as a sequence of events.
+
+        Each event is a dict with an "event" key: "chunk" events carry a
+        piece of the reply and its source; an "error" event carries the
+        same canned reply /chat would have sent, and whether chunks went
+        out before it ("partial"). Answers that do not come from the model
+        stage arrive as a single chunk. Raises ValueError like run().
+        """
+        turn = ChatTurn(message, user_id, stream=True)
+        async for event in self._run(turn, validated):
+            yield event
+
+    async def _run(self, turn: ChatTurn, validated: bool) -> AsyncIterator[dict]:
+        logger.info(
+            "Generating response",
+            extra={"message_chars": len(turn.message), "body": sampled_body(turn.message)},
+        )
+        for name, stage in self._stages:
+            if turn.source is not None and name not in _ALWAYS_RUN:
+                continue
+            if validated and name == "validate":
+                continue
+            started = time.perf_counter()
+            try:
+                streaming = self._streaming.get(name) if turn.stream else None
+                if streaming is None:
+                    await stage(turn)
+                else:
+                    async for event in streaming(turn):
+                        yield event
+            except ValueError:
+                if name == "validate":
+                    raise
+                failure = self._stage_failed(turn, name)
+                if failure is not None:
+                    yield failure
+            except Exception:
+                failure = self._stage_failed(turn, name)
+                if failure is not None:
+                    yield failure
+            finally:
+                elapsed = time.perf_counter() - started
+                stage_latency.observe(elapsed, stage=name)
+                turn.timings[name] = round(elapsed * 1000, 3)
+
+        # Nothing answered (e.g. the model stage is switched off)
+        if turn.reply is None:
+            turn.answer(self.client.get_mock_response(turn.message), "fallback")
+        if turn.stream and not turn.streamed:
+            yield {"event": "chunk", "text": turn.reply, "source": turn.source}
+        logger.debug("Chat pipeline finished", extra={"source": turn.source, "stage_ms": turn.timings})
+
+    def get_stats(self) -> dict:
+        return {"stages": self.stage_names}
+
+    def _stage_failed(self, turn: ChatTurn, name: str) -> Optional[dict]:
+        """
+        Fall back to a local answer. Returns the error event to send if
+        part of a streamed reply has already gone out.
+        """
+        logger.exception("Chat pipeline stage %s failed", name)
+        if turn.streamed:
+            if turn.source == "error":
+                return None
+            text = self.client._get_fallback_response()
+            turn.answer((turn.reply or "") + text, "error")
+            return {"event": "error", "error_type": "internal", "text": text, "partial": True}
+        if turn.reply is None:
+            turn.answer(self.client.get_mock_response(turn.message), "fallback")
+        return None
+
+    # ------------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------------
+    async def _validate(self, turn: ChatTurn) -> None:
+        self._check(turn)
+
+    @staticmethod
+    def _check(turn: ChatTurn) -> None:
+        turn.message = moderation_engine.validate(turn.message)
+
+    async def _normalize(self, turn: ChatTurn) -> None:
+        turn.message = " ".join(turn.message.split())
+        # Pin one context snapshot so the cache key and prompt always agree
+        turn.snapshot = restaurant_context.snapshot
+        # The status line in the prompt changes through the day, so it is
+        # part of the key along with the data version
+        turn.context_key = hours_engine.context_key(turn.snapshot)
+        turn.cache_key = response_cache.make_key(turn.message, turn.context_key)
+        # Only follow-ups need the conversation so far; a self-contained
+        # question is answered without it and shared with everyone else
+        if turn.user_id and is_follow_up(turn.message):
+            with stage_timer("history"):
+                turn.history = await history_store.render_for_prompt(turn.user_id)
+
+    async def _intent(self, turn: ChatTurn) -> None:
+        # Structured questions (hours, address, booking, prices) never need the model
+        local_answer = intent_engine.answer(turn.message)
+        if local_answer is not None:
+            logger.debug("Answered locally by intent engine")
+            turn.answer(local_answer, "local")
+
+    async def _cache(self, turn: ChatTurn) -> None:
+        # Follow-ups depend on the conversation so far, which no other
+        # request shares: they skip the cache
+        if turn.history or turn.cache_key is None:
+            return
+        cached = await response_cache.get(turn.cache_key)
+        if cached is not None:
+            logger.debug("Serving cached response")
+            turn.answer(cached, "cache")
+
+    async def _paraphrase(self, turn: ChatTurn) -> None:
+        # Same question in other words, answered earlier in this context
+        if turn.history or turn.context_key is None:
+            return
+        answer = paraphrase_index.lookup(turn.message, turn.context_key)
+        if answer is not None:
+            logger.debug("Serving the answer to a paraphrased question")
+            turn.answer(answer, "paraphrase")
+
+    async def _model(self, turn: ChatTurn) -> None:
+        snapshot = turn.snapshot or restaurant_context.snapshot
+        if turn.history or turn.cache_key is None:
+            reply, from_model = await self.client._generate(
+                turn.message, snapshot, turn.user_id, turn.history
+            )
+        else:
+            reply, from_model = await self.client._generate_shared(
+                turn.message, snapshot, turn.cache_key, turn.user_id
+            )
+        turn.answer(reply, "model" if from_model else "fallback")
+
+    async def _model_stream(self, turn: ChatTurn) -> AsyncIterator[dict]:
+        # The model stage for stream(): relay events as Gemini sends them
+        snapshot = turn.snapshot or restaurant_context.snapshot
+        shared_key = None if turn.history else turn.cache_key
+        shown = []
+        async for event in self.client._stream_reply(
+            turn.message, snapshot, shared_key, turn.user_id, turn.history
+        ):
+            if event["event"] == "error":
+                if not event["partial"]:
+                    shown = []
+                shown.append(event["text"])
+                turn.answer("".join(shown), "error")
+            else:
+                shown.append(event["text"])
+                turn.answer("".join(shown), turn.source or event["source"])
+            turn.streamed = True
+            yield event
+
+    async def _postprocess(self, turn: ChatTurn) -> None:
+        reply = (turn.reply or "").strip()
+        if turn.streamed:
+            # Already sent; only the bookkeeping is left
+            pass
+        elif not reply:
+            logger.warning("Empty reply; answering locally")
+            turn.answer(self.client.get_mock_response(turn.message), "fallback")
+        else:
+            turn.reply = reply
+        answers_total.inc(source=turn.source)
+        response_chars.observe(len(turn.reply or ""))
+        # Only a complete reply goes into the history, never a stream that
+        # failed part-way
+        if turn.user_id and turn.source != "error":
+            await history_store.append(turn.user_id, turn.message, turn.reply)
+
+
+def parse_stages(spec: str) -> List[str]:
+    """Parse "validate,normalize,intent" into a list of stage names."""
+    return [name.strip() for name in spec.split(",") if name.strip()]
+
+
+# Global instance shared by every chat endpoint
+chat_pipeline = ChatPipeline(gemini_client, parse_stages(CHAT_PIPELINE_STAGES))
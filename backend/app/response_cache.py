@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .config import (
+    RESPONSE_CACHE_DB,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+# Expired rows are purged from disk once every this many writes
+_PURGE_EVERY = 100
+
+
+def normalize_message(message: str) -> str:
+    """Lower-case a message and strip punctuation and extra whitespace."""
+    cleaned = _PUNCTUATION.sub(" ", message.lower())
+    return _WHITESPACE.sub(" ", cleaned).strip()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for chatbot answers.
+
+    The first tier is an in-process LRU with a TTL. The second is a SQLite
+    file that survives restarts and is shared by every uvicorn worker on the
+    machine. Disk access runs in a worker thread so it never blocks the
+    event loop, and disk errors are logged and treated as misses.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, db_path: Optional[str]):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path or None
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._local = threading.local()
+        self._writes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_errors = 0
+
+        if self.db_path:
+            try:
+                self._init_db()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Disabling disk response cache (%s): %s", self.db_path, e)
+                self.db_path = None
+
+    @staticmethod
+    def make_key(message: str, context_version: str) -> str:
+        """Build a cache key from the normalized message and the context version."""
+        raw = f"{context_version}\x00{normalize_message(message)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look a key up in memory first, then on disk."""
+        response = self._memory_get(key)
+        if response is not None:
+            self.memory_hits += 1
+            return response
+
+        if self.db_path:
+            row = await asyncio.to_thread(self._disk_get, key)
+            if row is not None:
+                response, expires_at = row
+                self._memory_set(key, response, expires_at)
+                self.disk_hits += 1
+                return response
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, response: str) -> None:
+        """Store a response in both tiers."""
+        expires_at = time.time() + self.ttl_seconds
+        self._memory_set(key, response, expires_at)
+        if self.db_path:
+            await asyncio.to_thread(self._disk_set, key, response, expires_at)
+
+    def clear(self) -> None:
+        """Drop every in-memory entry. The disk tier expires on its own."""
+        self._memory.clear()
+
+    def get_stats(self) -> dict:
+        """Report hit, miss and eviction counters for both tiers."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_enabled": self.db_path is not None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "disk_errors": self.disk_errors,
+        }
+
+    # ------------------------------------------------------------------
+    # Memory tier
+    # ------------------------------------------------------------------
+    def _memory_get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        response, expires_at = entry
+        if expires_at <= time.time():
+            del self._memory[key]
+            self.expirations += 1
+            return None
+        self._memory.move_to_end(key)
+        return response
+
+    def _memory_set(self, key: str, response: str, expires_at: float) -> None:
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    # ------------------------------------------------------------------
+    # Disk tier
+    # ------------------------------------------------------------------
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        try:
+            row = self._connection().execute(
+                "SELECT response, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+            return row
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning("Response cache read failed: %s", e)
+            return None
+
+    def _disk_set(self, key: str, response: str, expires_at: float) -> None:
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                (key, response, expires_at),
+            )
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            conn.commit()
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning("Response cache write failed: %s", e)
+
+
+# Global instance
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+    db_path=RESPONSE_CACHE_DB,
+)
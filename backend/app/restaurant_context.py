@@ -1,30 +1,61 @@
+import asyncio
+import hashlib
 import json
+import logging
 import os
-from typing import Dict, Any
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-class RestaurantContext:
-    """Loads and manages restaurant context from multiple JSON files."""
+logger = logging.getLogger(__name__)
+
+DATA_FILES = ('menu.json', 'hours.json', 'restaurant_info.json')
+
+# JSON type of each section the context reads, per data file
+DATA_LAYOUT = {
+    'menu.json': {'signature_dishes': list, 'recommended_dishes': list, 'dietary_accommodations': dict},
+    'hours.json': {'regular_hours': dict, 'holiday_hours': dict, 'special_notes': list},
+    'restaurant_info.json': {
+        'basic_info': dict, 'location': dict, 'booking': dict, 'contact': dict, 'features': list,
+    },
+}
+
+def check_layout(filename: str, data: Any) -> None:
+    """Raise ValueError unless `data` has the sections a data file should."""
+    if not isinstance(data, dict):
+        raise ValueError(f"{filename}: expected an object, got {type(data).__name__}")
+    for section, expected in DATA_LAYOUT.get(filename, {}).items():
+        if section in data and not isinstance(data[section], expected):
+            raise ValueError(
+                f"{filename}: '{section}' should be {expected.__name__}, got {type(data[section]).__name__}"
+            )
+
+class ContextSnapshot:
+    """One immutable load of the restaurant data, with its prompt pre-rendered."""
     
-    def __init__(self):
-        self.data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
-        self.menu_data = self._load_json('menu.json')
-        self.hours_data = self._load_json('hours.json')
-        self.restaurant_info = self._load_json('restaurant_info.json')
-        
-    def _load_json(self, filename: str) -> Dict[str, Any]:
-        """Load JSON file from data directory."""
-        try:
-            file_path = os.path.join(self.data_dir, filename)
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return json.load(file)
-        except FileNotFoundError:
-            print(f"Warning: {filename} not found in {self.data_dir}")
-            return {}
-        except json.JSONDecodeError:
-            print(f"Error: Invalid JSON in {filename}")
-            return {}
+    def __init__(self, menu_data: Dict[str, Any], hours_data: Dict[str, Any],
+                 restaurant_info: Dict[str, Any], mtimes: Optional[Dict[str, float]] = None):
+        self.menu_data = menu_data
+        self.hours_data = hours_data
+        self.restaurant_info = restaurant_info
+        self.mtimes = mtimes or {}
+        self.loaded_at = time.time()
+        self.version = self._compute_version()
+        self.full_context = self._render_full_context()
     
+    def _compute_version(self) -> str:
+        """Hash the loaded data so caches can tell when it has changed."""
+        payload = json.dumps(
+            [self.menu_data, self.hours_data, self.restaurant_info],
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
     def get_full_context(self) -> str:
+        """Complete restaurant context for the AI chatbot."""
+        return self.full_context
+
+    def _render_full_context(self) -> str:
         """Generate complete restaurant context for the AI chatbot."""
         context = f"""
 You are a helpful customer service chatbot for CAFICAFE restaurant. 
@@ -58,16 +89,75 @@ BOOKING INFORMATION:
 FEATURES:
 {self._format_features()}
 
-INSTRUCTIONS:
+{self.render_instructions()}
+"""
+        return context
+    
+    def render_instructions(self) -> str:
+        """The behaviour instructions that close every prompt."""
+        return f"""INSTRUCTIONS:
 - Always be friendly, helpful, and professional
 - Provide accurate information based on the context above
 - If asked about something not covered, politely say you don't have that information and suggest contacting the restaurant directly
 - For reservations, direct customers to call {self.restaurant_info.get('location', {}).get('phone', '')} or use the online system
 - Mention student discounts when relevant
 - Be welcoming to tourists and explain dishes clearly
-- If someone asks about allergens or dietary restrictions, always recommend speaking with staff directly for safety
-"""
-        return context
+- If someone asks about allergens or dietary restrictions, always recommend speaking with staff directly for safety"""
+    
+    def render_preamble(self) -> str:
+        """The short header used when only part of the context is sent."""
+        basic_info = self.restaurant_info.get('basic_info', {})
+        return f"""
+You are a helpful customer service chatbot for CAFICAFE restaurant. 
+
+RESTAURANT INFORMATION:
+- Name: {basic_info.get('name', 'CAFICAFE')}
+- Tagline: {basic_info.get('tagline', '')}
+- Phone: {self.restaurant_info.get('location', {}).get('phone', '')}"""
+    
+    def get_context_chunks(self) -> List[Tuple[str, str]]:
+        """
+        Split the context into small (section, text) pieces for retrieval.
+        Sections use the same headings as the full context.
+        """
+        info = self.restaurant_info
+        location = info.get('location', {})
+        chunks = []
+        
+        description = info.get('basic_info', {}).get('description')
+        if description:
+            chunks.append(("RESTAURANT INFORMATION", f"- Description: {description}"))
+        
+        for label, key in (("Address", "address"), ("Phone", "phone"), ("Email", "email"), ("Directions", "directions")):
+            if location.get(key):
+                chunks.append(("LOCATION & CONTACT", f"- {label}: {location[key]}"))
+        
+        hours = self.hours_data.get('regular_hours', {})
+        if hours:
+            chunks.append(("OPENING HOURS", "\n".join(f"- {day.capitalize()}: {time}" for day, time in hours.items())))
+        for note in self.hours_data.get('special_notes', []):
+            chunks.append(("OPENING HOURS", f"- {note}"))
+        
+        for section, key in (("SIGNATURE DISHES", 'signature_dishes'), ("RECOMMENDED DISHES", 'recommended_dishes')):
+            for dish in self.menu_data.get(key, []):
+                line = f"- {dish.get('name', '')}: {dish.get('description', '')} - {dish.get('price', '')}"
+                if dish.get('dietary_info'):
+                    line += f" ({'; '.join(dish['dietary_info'])})"
+                chunks.append((section, line))
+        
+        for diet_type, text in self.menu_data.get('dietary_accommodations', {}).items():
+            chunks.append(("DIETARY ACCOMMODATIONS", f"- {diet_type.replace('_', ' ').title()}: {text}"))
+        
+        booking = info.get('booking', {})
+        if booking.get('methods'):
+            chunks.append(("BOOKING INFORMATION", "Booking Methods:\n" + "\n".join(f"- {m}" for m in booking['methods'])))
+        for policy in booking.get('policies', []):
+            chunks.append(("BOOKING INFORMATION", f"- {policy}"))
+        
+        for feature in info.get('features', []):
+            chunks.append(("FEATURES", f"- {feature}"))
+        
+        return chunks
     
     def _format_hours(self) -> str:
         """Format opening hours information."""
@@ -133,5 +223,180 @@ INSTRUCTIONS:
             formatted.append(f"- {feature}")
         return "\n".join(formatted)
 
+class RestaurantContext:
+    """
+    Loads restaurant context from multiple JSON files and hot-reloads it.
+    
+    The current data lives in an immutable ContextSnapshot. A reload parses
+    and renders a complete new snapshot before swapping the reference, so a
+    request that holds on to `snapshot` never sees a half-loaded context.
+    A reload that hits a missing or invalid file keeps the old snapshot.
+    """
+    
+    def __init__(self):
+        self.data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+        self.reload_count = 0
+        self.last_reload_error: Optional[str] = None
+        self._failed_mtimes: Optional[Dict[str, float]] = None
+        self._listeners: List[Callable[[ContextSnapshot], None]] = []
+        self._watch_task: Optional[asyncio.Task] = None
+        self.snapshot = self._read_snapshot(strict=False)
+    
+    # Read-only views of the current snapshot
+    @property
+    def menu_data(self) -> Dict[str, Any]:
+        return self.snapshot.menu_data
+    
+    @property
+    def hours_data(self) -> Dict[str, Any]:
+        return self.snapshot.hours_data
+    
+    @property
+    def restaurant_info(self) -> Dict[str, Any]:
+        return self.snapshot.restaurant_info
+    
+    @property
+    def version(self) -> str:
+        return self.snapshot.version
+    
+    @property
+    def loaded(self) -> bool:
+        """Whether every data file was read (a missing one loads as empty)."""
+        snapshot = self.snapshot
+        return bool(snapshot.menu_data and snapshot.hours_data and snapshot.restaurant_info)
+    
+    def get_full_context(self) -> str:
+        """Complete restaurant context for the AI chatbot."""
+        return self.snapshot.full_context
+    
+    def _load_json(self, filename: str, strict: bool = False) -> Dict[str, Any]:
+        """Load JSON file from data directory. In strict mode errors are raised."""
+        try:
+            file_path = os.path.join(self.data_dir, filename)
+            with open(file_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            check_layout(filename, data)
+            return data
+        except FileNotFoundError:
+            if strict:
+                raise
+            logger.warning("%s not found in %s", filename, self.data_dir)
+            return {}
+        except json.JSONDecodeError:
+            if strict:
+                raise
+            logger.error("Invalid JSON in %s", filename)
+            return {}
+        except ValueError as e:
+            if strict:
+                raise
+            logger.error("Ignoring %s", e)
+            return {}
+    
+    def _file_mtimes(self) -> Dict[str, float]:
+        mtimes = {}
+        for filename in DATA_FILES:
+            try:
+                mtimes[filename] = os.stat(os.path.join(self.data_dir, filename)).st_mtime
+            except OSError:
+                mtimes[filename] = 0.0
+        return mtimes
+    
+    def _read_snapshot(self, strict: bool) -> ContextSnapshot:
+        """Parse every data file and render a new snapshot. Touches no shared state."""
+        mtimes = self._file_mtimes()
+        menu_data = self._load_json('menu.json', strict)
+        hours_data = self._load_json('hours.json', strict)
+        restaurant_info = self._load_json('restaurant_info.json', strict)
+        try:
+            return ContextSnapshot(menu_data, hours_data, restaurant_info, mtimes)
+        except (AttributeError, KeyError, TypeError) as e:
+            # Right sections, wrong contents (e.g. a dish that is a string)
+            raise ValueError(f"Unexpected restaurant data layout: {e}") from e
+    
+    def _install(self, snapshot: ContextSnapshot) -> bool:
+        """Swap in a new snapshot and notify listeners if the data changed."""
+        previous = self.snapshot
+        self.snapshot = snapshot
+        self.last_reload_error = None
+        self._failed_mtimes = None
+        if snapshot.version == previous.version:
+            return False
+        self.reload_count += 1
+        logger.info("Restaurant context reloaded: %s -> %s", previous.version, snapshot.version)
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error("Context reload listener failed: %s", e)
+        return True
+    
+    def reload(self) -> bool:
+        """Re-read the data files. Returns True if the context changed."""
+        try:
+            snapshot = self._read_snapshot(strict=True)
+        except (OSError, ValueError) as e:
+            self._record_failure(e)
+            raise
+        return self._install(snapshot)
+    
+    async def reload_async(self) -> bool:
+        """Like reload(), but parses the files in a worker thread."""
+        try:
+            snapshot = await asyncio.to_thread(self._read_snapshot, True)
+        except (OSError, ValueError) as e:
+            self._record_failure(e)
+            raise
+        return self._install(snapshot)
+    
+    def _record_failure(self, error: Exception) -> None:
+        self.last_reload_error = f"{type(error).__name__}: {error}"
+        self._failed_mtimes = self._file_mtimes()
+        logger.error("Restaurant context reload failed, keeping version %s: %s", self.version, error)
+    
+    def add_reload_listener(self, listener: Callable[[ContextSnapshot], None]) -> None:
+        """Call `listener(snapshot)` after every reload that changes the data."""
+        self._listeners.append(listener)
+    
+    async def start_watching(self, interval: float) -> None:
+        """Poll the data files' modification times and reload when they change."""
+        if interval <= 0:
+            return
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch(interval))
+    
+    async def stop_watching(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+    
+    async def _watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            mtimes = self._file_mtimes()
+            if mtimes == self.snapshot.mtimes or mtimes == self._failed_mtimes:
+                continue
+            try:
+                await self.reload_async()
+            except (OSError, ValueError):
+                pass  # already logged; retried once the files change again
+            except Exception:
+                # Never let one bad reload end hot reloading for good
+                logger.exception("Restaurant context reload failed, keeping version %s", self.version)
+                self._failed_mtimes = mtimes
+    
+    def get_status(self) -> dict:
+        return {
+            "version": self.version,
+            "loaded_at": datetime.utcfromtimestamp(self.snapshot.loaded_at).isoformat(),
+            "reload_count": self.reload_count,
+            "last_reload_error": self.last_reload_error,
+            "watching": self._watch_task is not None and not self._watch_task.done(),
+        }
+
 # Global instance
 restaurant_context = RestaurantContext()
\ No newline at end of file
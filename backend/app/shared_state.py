@@ -0,0 +1,175 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Old window events and idle buckets are purged once every this many writes
+_PURGE_EVERY = 500
+
+# Buckets untouched for this long are full again and can be dropped
+_BUCKET_IDLE_SECONDS = 86400
+
+
+class SharedState:
+    """
+    State shared by every uvicorn worker on the machine, kept in one SQLite
+    file in WAL mode (a local stand-in for Redis).
+
+    It offers the primitives admission control needs: sliding-window event
+    logs, token buckets, expiring values and counters. Multi-step updates
+    run inside transaction(), which takes SQLite's write lock up front
+    (BEGIN IMMEDIATE) so a check-then-take is atomic across processes.
+    All methods block; call them from a worker thread.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._writes = 0
+        self._init_db()
+
+    @contextmanager
+    def transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+        self._writes += 1
+        if self._writes % _PURGE_EVERY == 0:
+            self._purge()
+
+    # ------------------------------------------------------------------
+    # Sliding windows
+    # ------------------------------------------------------------------
+    @staticmethod
+    def window_count(conn: sqlite3.Connection, name: str, seconds: float, now: float) -> int:
+        return conn.execute(
+            "SELECT COUNT(*) FROM window_events WHERE name = ? AND at > ?",
+            (name, now - seconds),
+        ).fetchone()[0]
+
+    @staticmethod
+    def window_oldest(conn: sqlite3.Connection, name: str, seconds: float, now: float) -> Optional[float]:
+        return conn.execute(
+            "SELECT MIN(at) FROM window_events WHERE name = ? AND at > ?",
+            (name, now - seconds),
+        ).fetchone()[0]
+
+    @staticmethod
+    def window_add(conn: sqlite3.Connection, name: str, now: float) -> None:
+        conn.execute("INSERT INTO window_events (name, at) VALUES (?, ?)", (name, now))
+
+    # ------------------------------------------------------------------
+    # Token buckets
+    # ------------------------------------------------------------------
+    @staticmethod
+    def bucket_tokens(conn: sqlite3.Connection, name: str, rate: float, capacity: float, now: float) -> float:
+        """Tokens in a bucket right now (a missing bucket is full)."""
+        row = conn.execute(
+            "SELECT tokens, updated FROM buckets WHERE name = ?", (name,)
+        ).fetchone()
+        if row is None:
+            return capacity
+        tokens, updated = row
+        return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+    @staticmethod
+    def bucket_set(conn: sqlite3.Connection, name: str, tokens: float, now: float) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+            (name, tokens, now),
+        )
+
+    # ------------------------------------------------------------------
+    # Values and counters
+    # ------------------------------------------------------------------
+    @staticmethod
+    def get_value(conn: sqlite3.Connection, name: str, default: float = 0.0) -> float:
+        row = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def set_value(conn: sqlite3.Connection, name: str, value: float) -> None:
+        conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)", (name, value))
+
+    @staticmethod
+    def incr(conn: sqlite3.Connection, name: str, amount: float = 1.0) -> None:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def read(self):
+        """A connection for read-only queries outside a transaction."""
+        return self._connection()
+
+    def counters(self, prefix: str) -> Dict[str, float]:
+        rows = self._connection().execute(
+            "SELECT name, value FROM counters WHERE name LIKE ? ESCAPE '\\'",
+            (prefix.replace("_", "\\_").replace("%", "\\%") + "%",),
+        ).fetchall()
+        return {name[len(prefix):]: value for name, value in rows}
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transaction() manages BEGIN/COMMIT itself
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS window_events (name TEXT NOT NULL, at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS window_events_name_at ON window_events (name, at)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value REAL NOT NULL)"
+        )
+
+    def _purge(self) -> None:
+        # Windows are at most a day long, so older events never count again
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute("DELETE FROM window_events WHERE at <= ?", (now - 86400,))
+            conn.execute("DELETE FROM buckets WHERE updated <= ?", (now - _BUCKET_IDLE_SECONDS,))
+        except sqlite3.Error as e:
+            logger.warning("Shared state purge failed: %s", e)
+
+
+def open_shared_state(db_path: Optional[str]) -> Optional[SharedState]:
+    """Open the shared store, or return None (process-local state) if unset or unusable."""
+    if not db_path:
+        return None
+    try:
+        return SharedState(db_path)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Shared state unavailable (%s), keeping state per process: %s", db_path, e)
+        return None
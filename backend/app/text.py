@@ -0,0 +1,27 @@
+import re
+from typing import List
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Suffixes stripped by stem(), longest first
+_SUFFIXES = ("ies", "ing", "ery", "ed", "es", "er", "ic", "s", "e", "y")
+
+
+def words(text: str) -> List[str]:
+    """
+    Lower-case words and numbers of a text, in order. Every module that
+    compares messages, data or dish names splits text this way, so they
+    all agree on what a word is.
+    """
+    return _WORD.findall(text.lower())
+
+
+def stem(word: str) -> str:
+    """
+    Very light suffix stripping so word forms meet: "allergic", "allergies"
+    and "allergy" all become "allerg"; "deliver" and "delivery" become "deliv".
+    """
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from .config import TOKEN_DAILY_BUDGET, TOKEN_HISTORY_DAYS
+from .context_retrieval import estimate_tokens
+from .shared_state import SharedState
+from .usage_tracker import usage_tracker
+
+logger = logging.getLogger(__name__)
+
+# Per-day totals kept for every Gemini call
+FIELDS = (
+    "calls",
+    "input_tokens",
+    "output_tokens",
+    "estimated_input_tokens",
+    "reported_calls",
+    "truncated_prompts",
+    "output_limit_hits",
+)
+
+# Before this much of the day has passed, the forecast leans on yesterday
+MIN_FORECAST_SECONDS = 3600
+
+
+def read_usage(response) -> Optional[Dict[str, int]]:
+    """
+    Token counts from a response's usage_metadata, or None if the SDK did
+    not report any (older SDKs, fakes, blocked candidates).
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    prompt = getattr(usage, "prompt_token_count", None)
+    output = getattr(usage, "candidates_token_count", None)
+    if prompt is None and output is None:
+        return None
+    return {"input": int(prompt or 0), "output": int(output or 0)}
+
+
+def hit_output_limit(response) -> bool:
+    """True if the reply was cut off by max_output_tokens."""
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return False
+    return getattr(reason, "name", str(reason)) == "MAX_TOKENS"
+
+
+def _day(now: float) -> str:
+    return datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d")
+
+
+class TokenLedger:
+    """
+    Daily token spend on Gemini.
+
+    Every call records its input and output tokens: the counts Gemini
+    reports in usage_metadata when it sends them, else our own estimate.
+    Totals are kept per UTC day for `history_days` days, next to the local
+    estimate of the input (so we can see how far off it is), the number of
+    prompts cut down to fit the input budget, and replies that ran into
+    max_output_tokens.
+
+    get_stats() projects today's spend from the pace so far and compares
+    tokens per call with the previous days, which is how a prompt that is
+    slowly growing shows up. With a SharedState store the totals are
+    shared by every worker, like the request quota.
+    """
+
+    def __init__(self, history_days: int, daily_budget: int,
+                 shared: Optional[SharedState] = None):
+        self.history_days = max(1, history_days)
+        self.daily_budget = daily_budget
+        self.shared = shared
+        self._days: Dict[str, Dict[str, int]] = {}
+        # Truncations not yet written to the shared store (see record_truncation)
+        self._pending_truncations = 0
+
+    async def record(self, prompt: str, response=None, reply: Optional[str] = None) -> Dict[str, int]:
+        """
+        Add one Gemini call to today's totals. `reply` is the text, for
+        estimating the output when the response carries no usage_metadata
+        (streams pass it; otherwise it is read from the response).
+        Returns the input and output tokens counted.
+        """
+        estimated = estimate_tokens(prompt)
+        usage = read_usage(response) if response is not None else None
+        if usage is None:
+            if reply is None:
+                reply = _response_text(response)
+            usage = {"input": estimated, "output": estimate_tokens(reply) if reply else 0}
+            reported = 0
+        else:
+            reported = 1
+        amounts = {
+            "calls": 1,
+            "input_tokens": usage["input"],
+            "output_tokens": usage["output"],
+            "estimated_input_tokens": estimated,
+            "reported_calls": reported,
+            "output_limit_hits": int(response is not None and hit_output_limit(response)),
+        }
+        now = time.time()
+        if self.shared is not None:
+            amounts["truncated_prompts"], self._pending_truncations = self._pending_truncations, 0
+            try:
+                await asyncio.to_thread(self._record_shared, amounts, now)
+                return usage
+            except sqlite3.Error as e:
+                logger.warning("Shared token ledger failed, counting locally: %s", e)
+        self._record_local(amounts, now)
+        return usage
+
+    def record_truncation(self) -> None:
+        """
+        A prompt had to be cut down to fit PROMPT_MAX_INPUT_TOKENS. Called
+        on the event loop while building the prompt, so with a shared store
+        the count is held here and written with the call's record().
+        """
+        if self.shared is not None:
+            self._pending_truncations += 1
+        else:
+            self._record_local({"truncated_prompts": 1}, time.time())
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        days = None
+        if self.shared is not None:
+            try:
+                days = self._shared_days()
+            except sqlite3.Error as e:
+                logger.warning("Could not read shared token ledger: %s", e)
+        if days is None:
+            days = self._days
+        return self._summarize(days, now)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+    def _record_local(self, amounts: Dict[str, int], now: float) -> None:
+        day = _day(now)
+        totals = self._days.get(day)
+        if totals is None:
+            totals = self._days[day] = dict.fromkeys(FIELDS, 0)
+            for old in sorted(self._days)[:-self.history_days]:
+                del self._days[old]
+        for field, amount in amounts.items():
+            totals[field] += amount
+
+    def _record_shared(self, amounts: Dict[str, int], now: float) -> None:
+        day = _day(now)
+        store = self.shared
+        with store.transaction() as conn:
+            for field, amount in amounts.items():
+                if amount:
+                    store.incr(conn, f"tokens:{day}:{field}", amount)
+            # On the first call of a day, drop totals that fell out of the history
+            if store.get_value(conn, f"tokens:{day}:calls") == amounts["calls"]:
+                cutoff = _day(now - self.history_days * 86400)
+                conn.execute(
+                    "DELETE FROM counters WHERE name LIKE 'tokens:%' AND name < ?",
+                    (f"tokens:{cutoff}",),
+                )
+
+    def _shared_days(self) -> Dict[str, Dict[str, int]]:
+        days: Dict[str, Dict[str, int]] = {}
+        for name, value in self.shared.counters("tokens:").items():
+            day, _, field = name.partition(":")
+            if field in FIELDS:
+                days.setdefault(day, dict.fromkeys(FIELDS, 0))[field] = int(value)
+        return days
+
+    def _summarize(self, days: Dict[str, Dict[str, int]], now: float) -> dict:
+        today = _day(now)
+        current = days.get(today, dict.fromkeys(FIELDS, 0))
+        previous = [days[day] for day in sorted(days) if day < today][-(self.history_days - 1):]
+        spent = current["input_tokens"] + current["output_tokens"]
+
+        midnight = datetime.fromtimestamp(now, timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        elapsed = now - midnight.timestamp()
+        yesterday = days.get((midnight - timedelta(days=1)).strftime("%Y-%m-%d"))
+        if elapsed >= MIN_FORECAST_SECONDS or not yesterday:
+            forecast = round(spent * 86400 / max(elapsed, MIN_FORECAST_SECONDS))
+        else:
+            forecast = max(spent, yesterday["input_tokens"] + yesterday["output_tokens"])
+
+        per_call_today = _per_call(current)
+        per_call_before = _per_call(_sum(previous)) if previous else None
+        return {
+            "shared": self.shared is not None,
+            "today": dict(current, total_tokens=spent),
+            "forecast_today_tokens": forecast,
+            "daily_budget": self.daily_budget or None,
+            "forecast_over_budget": bool(self.daily_budget) and forecast > self.daily_budget,
+            "input_tokens_per_call": per_call_today,
+            "input_tokens_per_call_previous_days": per_call_before,
+            "input_tokens_per_call_change": (
+                round(per_call_today / per_call_before - 1, 3)
+                if per_call_today and per_call_before else None
+            ),
+            # Reported / estimated input tokens, on calls Gemini reported on
+            "estimate_accuracy": _estimate_accuracy(current),
+            "history": [
+                {
+                    "day": day,
+                    "calls": days[day]["calls"],
+                    "input_tokens": days[day]["input_tokens"],
+                    "output_tokens": days[day]["output_tokens"],
+                    "input_tokens_per_call": _per_call(days[day]),
+                }
+                for day in sorted(days)[-self.history_days:]
+            ],
+        }
+
+
+def _response_text(response) -> str:
+    try:
+        return response.text or ""
+    except Exception:
+        # Blocked or empty candidates raise instead of returning ""
+        return ""
+
+
+def _sum(days: List[Dict[str, int]]) -> Dict[str, int]:
+    return {field: sum(day[field] for day in days) for field in FIELDS}
+
+
+def _per_call(totals: Dict[str, int]) -> Optional[float]:
+    return round(totals["input_tokens"] / totals["calls"], 1) if totals["calls"] else None
+
+
+def _estimate_accuracy(totals: Dict[str, int]) -> Optional[float]:
+    # Only meaningful when every call today was reported
+    if not totals["reported_calls"] or totals["reported_calls"] != totals["calls"]:
+        return None
+    return round(totals["input_tokens"] / max(1, totals["estimated_input_tokens"]), 3)
+
+
+# Global instance
+token_ledger = TokenLedger(
+    history_days=TOKEN_HISTORY_DAYS,
+    daily_budget=TOKEN_DAILY_BUDGET,
+    shared=usage_tracker.shared,
+)
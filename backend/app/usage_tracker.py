@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Optional
+
+from .config import (
+    GEMINI_QUOTA_COOLDOWN_SECONDS,
+    GEMINI_QUOTA_HEADROOM,
+    GEMINI_RPD_LIMIT,
+    GEMINI_RPM_LIMIT,
+    SHARED_STATE_DB,
+    USER_BURST,
+    USER_RPM_LIMIT,
+)
+from .shared_state import SharedState, open_shared_state
+
+logger = logging.getLogger(__name__)
+
+# Most user buckets kept at once; the least recently seen are dropped first
+MAX_TRACKED_USERS = 10000
+
+
+class SlidingWindow:
+    """Counts events in the last `seconds` seconds."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._events: deque = deque()
+
+    def count(self, now: float) -> int:
+        cutoff = now - self.seconds
+        while self._events and self._events[0] <= cutoff:
+            self._events.popleft()
+        return len(self._events)
+
+    def add(self, now: float) -> None:
+        self._events.append(now)
+
+    def oldest(self) -> Optional[float]:
+        return self._events[0] if self._events else None
+
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= 1.0
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1.0
+
+
+class UsageTracker:
+    """
+    Admission control for Gemini calls.
+
+    Per-minute and per-day sliding windows mirror Gemini's RPM and RPD
+    limits, kept `headroom` below them so we throttle before the API does.
+    A global token bucket smooths bursts, and per-user buckets (keyed on
+    user_id/userId) stop one client from using everyone's quota. When a
+    429 gets through anyway, all calls are refused for a cool-down period.
+
+    With a SharedState store the windows, buckets and cool-down live in
+    SQLite instead, so every uvicorn worker on the machine draws from the
+    same quota. If the store fails, the worker falls back to its own
+    in-memory accounting rather than refusing traffic.
+    """
+
+    def __init__(self, rpm_limit: int, rpd_limit: int, headroom: float,
+                 user_rpm: float, user_burst: float, cooldown: float,
+                 shared: Optional[SharedState] = None):
+        self.rpm_limit = max(1, int(rpm_limit * headroom))
+        self.rpd_limit = max(1, int(rpd_limit * headroom))
+        self.user_rpm = user_rpm
+        self.user_burst = user_burst
+        self.cooldown = cooldown
+        self.shared = shared
+
+        self.minute = SlidingWindow(60)
+        self.day = SlidingWindow(86400)
+        # Refills at the RPM rate; a full minute's budget may arrive at once
+        self.global_bucket = TokenBucket(self.rpm_limit / 60, self.rpm_limit)
+        self._user_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.blocked_until = 0.0
+
+        self.admitted = 0
+        self.rejected: Counter = Counter()
+        self.quota_errors = 0
+
+    async def admit(self, user_id: Optional[str] = None, reserve: float = 0.0) -> Optional[str]:
+        """
+        Try to reserve one Gemini call. Returns None if admitted, otherwise
+        the reason it was refused.
+
+        `reserve` keeps that share of the minute and day limits for other
+        calls: optional ones (hedges) pass it so they never use the last
+        of the quota. Their refusals are not counted in the stats.
+        """
+        if self.shared is not None:
+            try:
+                return await asyncio.to_thread(self._admit_shared, user_id, reserve)
+            except sqlite3.Error as e:
+                logger.warning("Shared quota store failed, using local accounting: %s", e)
+        return self._admit_local(user_id, reserve)
+
+    def _admit_local(self, user_id: Optional[str], reserve: float = 0.0) -> Optional[str]:
+        now = time.time()
+        tick = time.monotonic()
+        user_bucket = self._user_bucket(user_id) if user_id and self.user_rpm > 0 else None
+
+        if now < self.blocked_until:
+            reason = "quota_cooldown"
+        elif self.day.count(now) >= self.rpd_limit * (1 - reserve):
+            reason = "daily_limit"
+        elif self.minute.count(now) >= self.rpm_limit * (1 - reserve):
+            reason = "minute_limit"
+        elif user_bucket is not None and not user_bucket.available(tick):
+            reason = "user_limit"
+        elif not self.global_bucket.available(tick):
+            reason = "burst_limit"
+        else:
+            reason = None
+
+        if reason is not None:
+            if not reserve:
+                self.rejected[reason] += 1
+            return reason
+
+        self.global_bucket.take(tick)
+        if user_bucket is not None:
+            user_bucket.take(tick)
+        self.minute.add(now)
+        self.day.add(now)
+        self.admitted += 1
+        return None
+
+    def _admit_shared(self, user_id: Optional[str], reserve: float = 0.0) -> Optional[str]:
+        now = time.time()
+        store = self.shared
+        with store.transaction() as conn:
+            user_key = f"usage:user:{user_id}" if user_id and self.user_rpm > 0 else None
+            user_tokens = global_tokens = 0.0
+            if now < store.get_value(conn, "usage:blocked_until"):
+                reason = "quota_cooldown"
+            elif store.window_count(conn, "usage:calls", 86400, now) >= self.rpd_limit * (1 - reserve):
+                reason = "daily_limit"
+            elif store.window_count(conn, "usage:calls", 60, now) >= self.rpm_limit * (1 - reserve):
+                reason = "minute_limit"
+            else:
+                reason = None
+                if user_key:
+                    user_tokens = store.bucket_tokens(conn, user_key, self.user_rpm / 60, self.user_burst, now)
+                    if user_tokens < 1.0:
+                        reason = "user_limit"
+                if reason is None:
+                    global_tokens = store.bucket_tokens(
+                        conn, "usage:global", self.rpm_limit / 60, self.rpm_limit, now
+                    )
+                    if global_tokens < 1.0:
+                        reason = "burst_limit"
+
+            if reason is not None:
+                if not reserve:
+                    store.incr(conn, f"usage:rejected:{reason}")
+                return reason
+
+            store.bucket_set(conn, "usage:global", global_tokens - 1.0, now)
+            if user_key:
+                store.bucket_set(conn, user_key, user_tokens - 1.0, now)
+            store.window_add(conn, "usage:calls", now)
+            store.incr(conn, "usage:admitted")
+            return None
+
+    async def record_quota_error(self) -> None:
+        """Gemini returned 429: stop sending calls for the cool-down period."""
+        self.quota_errors += 1
+        self.blocked_until = time.time() + self.cooldown
+        if self.shared is not None:
+            # 429s come in bursts, so the write waits for SQLite's lock off the loop
+            try:
+                await asyncio.to_thread(self._share_cooldown, self.blocked_until)
+            except sqlite3.Error as e:
+                logger.warning("Could not share quota cool-down: %s", e)
+
+    async def requests_last_day(self) -> int:
+        if self.shared is not None:
+            try:
+                return await asyncio.to_thread(self._shared_day_count)
+            except sqlite3.Error:
+                pass
+        return self.day.count(time.time())
+
+    def _share_cooldown(self, blocked_until: float) -> None:
+        with self.shared.transaction() as conn:
+            current = self.shared.get_value(conn, "usage:blocked_until")
+            self.shared.set_value(conn, "usage:blocked_until", max(current, blocked_until))
+            self.shared.incr(conn, "usage:quota_errors")
+
+    def _shared_day_count(self) -> int:
+        return self.shared.window_count(self.shared.read(), "usage:calls", 86400, time.time())
+
+    def _user_bucket(self, user_id: str) -> TokenBucket:
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.user_rpm / 60, self.user_burst)
+            self._user_buckets[user_id] = bucket
+            if len(self._user_buckets) > MAX_TRACKED_USERS:
+                self._user_buckets.popitem(last=False)
+        else:
+            self._user_buckets.move_to_end(user_id)
+        return bucket
+
+    async def get_stats(self) -> dict:
+        if self.shared is not None:
+            try:
+                return await asyncio.to_thread(self._shared_stats)
+            except sqlite3.Error as e:
+                logger.warning("Could not read shared quota stats: %s", e)
+        return self._local_stats()
+
+    def _shared_stats(self) -> dict:
+        now = time.time()
+        store = self.shared
+        conn = store.read()
+        day = store.window_count(conn, "usage:calls", 86400, now)
+        oldest = store.window_oldest(conn, "usage:calls", 86400, now)
+        counters = store.counters("usage:")
+        blocked_until = max(self.blocked_until, counters.get("blocked_until", 0.0))
+        tracked = conn.execute(
+            "SELECT COUNT(*) FROM buckets WHERE name LIKE 'usage:user:%'"
+        ).fetchone()[0]
+        return {
+            "shared": True,
+            "requests_last_minute": store.window_count(conn, "usage:calls", 60, now),
+            "requests_last_day": day,
+            "minute_limit": self.rpm_limit,
+            "daily_limit": self.rpd_limit,
+            "daily_remaining": max(0, self.rpd_limit - day),
+            "daily_window_frees_in_seconds": round(oldest + 86400 - now) if oldest else None,
+            "admitted": int(counters.get("admitted", 0)),
+            "rejected": {
+                name[len("rejected:"):]: int(value)
+                for name, value in counters.items() if name.startswith("rejected:")
+            },
+            "quota_errors": int(counters.get("quota_errors", 0)),
+            "cooldown_remaining_seconds": round(max(0.0, blocked_until - now), 1),
+            "tracked_users": tracked,
+        }
+
+    def _local_stats(self) -> dict:
+        now = time.time()
+        oldest = self.day.oldest()
+        return {
+            "shared": False,
+            "requests_last_minute": self.minute.count(now),
+            "requests_last_day": self.day.count(now),
+            "minute_limit": self.rpm_limit,
+            "daily_limit": self.rpd_limit,
+            "daily_remaining": max(0, self.rpd_limit - self.day.count(now)),
+            "daily_window_frees_in_seconds": round(oldest + 86400 - now) if oldest else None,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "quota_errors": self.quota_errors,
+            "cooldown_remaining_seconds": round(max(0.0, self.blocked_until - now), 1),
+            "tracked_users": len(self._user_buckets),
+        }
+
+
+# Global instance
+usage_tracker = UsageTracker(
+    rpm_limit=GEMINI_RPM_LIMIT,
+    rpd_limit=GEMINI_RPD_LIMIT,
+    headroom=GEMINI_QUOTA_HEADROOM,
+    user_rpm=USER_RPM_LIMIT,
+    user_burst=USER_BURST,
+    cooldown=GEMINI_QUOTA_COOLDOWN_SECONDS,
+    shared=open_shared_state(SHARED_STATE_DB),
+)
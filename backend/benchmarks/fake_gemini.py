@@ -0,0 +1,148 @@
+"""
+Offline stand-in for genai.GenerativeModel.
+
+FakeGenerativeModel answers generate_content() after a random delay drawn
+from a log-normal distribution, optionally raises the same exceptions the
+SDK raises for 429/403/5xx responses, and supports stream=True. Install it
+on the running client with:
+
+    from app.gemini_client import gemini_client
+    gemini_client.model = FakeGenerativeModel(median_ms=400)
+"""
+
+import math
+import random
+import threading
+import time
+from typing import Optional
+
+from google.api_core import exceptions as api_exceptions
+
+# Marker at the start of every fake reply, so callers can tell model output
+# apart from local answers and canned fallbacks
+REPLY_PREFIX = "[fake]"
+
+ERRORS = {
+    "429": lambda: api_exceptions.ResourceExhausted("Resource has been exhausted (e.g. check quota)."),
+    "403": lambda: api_exceptions.PermissionDenied("Permission denied on resource."),
+    "500": lambda: api_exceptions.InternalServerError("An internal error has occurred."),
+    "503": lambda: api_exceptions.ServiceUnavailable("The service is currently unavailable."),
+}
+
+
+class FakeUsage:
+    def __init__(self, prompt: str, text: str):
+        # Same four-characters-per-token rule the app estimates with
+        self.prompt_token_count = max(1, len(prompt) // 4)
+        self.candidates_token_count = max(1, len(text) // 4)
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text: str, prompt: str = "", generated: Optional[str] = None):
+        self.text = text
+        # Stream chunks report the usage of everything generated so far
+        self.usage_metadata = FakeUsage(prompt, text if generated is None else generated)
+
+
+class FakeGenerativeModel:
+    """
+    Drop-in for genai.GenerativeModel.generate_content.
+
+    Latency is log-normal with the given median and `jitter` as its sigma
+    (0 makes it constant). `error_rates` maps "429", "403", "500" or "503"
+    to the probability of failing with that status. Streams are split into
+    `stream_chunks` pieces with the latency spread between them, the first
+    chunk arriving after `first_chunk_share` of it.
+    """
+
+    def __init__(self, median_ms: float = 400.0, jitter: float = 0.4,
+                 error_rates: Optional[dict] = None, reply_words: int = 40,
+                 stream_chunks: int = 5, first_chunk_share: float = 0.4,
+                 seed: Optional[int] = None):
+        self.median_ms = median_ms
+        self.jitter = jitter
+        self.error_rates = {code: rate for code, rate in (error_rates or {}).items() if rate > 0}
+        self.reply_words = reply_words
+        self.stream_chunks = max(1, stream_chunks)
+        self.first_chunk_share = first_chunk_share
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.streams = 0
+        self.errors = {code: 0 for code in ERRORS}
+        self.max_concurrent = 0
+        self._concurrent = 0
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.streams += int(stream)
+            latency = self._latency_seconds()
+            error = self._pick_error()
+            if error:
+                self.errors[error] += 1
+        if stream:
+            return self._stream(prompt, latency, error)
+
+        self._enter()
+        try:
+            time.sleep(latency)
+            if error:
+                raise ERRORS[error]()
+            return FakeResponse(self._reply(prompt), prompt)
+        finally:
+            self._exit()
+
+    def _stream(self, prompt, latency: float, error: Optional[str]):
+        self._enter()
+        try:
+            words = self._reply(prompt).split(" ")
+            size = math.ceil(len(words) / self.stream_chunks)
+            pieces = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+            time.sleep(latency * self.first_chunk_share)
+            rest = latency * (1 - self.first_chunk_share) / max(1, len(pieces) - 1)
+            for i, piece in enumerate(pieces):
+                if i:
+                    time.sleep(rest)
+                # Streams fail halfway through, after some text went out
+                if error and i == len(pieces) // 2:
+                    raise ERRORS[error]()
+                yield FakeResponse(piece, prompt, "".join(pieces[:i + 1]))
+        finally:
+            self._exit()
+
+    def get_stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "streams": self.streams,
+            "errors": {code: n for code, n in self.errors.items() if n},
+            "max_concurrent": self.max_concurrent,
+        }
+
+    def _latency_seconds(self) -> float:
+        if self.jitter <= 0:
+            return self.median_ms / 1000
+        return self._random.lognormvariate(math.log(max(self.median_ms, 0.001)), self.jitter) / 1000
+
+    def _pick_error(self) -> Optional[str]:
+        roll = self._random.random()
+        for code, rate in self.error_rates.items():
+            if roll < rate:
+                return code
+            roll -= rate
+        return None
+
+    def _reply(self, prompt: str) -> str:
+        filler = " ".join(["lorem"] * max(0, self.reply_words - 4))
+        return f"{REPLY_PREFIX} Thanks for asking! {filler}".strip()
+
+    def _enter(self) -> None:
+        with self._lock:
+            self._concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self._concurrent)
+
+    def _exit(self) -> None:
+        with self._lock:
+            self._concurrent -= 1
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Drive /chat (or /chat/stream) at a target request rate and report latency
+percentiles, throughput, and how requests were answered.
+
+By default the app runs in-process with Gemini replaced by the offline
+FakeGenerativeModel from benchmarks/fake_gemini.py, so nothing leaves the
+machine and no API key is needed. Quota and per-user limits are lifted so
+the request path itself is measured; pass --real-limits to keep the
+configured ones. --url drives an already running server instead (the fake
+is not used then). Needs httpx (pip install httpx).
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --rps 50 --duration 20 --median-ms 800
+    python -m benchmarks.load_test --error-429 0.05 --error-5xx 0.02
+    python -m benchmarks.load_test --endpoint stream --json
+    python -m benchmarks.load_test --jitter 1.0 --hedge-median-ms 250
+    python -m benchmarks.load_test --url http://localhost:8001
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+try:
+    import httpx
+except ImportError:
+    sys.exit("The load test needs httpx: pip install httpx")
+
+# Answered by the intent engine without the model
+LOCAL_QUESTIONS = [
+    "What are your opening hours?",
+    "Where are you located?",
+    "How much is the burger?",
+]
+
+# Need the model, but repeat often enough to be cached
+REPEATED_QUESTIONS = [
+    "Is it family friendly?",
+    "What would you suggest for a tourist on a budget?",
+    "Is there wifi for students?",
+    "Can I bring my dog?",
+    "Do you play live music on weekends?",
+    "What is the story behind the restaurant?",
+]
+
+
+def configure_offline_app(args):
+    """Set up the environment, import the app and install the fake model."""
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    os.environ["RESPONSE_CACHE_DB"] = ""
+    os.environ["HISTORY_DB"] = ""
+    os.environ["SHARED_STATE_DB"] = ""
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+    if not args.real_limits:
+        os.environ["GEMINI_RPM_LIMIT"] = "100000000"
+        os.environ["GEMINI_RPD_LIMIT"] = "100000000"
+        os.environ["USER_RPM_LIMIT"] = "0"
+    if args.hedge_median_ms:
+        os.environ["GEMINI_MODELS"] = "models/fake-primary,models/fake-hedge"
+
+    from benchmarks.fake_gemini import FakeGenerativeModel
+    from app.gemini_client import gemini_client
+    from app.main import app
+
+    fake = FakeGenerativeModel(
+        median_ms=args.median_ms,
+        jitter=args.jitter,
+        error_rates={
+            "429": args.error_429,
+            "403": args.error_403,
+            "500": args.error_5xx / 2,
+            "503": args.error_5xx / 2,
+        },
+        seed=args.seed,
+    )
+    gemini_client.model = fake
+    if args.hedge_median_ms:
+        # A second tier to hedge to, with its own latency and no errors
+        hedge = FakeGenerativeModel(median_ms=args.hedge_median_ms, jitter=args.jitter, seed=args.seed + 1)
+        gemini_client.set_model(gemini_client.model_names[1], hedge)
+    return app, fake
+
+
+def make_messages(count: int, local_share: float, unique_share: float, seed: int) -> list:
+    rng = random.Random(seed)
+    messages = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < local_share:
+            messages.append(rng.choice(LOCAL_QUESTIONS))
+        elif roll < local_share + unique_share:
+            messages.append(f"Tell me about plan {i} for a birthday dinner")
+        else:
+            messages.append(rng.choice(REPEATED_QUESTIONS))
+    return messages
+
+
+def percentile(values: list, p: float):
+    """Nearest-rank percentile; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+async def send_chat(client, message: str, user_id):
+    response = await client.post("/chat", json={"message": message, "userId": user_id})
+    ok = response.status_code == 200 and response.json().get("success", False)
+    return ok, None
+
+
+async def send_stream(client, message: str, user_id):
+    ok = False
+    first_chunk_ms = None
+    async with client.stream("POST", "/chat/stream", json={"message": message, "userId": user_id}) as response:
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: ") and event == "done":
+                done = json.loads(line[6:])
+                ok = done["status"] == "success"
+                first_chunk_ms = done["time_to_first_chunk_ms"]
+    return ok and response.status_code == 200, first_chunk_ms
+
+
+async def run_load(client, messages: list, rps: float, users: int, stream: bool) -> dict:
+    """Open-loop load: request i starts at i / rps seconds whatever the backlog."""
+    send = send_stream if stream else send_chat
+    latencies, first_chunks = [], []
+    failures = 0
+
+    async def one(i, message):
+        nonlocal failures
+        user_id = f"bench-{i % users}" if users else None
+        started = time.perf_counter()
+        try:
+            ok, first_chunk_ms = await send(client, message, user_id)
+        except httpx.HTTPError:
+            ok, first_chunk_ms = False, None
+        latencies.append((time.perf_counter() - started) * 1000)
+        if first_chunk_ms is not None:
+            first_chunks.append(first_chunk_ms)
+        if not ok:
+            failures += 1
+
+    loop = asyncio.get_running_loop()
+    began = loop.time()
+    tasks = []
+    for i, message in enumerate(messages):
+        delay = began + i / rps - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i, message)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - began
+
+    return {
+        "requests": len(messages),
+        "target_rps": rps,
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_rps": round(len(messages) / elapsed, 2),
+        "failed_requests": failures,
+        "latency_ms": {
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "max": _round(max(latencies)),
+        },
+        "time_to_first_chunk_ms": {
+            "p50": _round(percentile(first_chunks, 50)),
+            "p95": _round(percentile(first_chunks, 95)),
+            "p99": _round(percentile(first_chunks, 99)),
+        } if stream else None,
+    }
+
+
+def _round(value):
+    return round(value, 1) if value is not None else None
+
+
+def answer_breakdown(before: dict, after: dict, requests: int, model_errors) -> dict:
+    """How requests were answered, from the change in /stats over the run."""
+    def delta(*path):
+        a, b = after, before
+        for key in path:
+            a, b = a.get(key, {}), b.get(key, {})
+        return (a or 0) - (b or 0)
+
+    quota_rejected = sum(after["usage"]["rejected"].values()) - sum(before["usage"]["rejected"].values())
+    breaker_rejected = delta("circuit_breaker", "rejected_calls")
+    fallbacks = quota_rejected + breaker_rejected + (model_errors or 0)
+    return {
+        "local_answers": delta("intents", "local_total"),
+        "cache_hits": delta("cache", "memory_hits") + delta("cache", "disk_hits"),
+        "coalesced": delta("coalescing", "collapsed_calls"),
+        "model_calls": delta("usage", "admitted"),
+        "model_errors": model_errors,
+        "quota_rejections": quota_rejected,
+        "circuit_breaker_rejections": breaker_rejected,
+        "fallback_rate": round(fallbacks / requests, 4) if requests else 0.0,
+    }
+
+
+def print_report(report: dict) -> None:
+    load = report["load"]
+    print(f"Requests:     {load['requests']} at {load['target_rps']} rps target")
+    print(f"Throughput:   {load['throughput_rps']} rps over {load['elapsed_seconds']} s")
+    print(f"Failed:       {load['failed_requests']}")
+    lat = load["latency_ms"]
+    print(f"Latency ms:   p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    if load["time_to_first_chunk_ms"]:
+        ttfc = load["time_to_first_chunk_ms"]
+        print(f"First chunk:  p50 {ttfc['p50']}  p95 {ttfc['p95']}  p99 {ttfc['p99']}")
+    print()
+    for key, value in report["answers"].items():
+        print(f"{key.replace('_', ' '):<28} {value}")
+    if report.get("fake_model"):
+        print(f"{'fake model':<28} {report['fake_model']}")
+    if report["models"] and report["models"]["hedging"]:
+        for name, stats in report["models"]["models"].items():
+            print(f"{name:<28} {stats}")
+        print(f"{'hedging':<28} {report['models']['hedging']}")
+
+
+async def main_async(args) -> dict:
+    messages = make_messages(int(args.rps * args.duration), args.local, args.unique, args.seed)
+    fake = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        app, fake = configure_offline_app(args)
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=args.timeout
+        )
+
+    async with client:
+        before = (await client.get("/stats")).json()
+        load = await run_load(client, messages, args.rps, args.users, args.endpoint == "stream")
+        after = (await client.get("/stats")).json()
+
+    model_errors = sum(fake.errors.values()) if fake else None
+    return {
+        "load": load,
+        "answers": answer_breakdown(before, after, len(messages), model_errors),
+        "fake_model": fake.get_stats() if fake else None,
+        "models": after.get("models"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=["chat", "stream"], default="chat")
+    parser.add_argument("--rps", type=float, default=20, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load")
+    parser.add_argument("--users", type=int, default=100, help="distinct userIds to rotate through (0 for none)")
+    parser.add_argument("--local", type=float, default=0.2, help="share of questions the intent engine answers")
+    parser.add_argument("--unique", type=float, default=0.4, help="share of never-repeated questions")
+    parser.add_argument("--median-ms", type=float, default=400, help="fake model median latency")
+    parser.add_argument("--jitter", type=float, default=0.4, help="log-normal sigma of fake latency")
+    parser.add_argument("--error-429", type=float, default=0.0, help="fake quota error rate")
+    parser.add_argument("--error-403", type=float, default=0.0, help="fake permission error rate")
+    parser.add_argument("--error-5xx", type=float, default=0.0, help="fake server error rate")
+    parser.add_argument("--hedge-median-ms", type=float, default=0,
+                        help="add a second fake model tier with this median latency to hedge to")
+    parser.add_argument("--real-limits", action="store_true", help="keep the configured quota limits")
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
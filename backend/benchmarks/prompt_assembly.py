@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Compare prompt sizes and assembly time for the full-context and retrieval
+prompt modes.
+
+Runs offline against backend/data by default. --menu-size pads the menu
+with synthetic dishes to show how each mode scales as the menu grows, and
+--live also times real Gemini calls for both modes. Importing the app
+reads GEMINI_API_KEY from the environment or .env as usual, but the
+offline runs never call the API.
+
+    python -m benchmarks.prompt_assembly
+    python -m benchmarks.prompt_assembly --menu-size 200
+    python -m benchmarks.prompt_assembly --live
+"""
+
+import argparse
+import copy
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.context_retrieval import ContextRetriever, estimate_tokens  # noqa: E402
+from app.restaurant_context import ContextSnapshot, restaurant_context  # noqa: E402
+
+QUESTIONS = [
+    "Can I bring my kids, is it family friendly?",
+    "Is there wifi for students?",
+    "What is good for someone who is allergic to nuts?",
+    "Do you deliver?",
+    "What would you suggest for a tourist on a budget?",
+    "Is the burger spicy?",
+    "Can a group of 10 come on Friday night?",
+    "What coffee do you serve?",
+]
+
+
+def padded_snapshot(extra_dishes: int) -> ContextSnapshot:
+    """The current data with `extra_dishes` synthetic dishes appended to the menu."""
+    base = restaurant_context.snapshot
+    menu = copy.deepcopy(base.menu_data)
+    for i in range(extra_dishes):
+        menu.setdefault("recommended_dishes", []).append({
+            "name": f"Seasonal Dish {i}",
+            "description": f"Chef's rotating creation number {i} with market vegetables and house sauce",
+            "price": f"${9 + i % 10}.99",
+            "category": "Main Course",
+            "dietary_info": ["Ask staff for allergens"],
+        })
+    return ContextSnapshot(menu, base.hours_data, base.restaurant_info)
+
+
+def time_assembly(retriever: ContextRetriever, snapshot: ContextSnapshot, question: str, rounds: int) -> float:
+    """Mean microseconds to build the context for one question."""
+    retriever.build_context(snapshot, question)  # build the index outside the timing
+    started = time.perf_counter()
+    for _ in range(rounds):
+        retriever.build_context(snapshot, question)
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def time_live(prompts: list) -> list:
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    model = genai.GenerativeModel(model_name="models/gemini-1.5-flash-latest")
+    latencies = []
+    for prompt in prompts:
+        started = time.perf_counter()
+        model.generate_content(prompt)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--menu-size", type=int, default=0, help="synthetic dishes to add to the menu")
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--budget", type=int, default=400, help="context token budget for retrieval")
+    parser.add_argument("--rounds", type=int, default=200, help="timing rounds per question")
+    parser.add_argument("--live", action="store_true", help="also time real Gemini calls")
+    args = parser.parse_args()
+
+    snapshot = padded_snapshot(args.menu_size)
+    modes = {
+        "full": ContextRetriever("full", args.top_k, args.budget),
+        "retrieval": ContextRetriever("retrieval", args.top_k, args.budget),
+    }
+
+    print(f"Menu items: {len(snapshot.menu_data.get('signature_dishes', [])) + len(snapshot.menu_data.get('recommended_dishes', []))}")
+    print(f"{'mode':<10} {'avg tokens':>11} {'max tokens':>11} {'avg build us':>13}")
+    results = {}
+    for name, retriever in modes.items():
+        tokens = [estimate_tokens(retriever.build_context(snapshot, q)) for q in QUESTIONS]
+        build_us = [time_assembly(retriever, snapshot, q, args.rounds) for q in QUESTIONS]
+        results[name] = tokens
+        print(f"{name:<10} {statistics.mean(tokens):>11.0f} {max(tokens):>11} {statistics.mean(build_us):>13.1f}")
+
+    saved = 1 - statistics.mean(results["retrieval"]) / statistics.mean(results["full"])
+    print(f"\nRetrieval sends {saved:.0%} fewer context tokens on average.")
+
+    if args.live:
+        if not os.getenv("GEMINI_API_KEY"):
+            sys.exit("--live needs GEMINI_API_KEY")
+        print(f"\n{'mode':<10} {'p50 ms':>8} {'mean ms':>8}")
+        for name, retriever in modes.items():
+            prompts = [f"{retriever.build_context(snapshot, q)}\n\nCustomer Question: {q}\n\nResponse:" for q in QUESTIONS]
+            latencies = time_live(prompts)
+            print(f"{name:<10} {statistics.median(latencies):>8.0f} {statistics.mean(latencies):>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
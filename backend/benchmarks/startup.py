@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start time: how long a fresh process takes to import the app,
+serve a liveness check and a local (intent engine) answer, and finish
+warming up the Gemini client.
+
+Each run is a new Python process so imports are really cold (apart from
+the OS file cache). Runs offline: building the model client does not call
+the API, and a placeholder key is used if GEMINI_API_KEY is unset.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Runs in the child process; prints one JSON line of timings in ms
+CHILD = r"""
+import asyncio, json, time
+started = time.perf_counter()
+elapsed = lambda: round((time.perf_counter() - started) * 1000, 1)
+
+import app.main as main
+timings = {"import_app": elapsed()}
+
+async def serve():
+    await main.liveness()
+    timings["first_liveness"] = elapsed()
+    await main.gemini_client.generate_response_with_fallback("What are your opening hours?")
+    timings["first_local_answer"] = elapsed()
+    await asyncio.to_thread(main.gemini_client.load_model)
+    timings["model_client_ready"] = elapsed()
+    timings["model_load"] = round(main.gemini_client.model_load_seconds * 1000, 1)
+
+asyncio.run(serve())
+print(json.dumps(timings))
+"""
+
+
+def run_once() -> dict:
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    env["LOG_LEVEL"] = "CRITICAL"
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to start")
+    parser.add_argument("--json", action="store_true", help="print the raw timings as JSON")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    if args.json:
+        print(json.dumps(runs, indent=2))
+        return
+
+    print(f"{'milestone (ms since process start)':<36} {'median':>8} {'min':>8} {'max':>8}")
+    for key in runs[0]:
+        values = [run[key] for run in runs]
+        print(f"{key:<36} {statistics.median(values):>8.1f} {min(values):>8.1f} {max(values):>8.1f}")
+
+    lazy = statistics.median(run["first_local_answer"] for run in runs)
+    eager = statistics.median(run["first_local_answer"] + run["model_load"] for run in runs)
+    print(f"\nFirst local answer after {lazy:.0f} ms; loading the SDK up front would make it {eager:.0f} ms.")
+
+
+if __name__ == "__main__":
+    main()
@@ -38,12 +38,7 @@ async def test_basic_setup():
     # 3. Test API status
     print("\n3. Testing Gemini API connection...")
     try:
-        status = gemini_client.get_api_status()
-        print(f"   Status: {status['status']}")
-        print(f"   API Available: {status['api_available']}")
-        if not status['api_available']:
-            print(f"   Error: {status.get('error', 'Unknown error')}")
-            return False
+        await gemini_client.probe()
         print("   ✅ Gemini API working")
     except Exception as e:
         print(f"   ❌ API test failed: {e}")
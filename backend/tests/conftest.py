@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Keep every store in memory and Gemini out of reach before the app's
+# global instances are created on import
+os.environ.update(
+    SHARED_STATE_DB="",
+    RESPONSE_CACHE_DB="",
+    HISTORY_DB="",
+    GEMINI_API_KEY="",
+    LOG_LEVEL="WARNING",
+)
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.restaurant_context import DATA_FILES, RestaurantContext  # noqa: E402
+
+
+@pytest.fixture
+def make_context(tmp_path):
+    """
+    Build a RestaurantContext over a copy of the shipped data files, with
+    any file replaced: make_context(hours={...}).
+    """
+    def build(**overrides):
+        for filename in DATA_FILES:
+            key = filename[:-len(".json")]
+            if key in overrides:
+                data = overrides[key]
+            else:
+                with open(BACKEND_DIR / "data" / filename, encoding="utf-8") as file:
+                    data = json.load(file)
+            (tmp_path / filename).write_text(json.dumps(data), encoding="utf-8")
+        context = RestaurantContext()
+        context.data_dir = str(tmp_path)
+        context.reload()
+        return context
+
+    return build
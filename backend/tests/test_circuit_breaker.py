@@ -0,0 +1,113 @@
+from app.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    NORMAL,
+    OPEN,
+    PROBE,
+    CircuitBreaker,
+    parse_thresholds,
+)
+
+
+def make_breaker(probes: int = 1) -> CircuitBreaker:
+    return CircuitBreaker(
+        thresholds={"quota_exceeded": 1, "server_error": 3},
+        default_threshold=5,
+        open_seconds=30,
+        half_open_probes=probes,
+    )
+
+
+def elapse_open_period(breaker: CircuitBreaker) -> None:
+    breaker.opened_at -= breaker.open_seconds
+
+
+def test_parse_thresholds():
+    assert parse_thresholds("quota_exceeded:1, server_error:3,junk") == {
+        "quota_exceeded": 1,
+        "server_error": 3,
+    }
+
+
+def test_opens_after_consecutive_failures_of_one_class():
+    breaker = make_breaker()
+    for _ in range(2):
+        breaker.record_failure(breaker.acquire(), "server_error")
+    assert breaker.state == CLOSED
+    breaker.record_failure(breaker.acquire(), "server_error")
+    assert breaker.state == OPEN
+    assert breaker.acquire() is None
+    assert breaker.snapshot()["rejected_calls"] == 1
+
+
+def test_a_single_quota_error_opens_it():
+    breaker = make_breaker()
+    breaker.record_failure(breaker.acquire(), "quota_exceeded")
+    assert breaker.state == OPEN
+
+
+def test_success_resets_the_count():
+    breaker = make_breaker()
+    for _ in range(2):
+        breaker.record_failure(breaker.acquire(), "server_error")
+    breaker.record_success(breaker.acquire())
+    for _ in range(2):
+        breaker.record_failure(breaker.acquire(), "server_error")
+    assert breaker.state == CLOSED
+
+
+def test_unlisted_errors_use_the_default_threshold():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure(breaker.acquire(), "timeout")
+    assert breaker.state == CLOSED
+    breaker.record_failure(breaker.acquire(), "timeout")
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_a_limited_number_of_probes_through():
+    breaker = make_breaker(probes=1)
+    breaker.record_failure(breaker.acquire(), "quota_exceeded")
+    elapse_open_period(breaker)
+    assert breaker.acquire() == PROBE
+    assert breaker.state == HALF_OPEN
+    assert breaker.acquire() is None
+
+
+def test_successful_probe_closes_it():
+    breaker = make_breaker()
+    breaker.record_failure(breaker.acquire(), "quota_exceeded")
+    elapse_open_period(breaker)
+    breaker.record_success(breaker.acquire())
+    assert breaker.state == CLOSED
+    assert breaker.acquire() == NORMAL
+    assert breaker.open_seconds == 30
+
+
+def test_failed_probe_reopens_for_longer_up_to_a_cap():
+    breaker = make_breaker()
+    breaker.record_failure(breaker.acquire(), "quota_exceeded")
+    expected = [60, 120, 240, 240, 240]
+    for open_seconds in expected:
+        elapse_open_period(breaker)
+        breaker.record_failure(breaker.acquire(), "server_error")
+        assert breaker.state == OPEN
+        assert breaker.open_seconds == open_seconds
+
+
+def test_released_probe_frees_its_slot():
+    breaker = make_breaker(probes=1)
+    breaker.record_failure(breaker.acquire(), "quota_exceeded")
+    elapse_open_period(breaker)
+    breaker.release(breaker.acquire())
+    assert breaker.state == HALF_OPEN
+    assert breaker.acquire() == PROBE
+
+
+def test_transitions_are_recorded():
+    breaker = make_breaker()
+    breaker.record_failure(breaker.acquire(), "quota_exceeded")
+    elapse_open_period(breaker)
+    breaker.record_success(breaker.acquire())
+    steps = [(t["from"], t["to"]) for t in breaker.snapshot()["recent_transitions"]]
+    assert steps == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]
@@ -0,0 +1,30 @@
+import pytest
+
+from app.history_store import is_follow_up
+
+
+@pytest.mark.parametrize("message", [
+    "is it vegan?",
+    "how much are they?",
+    "how much is that one",
+    "is the other one spicy",
+    "and the price?",
+    "what about sunday",
+    "tell me more about those",
+])
+def test_questions_that_refer_back(message):
+    assert is_follow_up(message)
+
+
+@pytest.mark.parametrize("message", [
+    "opening hours",
+    "menu please",
+    "price?",
+    "do you have vegan options",
+    "is there one near the station",
+    "are you open this weekend",
+    "what time do you open on saturday and sunday",
+    "",
+])
+def test_questions_that_stand_alone(message):
+    assert not is_follow_up(message)
@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.hours_engine import HoursEngine, parse_days, parse_range, parse_time
+
+HOURS = {
+    "timezone": "UTC",
+    "regular_hours": {
+        "monday": "8:00 AM - 10:00 PM",
+        "tuesday": "Closed",
+        "wednesday": "8:00 AM - 10:00 PM",
+        "thursday": "8:00 AM - 10:00 PM",
+        "friday": "6:00 PM - 2:00 AM",
+        "saturday": "whenever we feel like it",
+        "sunday": "9:00 PM - 1:00 AM",
+    },
+    "holiday_hours": {},
+    "special_notes": [
+        "Kitchen closes 30 minutes before restaurant closing time",
+        "Happy hour: Monday-Friday 3:00 PM - 6:00 PM",
+    ],
+}
+
+
+def at(day: int, hour: int, minute: int = 0) -> datetime:
+    """A UTC time in the week of Monday 2024-01-01; day 0 is Monday."""
+    return datetime(2024, 1, 1 + day, hour, minute, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def engine(make_context):
+    return HoursEngine(make_context(hours=HOURS), "UTC")
+
+
+@pytest.mark.parametrize("text, minute", [
+    ("8:00 AM", 480),
+    ("12:00 PM", 720),
+    ("12:30 am", 30),
+    ("9pm", 1260),
+    ("9 p.m.", 1260),
+    ("noon", None),
+])
+def test_parse_time(text, minute):
+    assert parse_time(text) == minute
+
+
+@pytest.mark.parametrize("text, interval", [
+    ("8:00 AM - 10:00 PM", (480, 1320)),
+    ("6:00 PM to 2:00 AM", (1080, 1560)),
+    ("Open 24 hours", (0, 1440)),
+    ("Closed", None),
+    ("", None),
+    ("whenever we feel like it", None),
+])
+def test_parse_range(text, interval):
+    assert parse_range(text) == interval
+
+
+@pytest.mark.parametrize("text, days", [
+    ("Monday-Friday", [0, 1, 2, 3, 4]),
+    ("Fri-Mon", [4, 5, 6, 0]),
+    ("sat", [5]),
+    ("weekends", [5, 6]),
+    ("daily", list(range(7))),
+    ("someday", []),
+])
+def test_parse_days(text, days):
+    assert parse_days(text) == days
+
+
+def test_open_and_closed_minutes(engine):
+    assert not engine.is_open(at(0, 7, 59))
+    assert engine.is_open(at(0, 8, 0))
+    assert engine.is_open(at(0, 21, 59))
+    assert not engine.is_open(at(0, 22, 0))
+    assert not engine.is_open(at(1, 12, 0))
+
+
+def test_kitchen_closes_before_the_restaurant(engine):
+    assert engine.kitchen_open(at(0, 21, 29))
+    assert not engine.kitchen_open(at(0, 21, 30))
+    assert engine.is_open(at(0, 21, 30))
+
+
+def test_hours_past_midnight_carry_into_the_next_day(engine):
+    assert engine.is_open(at(5, 1, 59))
+    assert not engine.is_open(at(5, 2, 0))
+
+
+def test_sunday_night_wraps_into_monday(engine):
+    assert engine.is_open(at(0, 0, 30))
+    assert not engine.is_open(at(0, 1, 0))
+    assert engine.next_closing(at(6, 23, 0)) == at(7, 1, 0)
+
+
+def test_next_opening_skips_closed_days(engine):
+    assert engine.next_opening(at(0, 22, 0)) == at(2, 8, 0)
+    assert engine.next_opening(at(0, 9, 0)) == at(0, 9, 0)
+
+
+def test_windows_from_special_notes(engine):
+    assert engine.active_windows(at(0, 15, 0)) == ["happy_hour"]
+    assert engine.active_windows(at(0, 18, 0)) == []
+    assert "happy hour runs until 6:00 PM" in engine.status_line(at(0, 16, 0))
+
+
+def test_status_line_names_the_next_opening(engine):
+    line = engine.status_line(at(0, 23, 0))
+    assert "closed and open again on Wednesday at 8:00 AM" in line
+    assert "Monday" in line
+
+
+def test_context_key_changes_only_at_status_changes(engine):
+    snapshot = engine.context.snapshot
+    assert engine.context_key(snapshot, at(0, 10, 0)) == engine.context_key(snapshot, at(0, 14, 59))
+    assert engine.context_key(snapshot, at(0, 14, 59)) != engine.context_key(snapshot, at(0, 15, 0))
+
+
+def test_unparsable_days_are_reported(engine):
+    assert engine.unparsed_days == ["saturday"]
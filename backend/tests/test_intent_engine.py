@@ -0,0 +1,56 @@
+import pytest
+
+from app.intent_engine import IntentEngine
+
+
+@pytest.fixture
+def engine(make_context):
+    return IntentEngine(make_context())
+
+
+@pytest.mark.parametrize("message, intent", [
+    ("What are your opening hours?", "hours"),
+    ("opening hours", "hours"),
+    ("when do you open?", "hours"),
+    ("are you open now?", "hours"),
+    ("r u open", "hours"),
+    ("what time do you close on sunday", "hours"),
+    ("closed on mondays?", "hours"),
+    ("is the kitchen still open", "hours"),
+    ("When is happy hour?", "discounts"),
+    ("what's your phone number", "contact"),
+    ("what number can I call", "contact"),
+    ("where are you located", "location"),
+    ("can I book a table for 4", "booking"),
+    ("do you take reservations", "booking"),
+    ("how much are your dishes", "price"),
+    ("do you have vegan options", "dietary"),
+    ("what do you recommend", "dishes"),
+])
+def test_structured_questions(engine, message, intent):
+    assert engine.classify(message) == intent
+
+
+@pytest.mark.parametrize("message", [
+    "are you close to the university?",
+    "how many hours does the pork take to cook",
+    "what number is the bus to get there",
+    "what do you call the spicy burger",
+    "thank you so much",
+    "why is the coffee so good",
+    "",
+])
+def test_ambiguous_or_open_ended_questions_go_to_the_model(engine, message):
+    assert engine.classify(message) is None
+    assert engine.answer(message) is None
+
+
+def test_dish_questions_name_the_dish(engine):
+    assert engine.classify("how much is the burger") == "dish"
+    assert "Burger" in engine.answer("how much is the burger")
+
+
+def test_fallback_ignores_ambiguous_keywords(engine):
+    generic = engine.fallback_answer("something unrelated entirely")
+    assert engine.fallback_answer("are you close to the university?") == generic
+    assert engine.fallback_answer("vegan?") != generic
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from app.job_queue import JobQueue, QueueFull, parse_client_keys
+
+
+class RecordingPipeline:
+    """Answers every message at once and remembers the order it ran them in."""
+
+    def __init__(self):
+        self.ran = []
+
+    async def run(self, message, user_id=None, validated=False):
+        self.ran.append(message)
+        if message == "reject me":
+            raise ValueError("Message contains prohibited content.")
+        return _Turn(f"answer to {message}")
+
+
+class _Turn:
+    def __init__(self, reply):
+        self.reply = reply
+        self.source = "model"
+
+
+def make_queue(pipeline, max_pending=10, web_max_share=1.0, max_per_user=0, workers=1):
+    return JobQueue(
+        pipeline,
+        workers=workers,
+        max_pending=max_pending,
+        web_max_share=web_max_share,
+        max_per_user=max_per_user,
+        result_ttl=60,
+        client_keys={},
+    )
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_parse_client_keys():
+    assert parse_client_keys("abc:staff, def:kiosk, bad:admin,") == {"abc": "staff", "def": "kiosk"}
+
+
+def test_more_urgent_classes_run_first():
+    async def scenario():
+        pipeline = RecordingPipeline()
+        queue = make_queue(pipeline)
+        jobs = [
+            await queue.submit("web 1", None, "web"),
+            await queue.submit("kiosk", None, "kiosk"),
+            await queue.submit("web 2", None, "web"),
+            await queue.submit("staff", None, "staff"),
+        ]
+        assert [queue.position(job) for job in jobs] == [2, 1, 3, 0]
+        for job in jobs:
+            await queue.wait(job, 1)
+        await queue.stop()
+        return pipeline.ran, jobs
+
+    ran, jobs = run(scenario())
+    assert ran == ["staff", "kiosk", "web 1", "web 2"]
+    assert all(job.status == "done" for job in jobs)
+    assert jobs[0].reply == "answer to web 1"
+
+
+def test_full_queue_refuses_with_a_retry_hint():
+    async def scenario():
+        queue = make_queue(RecordingPipeline(), max_pending=2)
+        await queue.submit("one", None, "staff")
+        await queue.submit("two", None, "staff")
+        with pytest.raises(QueueFull) as refused:
+            await queue.submit("three", None, "staff")
+        await queue.stop()
+        return refused.value, queue.get_stats()
+
+    refused, stats = run(scenario())
+    assert refused.reason == "queue_full"
+    assert refused.retry_after >= 1
+    assert stats["rejected"] == {"queue_full": 1}
+
+
+def test_web_traffic_leaves_room_for_other_classes():
+    async def scenario():
+        queue = make_queue(RecordingPipeline(), max_pending=4, web_max_share=0.5)
+        await queue.submit("web 1", None, "web")
+        await queue.submit("web 2", None, "web")
+        with pytest.raises(QueueFull) as refused:
+            await queue.submit("web 3", None, "web")
+        kiosk = await queue.submit("kiosk", None, "kiosk")
+        await queue.stop()
+        return refused.value.reason, kiosk.status
+
+    assert run(scenario()) == ("web_share_full", "queued")
+
+
+def test_one_user_cannot_fill_the_queue():
+    async def scenario():
+        queue = make_queue(RecordingPipeline(), max_per_user=2)
+        await queue.submit("one", "alice", "web")
+        await queue.submit("two", "alice", "web")
+        with pytest.raises(QueueFull) as refused:
+            await queue.submit("three", "alice", "web")
+        other = await queue.submit("hello", "bob", "web")
+        # Once alice's jobs have run she may queue again
+        await queue.wait(other, 1)
+        again = await queue.submit("four", "alice", "web")
+        await queue.stop()
+        return refused.value.reason, again.status
+
+    assert run(scenario()) == ("user_limit", "queued")
+
+
+def test_rejected_message_fails_the_job():
+    async def scenario():
+        queue = make_queue(RecordingPipeline())
+        job = await queue.submit("reject me", None, "web")
+        await queue.wait(job, 1)
+        await queue.stop()
+        return job, queue.get_stats()
+
+    job, stats = run(scenario())
+    assert job.status == "failed"
+    assert job.error_message == "Message contains prohibited content."
+    assert stats["completed"] == {"failed": 1}
@@ -0,0 +1,90 @@
+import json
+import os
+
+import pytest
+
+from app.moderation import AhoCorasick, ModerationEngine, parse_rules
+
+
+def naive_matches(patterns, text):
+    found = set()
+    for index, pattern in enumerate(patterns):
+        start = text.find(pattern)
+        while start != -1:
+            found.add((start + len(pattern) - 1, index))
+            start = text.find(pattern, start + 1)
+    return found
+
+
+@pytest.mark.parametrize("patterns, text", [
+    (["he", "she", "his", "hers"], "ushers"),
+    (["a", "aa", "aaa"], "aaaa"),
+    (["abcd", "bc", "c"], "xabcabcdx"),
+    (["spam", "pam", "am"], "spamspam and ham"),
+    (["x"], ""),
+])
+def test_finds_every_occurrence_of_every_pattern(patterns, text):
+    assert set(AhoCorasick(patterns).iter_matches(text)) == naive_matches(patterns, text)
+
+
+def test_failure_links_survive_partial_matches():
+    # "abd" runs down the "abc" branch and must fall back onto "bd"
+    assert list(AhoCorasick(["abc", "bd"]).iter_matches("abd")) == [(2, 1)]
+
+
+def write_rules(path, rules):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(rules, file)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / "moderation.json"
+    write_rules(path, {"blocked_terms": ["hack", "Free Money"], "blocked_prefixes": ["scam"], "max_length": 40})
+    return ModerationEngine(str(path), reload_seconds=0)
+
+
+def test_terms_match_whole_words_only(engine):
+    assert engine.find_blocked("how to hack it") == ["hack"]
+    assert engine.find_blocked("is there a hackathon?") == []
+    assert engine.find_blocked("lifehack") == []
+    assert engine.find_blocked("get FREE MONEY now") == ["free money"]
+
+
+def test_prefixes_match_the_start_of_a_word(engine):
+    assert engine.find_blocked("total scammers") == ["scam"]
+    assert engine.find_blocked("no escamotage") == []
+
+
+def test_validate_cleans_and_rejects(engine):
+    assert engine.validate("  is   the  burger\nvegan? ") == "is the burger vegan?"
+    for message in ("", "   ", "x" * 41, "teach me to hack"):
+        with pytest.raises(ValueError):
+            engine.validate(message)
+    assert engine.get_stats()["rejected"] == 4
+
+
+def test_reload_picks_up_changes_and_keeps_rules_on_a_bad_file(engine):
+    write_rules(engine.path, {"blocked_terms": ["eggs"]})
+    os.utime(engine.path, (1, 1))
+    assert engine.reload()
+    assert engine.find_blocked("hack the eggs") == ["eggs"]
+
+    with open(engine.path, "w", encoding="utf-8") as file:
+        file.write("{broken")
+    os.utime(engine.path, (2, 2))
+    assert not engine.reload()
+    assert engine.find_blocked("eggs") == ["eggs"]
+    assert engine.get_stats()["reload_errors"] == 1
+
+
+@pytest.mark.parametrize("rules", [
+    [],
+    {"blocked_terms": "hack"},
+    {"blocked_terms": ["ok", 3]},
+    {"max_length": 0},
+    {"max_length": True},
+])
+def test_parse_rules_rejects_bad_shapes(rules):
+    with pytest.raises(ValueError):
+        parse_rules(rules)
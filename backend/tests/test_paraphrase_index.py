@@ -0,0 +1,104 @@
+import pytest
+
+from app.catalog import DataCatalog
+from app.paraphrase_index import ParaphraseIndex, question_terms
+
+KEY = "context-key"
+
+
+@pytest.fixture
+def context(make_context):
+    return make_context()
+
+
+def make_index(context, max_entries=100, ttl_seconds=3600):
+    return ParaphraseIndex(
+        context,
+        DataCatalog(context, filter_cache_size=16),
+        threshold=0.55,
+        max_entries=max_entries,
+        bands=16,
+        ttl_seconds=ttl_seconds,
+    )
+
+
+@pytest.fixture
+def index(context):
+    return make_index(context)
+
+
+def test_question_terms():
+    assert question_terms("When r u opening?") == question_terms("what time do you open")
+    assert question_terms("How much does it cost?") == question_terms("what's the price")
+    assert question_terms("") == ()
+
+
+def test_bare_numbers_are_terms():
+    assert question_terms("table for 2") != question_terms("table for 4")
+    assert "2" in question_terms("2 coffees please")
+    assert question_terms("open b4 9") == question_terms("open before 9")
+
+
+def test_reworded_question_gets_the_stored_answer(index):
+    index.add("When r u opening tomorrow?", "8 AM", KEY)
+    assert index.lookup("what time do you open tomorrow", KEY) == "8 AM"
+    assert index.get_stats()["hits"] == 1
+
+
+def test_one_typo_in_a_long_word_still_matches(index):
+    index.add("can I make a reservation online", "Yes", KEY)
+    assert index.lookup("can I make a reservaton online", KEY) == "Yes"
+
+
+@pytest.mark.parametrize("stored, asked", [
+    # Short words must match exactly
+    ("do you have pork dishes", "do you have port dishes"),
+    ("is there beer on tap", "is there beef on tap"),
+    # Dish names never tolerate a typo
+    ("any student burger deals", "any studnt burger deals"),
+    # Numbers are significant
+    ("table for 2 tonight", "table for 4 tonight"),
+    ("2 coffees to go", "4 coffees to go"),
+    # Different dishes
+    ("is the vegan burger spicy", "is the vegan pizza spicy"),
+])
+def test_near_misses_do_not_share_an_answer(index, stored, asked):
+    index.add(stored, "stored answer", KEY)
+    assert index.lookup(asked, KEY) is None
+
+
+def test_single_term_questions_are_not_indexed(index):
+    index.add("how do I get there?", "Take the bus", KEY)
+    assert index.lookup("what do I get?", KEY) is None
+    assert index.get_stats()["entries"] == 0
+
+
+def test_answers_only_match_their_own_context(index):
+    index.add("what time do you open tomorrow", "8 AM", KEY)
+    assert index.lookup("what time do you open tomorrow", "other-key") is None
+
+
+def test_expired_answers_are_not_served(context):
+    index = make_index(context, ttl_seconds=-1)
+    index.add("what time do you open tomorrow", "8 AM", KEY)
+    assert index.lookup("what time do you open tomorrow", KEY) is None
+
+
+def test_least_recently_used_question_is_evicted(context):
+    index = make_index(context, max_entries=2)
+    index.add("what time do you open tomorrow", "8 AM", KEY)
+    index.add("do you have vegan options", "Yes", KEY)
+    assert index.lookup("what time do you open tomorrow", KEY) == "8 AM"
+    index.add("is there parking nearby", "Street parking", KEY)
+    assert index.lookup("do you have vegan options", KEY) is None
+    assert index.lookup("what time do you open tomorrow", KEY) == "8 AM"
+    assert index.get_stats()["evictions"] == 1
+
+
+def test_data_reload_empties_the_index(context, tmp_path):
+    index = make_index(context)
+    index.add("what time do you open tomorrow", "8 AM", KEY)
+    hours = tmp_path / "hours.json"
+    hours.write_text(hours.read_text(encoding="utf-8").replace("8:00 AM", "7:00 AM"), encoding="utf-8")
+    assert context.reload()
+    assert index.get_stats()["entries"] == 0
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app.shared_state import SharedState
+from app.usage_tracker import SlidingWindow, TokenBucket, UsageTracker
+
+
+def test_sliding_window_drops_old_events():
+    window = SlidingWindow(60)
+    for at in (0, 10, 59):
+        window.add(at)
+    assert window.count(59) == 3
+    assert window.count(60) == 2
+    assert window.oldest() == 10
+    assert window.count(200) == 0
+    assert window.oldest() is None
+
+
+def test_token_bucket_refills_at_its_rate_up_to_capacity():
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    bucket.updated = 0.0
+    bucket.take(0.0)
+    bucket.take(0.0)
+    assert not bucket.available(0.5)
+    assert bucket.available(1.0)
+    assert bucket.tokens == pytest.approx(1.0)
+    bucket.available(100.0)
+    assert bucket.tokens == 2
+
+
+def test_token_bucket_holds_at_least_one_token():
+    assert TokenBucket(rate=1.0, capacity=0.2).capacity == 1.0
+
+
+@pytest.fixture(params=["local", "shared"])
+def make_tracker(request, tmp_path):
+    def build(**overrides):
+        settings = dict(rpm_limit=5, rpd_limit=100, headroom=1.0, user_rpm=0, user_burst=1, cooldown=30)
+        settings.update(overrides)
+        shared = SharedState(str(tmp_path / "state.sqlite3")) if request.param == "shared" else None
+        return UsageTracker(shared=shared, **settings)
+
+    return build
+
+
+def admit(tracker, user_id=None, reserve=0.0):
+    return asyncio.run(tracker.admit(user_id, reserve))
+
+
+def test_minute_limit(make_tracker):
+    tracker = make_tracker()
+    assert [admit(tracker) for _ in range(6)] == [None] * 5 + ["minute_limit"]
+
+
+def test_daily_limit_comes_first(make_tracker):
+    tracker = make_tracker(rpm_limit=10, rpd_limit=3)
+    assert [admit(tracker) for _ in range(4)] == [None] * 3 + ["daily_limit"]
+    assert asyncio.run(tracker.requests_last_day()) == 3
+
+
+def test_headroom_keeps_a_margin_below_the_api_limits(make_tracker):
+    tracker = make_tracker(rpm_limit=10, headroom=0.5)
+    assert [admit(tracker) for _ in range(6)] == [None] * 5 + ["minute_limit"]
+
+
+def test_per_user_bucket_leaves_room_for_others(make_tracker):
+    tracker = make_tracker(user_rpm=1, user_burst=2)
+    assert [admit(tracker, "alice") for _ in range(3)] == [None, None, "user_limit"]
+    assert admit(tracker, "bob") is None
+
+
+def test_reserve_keeps_quota_for_required_calls(make_tracker):
+    tracker = make_tracker(rpm_limit=4)
+    assert [admit(tracker) for _ in range(2)] == [None, None]
+    assert admit(tracker, reserve=0.5) == "minute_limit"
+    assert admit(tracker) is None
+    # Refusals of optional calls are not counted
+    assert asyncio.run(tracker.get_stats())["rejected"] == {}
+
+
+def test_quota_error_blocks_every_call_for_the_cooldown(make_tracker):
+    tracker = make_tracker()
+    asyncio.run(tracker.record_quota_error())
+    assert admit(tracker) == "quota_cooldown"
+    stats = asyncio.run(tracker.get_stats())
+    assert stats["quota_errors"] == 1
+    assert stats["cooldown_remaining_seconds"] > 0
+
+
+def test_workers_sharing_a_store_share_the_quota(tmp_path):
+    path = str(tmp_path / "state.sqlite3")
+    first, second = (
+        UsageTracker(3, 100, 1.0, 0, 1, 30, shared=SharedState(path)) for _ in range(2)
+    )
+    assert [admit(first), admit(second), admit(first)] == [None, None, None]
+    assert admit(second) == "minute_limit"
+    asyncio.run(first.record_quota_error())
+    assert asyncio.run(second.get_stats())["cooldown_remaining_seconds"] > 0
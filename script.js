@@ -103,40 +103,10 @@ async function sendMessage() {
     if (loadingText) loadingText.style.display = 'inline';
     
     try {
-        console.log('Sending message to:', `${API_BASE_URL}/chat`);
-        
-        // Send request to backend - FIXED: matches your backend response model
-        const response = await fetch(`${API_BASE_URL}/chat`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json',
-            },
-            body: JSON.stringify({
-                message: userMessage,
-                userId: generateUserId(), // Optional: generate a user ID
-                timestamp: new Date().toISOString()
-            })
-        });
-        
-        console.log('Response status:', response.status);
-        
-        if (!response.ok) {
-            const errorText = await response.text();
-            console.error('Response error:', errorText);
-            throw new Error(`HTTP error! status: ${response.status} - ${errorText}`);
-        }
-        
-        const data = await response.json();
-        console.log('Response data:', data);
-        
-        // FIXED: Use the correct field name from your backend response
-        if (data.success) {
-            // Your backend returns 'message', not 'response'
-            addMessage(data.message, 'bot');
-        } else {
-            // Show error from backend
-            showError(data.error_message || 'Sorry, something went wrong. Please try again.');
+        // Prefer the streaming endpoint so the reply appears as it is generated
+        const streamed = await streamMessage(userMessage);
+        if (!streamed) {
+            await requestMessage(userMessage);
         }
         
     } catch (error) {
@@ -165,6 +135,114 @@ async function sendMessage() {
     }
 }
 
+// Send a message to /chat/stream and render the reply chunk by chunk.
+// Returns false if streaming is unavailable so the caller can fall back to /chat.
+async function streamMessage(userMessage) {
+    let response;
+    try {
+        response = await fetch(`${API_BASE_URL}/chat/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
+            },
+            body: JSON.stringify({
+                message: userMessage,
+                userId: generateUserId(),
+                timestamp: new Date().toISOString()
+            })
+        });
+    } catch (error) {
+        console.warn('Streaming unavailable, falling back to /chat:', error);
+        return false;
+    }
+    
+    if (!response.ok || !response.body) {
+        if (response.status === 400) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        return false;
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let replyText = null;
+    let reply = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Server-Sent Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            if (!data) continue;
+            const payload = JSON.parse(data);
+            
+            if (eventName === 'chunk' || eventName === 'error') {
+                // An error after partial text replaces it with the fallback reply
+                reply = eventName === 'error' ? payload.text : reply + payload.text;
+                if (replyText === null) {
+                    replyText = addMessage(reply, 'bot');
+                } else {
+                    replyText.textContent = reply;
+                }
+                scrollChatToBottom();
+            } else if (eventName === 'done') {
+                console.log('Stream finished:', payload);
+            }
+        }
+    }
+    
+    return replyText !== null;
+}
+
+// Send a message to /chat and render the whole reply at once
+async function requestMessage(userMessage) {
+    console.log('Sending message to:', `${API_BASE_URL}/chat`);
+    
+    const response = await fetch(`${API_BASE_URL}/chat`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        },
+        body: JSON.stringify({
+            message: userMessage,
+            userId: generateUserId(), // Optional: generate a user ID
+            timestamp: new Date().toISOString()
+        })
+    });
+    
+    console.log('Response status:', response.status);
+    
+    if (!response.ok) {
+        const errorText = await response.text();
+        console.error('Response error:', errorText);
+        throw new Error(`HTTP error! status: ${response.status} - ${errorText}`);
+    }
+    
+    const data = await response.json();
+    console.log('Response data:', data);
+    
+    if (data.success) {
+        addMessage(data.message, 'bot');
+    } else {
+        showError(data.error_message || 'Sorry, something went wrong. Please try again.');
+    }
+}
+
 function addMessage(message, sender) {
     const chatMessages = document.getElementById('chatMessages');
     if (!chatMessages) return;
@@ -184,6 +262,14 @@ function addMessage(message, sender) {
     messageDiv.appendChild(messageContent);
     chatMessages.appendChild(messageDiv);
     
+    scrollChatToBottom();
+    return messageContent.querySelector('.message-text');
+}
+
+function scrollChatToBottom() {
+    const chatMessages = document.getElementById('chatMessages');
+    if (!chatMessages) return;
+    
     // Scroll to bottom with smooth behavior
     chatMessages.scrollTo({
         top: chatMessages.scrollHeight,
@@ -214,9 +300,15 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
-// Generate a simple user ID for session tracking
+// Generate a simple user ID for session tracking; it is kept for the
+// browser session so the backend can follow the conversation
 function generateUserId() {
-    return 'user_' + Math.random().toString(36).substr(2, 9);
+    let userId = sessionStorage.getItem('caficafeUserId');
+    if (!userId) {
+        userId = 'user_' + Math.random().toString(36).substr(2, 9);
+        sessionStorage.setItem('caficafeUserId', userId);
+    }
+    return userId;
 }
 
 // Enhanced connection test
@@ -246,9 +338,15 @@ async function testConnection() {
     }
 }
 
-// Generate a simple user ID for session tracking
+// Generate a simple user ID for session tracking; it is kept for the
+// browser session so the backend can follow the conversation
 function generateUserId() {
-    return 'user_' + Math.random().toString(36).substr(2, 9);
+    let userId = sessionStorage.getItem('caficafeUserId');
+    if (!userId) {
+        userId = 'user_' + Math.random().toString(36).substr(2, 9);
+        sessionStorage.setItem('caficafeUserId', userId);
+    }
+    return userId;
 }
 
 // Initialize everything when DOM is loaded